@@ -0,0 +1,190 @@
+import math
+import threading
+import time
+from flask import current_app, g, request
+from flask_restx import marshal
+from flask_jwt_extended import decode_token
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt import PyJWTError
+from models import message_model
+from metrics import REQUESTS_REJECTED
+
+# Routes that must stay cheap and answer even under overload
+EXEMPT_RULES = {"/health", "/metrics"}
+
+# Buckets are pruned once this many clients are tracked
+MAX_TRACKED_CLIENTS = 10000
+
+
+class ConcurrencyPool:
+    """
+    Admits up to `limit` concurrent requests of one route class. Up to `queue_size` more wait at most
+    `timeout` seconds for a slot, since a waiting request holds a server thread; the rest are rejected.
+    """
+
+    def __init__(self, limit, queue_size, timeout):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            if self.active < self.limit:
+                self.active += 1
+                return True
+            if self.waiting >= self.queue_size:
+                return False
+            self.waiting += 1
+            try:
+                admitted = self._condition.wait_for(lambda: self.active < self.limit, self.timeout)
+                if admitted:
+                    self.active += 1
+                return admitted
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+
+class RateLimiter:
+    """
+    A token bucket per client, refilled at `rate` tokens per second up to `burst`.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """
+        Take a token for `key`. Returns 0 if one was available, or else the seconds until one will be.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            if len(self._buckets) > MAX_TRACKED_CLIENTS:
+                self._prune(now)
+        return wait
+
+    def _prune(self, now):
+        # A bucket that has refilled completely is the same as no bucket at all
+        self._buckets = {
+            key: (tokens, updated)
+            for key, (tokens, updated) in self._buckets.items()
+            if tokens + (now - updated) * self.rate < self.burst
+        }
+
+
+def route_class():
+    """
+    Which concurrency pool the request belongs to, or None for exempt routes.
+    """
+    rule = request.url_rule.rule if request.url_rule else None
+    if rule in EXEMPT_RULES:
+        return None
+    if rule and rule.endswith("/file"):
+        return "upload" if request.method == "POST" else "download"
+    if rule and (rule.endswith("/archive") or rule.startswith(("/export", "/files"))):
+        return "download"
+    # Password hashing makes logins and sign-ups expensive
+    if rule == "/session" or (rule == "/users" and request.method == "POST"):
+        return "auth"
+    return "metadata"
+
+
+def client_key():
+    """
+    The rate limit key: the user for requests with a valid token, the client address otherwise.
+    The token's signature and expiry are checked first, so made-up tokens spend the address's budget
+    instead of each getting a fresh bucket.
+    """
+    authorization = request.headers.get("Authorization", "")
+    if authorization.startswith("Bearer "):
+        try:
+            claims = decode_token(authorization[len("Bearer "):])
+        except (JWTExtendedException, PyJWTError):
+            pass
+        else:
+            return f"user:{claims[current_app.config['JWT_IDENTITY_CLAIM']]}"
+    return f"ip:{request.remote_addr}"
+
+
+def reject(status, message, retry_after, route, reason):
+    REQUESTS_REJECTED.labels(route, reason).inc()
+    return (
+        marshal({"message": message}, message_model),
+        status,
+        {"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def _before_request():
+    route = route_class()
+    if route is None:
+        return None
+
+    limiter = current_app.extensions["admission"]["limiter"]
+    if limiter:
+        wait = limiter.take(client_key())
+        if wait:
+            return reject(429, "Too many requests", wait, route, "rate_limited")
+
+    pool = current_app.extensions["admission"]["pools"].get(route)
+    if pool:
+        if not pool.acquire():
+            return reject(503, "Server is busy, please retry later", 1, route, "overloaded")
+        g.admission_pool = pool
+    return None
+
+
+def _teardown_request(exc):
+    pool = g.pop("admission_pool", None)
+    if pool:
+        pool.release()
+
+
+def init_app(app):
+    if not app.config["ADMISSION_ENABLED"]:
+        return
+    rate = app.config["RATE_LIMIT_PER_SECOND"]
+    app.extensions["admission"] = {
+        "limiter": RateLimiter(rate, app.config["RATE_LIMIT_BURST"]) if rate > 0 else None,
+        "pools": {
+            route: ConcurrencyPool(
+                limit, app.config["ADMISSION_QUEUE_SIZE"], app.config["ADMISSION_QUEUE_TIMEOUT"]
+            )
+            for route, limit in app.config["ADMISSION_LIMITS"].items()
+            if limit > 0
+        },
+    }
+    app.before_request(_before_request)
+    app.teardown_request(_teardown_request)
+
+
+def split_between_workers(app, workers):
+    """
+    Each worker process keeps its own buckets and connections are spread evenly over the workers,
+    so each one enforces its share of the configured rate. The concurrency limits stay per process,
+    since they protect that process's threads and database connections.
+    """
+    state = app.extensions.get("admission")
+    if not state or not state["limiter"] or workers <= 1:
+        return
+    limiter = state["limiter"]
+    limiter.rate = limiter.rate / workers
+    limiter.burst = max(1, math.ceil(limiter.burst / workers))
@@ -3,9 +3,22 @@ from resources.users import users_namespace
 from resources.session import session_namespace
 from resources.images import images_namespace
 from resources.albums import albums_namespace
-from resources.util import util_namespace
+from resources.export import export_namespace
+from resources.jobs import jobs_namespace
+from resources.changes import changes_namespace
+from resources.files import files_namespace
+from resources.tags import tags_namespace
 from extensions import db, api
-from jwt_auth import jwt
+from jwt_auth import jwt, blocklist_compactor
+import metrics
+import profiler
+import admission
+import commands
+import content_hash
+from transcoding import transcoder
+from jobs import jobs
+from blob_cache import blob_cache
+from stats import stats
 
 def create_app():
     app = Flask(__name__)
@@ -16,20 +29,57 @@ def create_app():
     # Initialize SQLAlchemy
     db.init_app(app)
 
+    # Initialize metrics
+    metrics.init_app(app, db)
+
+    # Initialize SQL profiler
+    profiler.init_app(app, db)
+
+    # Initialize admission control, ahead of JWT and database work
+    admission.init_app(app)
+
     # Initialize JWT
     jwt.init_app(app)
 
+    # Initialize periodic token blocklist compaction
+    blocklist_compactor.init_app(app)
+
     # Initialize Flask-RESTX
     api.init_app(app)
 
+    # Initialize transcoding workers
+    transcoder.init_app(app)
+
+    # Initialize background jobs
+    jobs.init_app(app)
+
+    # Initialize the in-memory cache of small image files
+    blob_cache.init_app(app)
+
+    # Initialize batched access statistics
+    stats.init_app(app)
+
+    # Check the content hash algorithm
+    content_hash.init_app(app)
+
+    # Register CLI commands
+    commands.init_app(app)
+
     # Add resources
     api.add_namespace(users_namespace)
     api.add_namespace(session_namespace)
     api.add_namespace(images_namespace)
     api.add_namespace(albums_namespace)
+    api.add_namespace(export_namespace)
+    api.add_namespace(jobs_namespace)
+    api.add_namespace(changes_namespace)
+    api.add_namespace(files_namespace)
+    api.add_namespace(tags_namespace)
     
     # Debug-only routes
     if app.config["DEBUG"]:
+        from resources.util import util_namespace
+
         api.add_namespace(util_namespace)
         
     return app
\ No newline at end of file
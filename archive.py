@@ -0,0 +1,56 @@
+import io
+import os
+import zipfile
+
+CHUNK_SIZE = 256 * 1024
+
+
+class _ZipOutput(io.RawIOBase):
+    """
+    Write-only, unseekable sink that hands the bytes zipfile writes back to the caller.
+    Because it can't seek, zipfile writes data descriptors instead of patching local headers.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(entries):
+    """
+    Yield a ZIP archive of the given (name, path, date_time) entries chunk by chunk.
+    Entries whose file is missing are skipped. Entries are stored rather than deflated, and neither
+    the archive nor any file is held in memory.
+    """
+    output = _ZipOutput()
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for name, path, date_time in entries:
+            try:
+                source = open(path, "rb")
+            except FileNotFoundError:
+                continue
+            with source:
+                info = zipfile.ZipInfo(name, date_time=date_time.timetuple()[:6])
+                info.compress_type = zipfile.ZIP_STORED
+                info.external_attr = 0o644 << 16
+                info.file_size = os.fstat(source.fileno()).st_size
+                with archive.open(info, "w") as destination:
+                    while True:
+                        chunk = source.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        destination.write(chunk)
+                        yield output.drain()
+            yield output.drain()
+    yield output.drain()
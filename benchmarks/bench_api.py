@@ -0,0 +1,565 @@
+"""
+In-process benchmark of every API namespace.
+
+Usage:
+    python -m benchmarks.bench_api --dataset small --output bench.json
+    python -m benchmarks.bench_api --dataset large --threads 8 --duration 10
+    python -m benchmarks.bench_api --compare before.json --output after.json
+"""
+
+import argparse
+import io
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from benchmarks.harness import (
+    BENCH_PASSWORD,
+    BENCH_USERNAME,
+    DATASETS,
+    QueryCounter,
+    boot_app,
+    seed,
+    summarize,
+)
+
+TEST_IMAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "test.png")
+
+ENDPOINTS = {}
+
+
+def endpoint(name, namespace, expect=200, load=False):
+    """
+    Register a request builder. The builder runs untimed and returns the keyword arguments for `client.open`,
+    so any per-iteration setup (e.g. inserting the row a DELETE will remove) stays out of the measurement.
+    """
+
+    def decorator(func):
+        ENDPOINTS[name] = {"namespace": namespace, "expect": expect, "build": func, "load": load}
+        return func
+
+    return decorator
+
+
+class Context:
+    def __init__(self, app, fixture):
+        self.app = app
+        self.fixture = fixture
+        self.counter = itertools.count(1)
+        self.admin_token = None
+        self.user_token = None
+
+    def auth(self, token):
+        return {"Authorization": f"Bearer {token}"}
+
+    def pick(self, ids, i):
+        return ids[i % len(ids)]
+
+    def insert(self, model, **values):
+        from extensions import db
+
+        with self.app.app_context():
+            row = model(**values)
+            db.session.add(row)
+            db.session.commit()
+            return row.id
+
+    def refresh_token(self, user_id):
+        from flask_jwt_extended import create_refresh_token
+        from orm.user import UserORM
+
+        with self.app.app_context():
+            return create_refresh_token(UserORM.query.filter_by(id=user_id).one())
+
+
+# Root namespace
+
+
+@endpoint("health", "root", load=True)
+def health(ctx, i):
+    return {"method": "GET", "path": "/health"}
+
+
+@endpoint("version", "root")
+def version(ctx, i):
+    return {"method": "GET", "path": "/version"}
+
+
+# Session namespace
+
+
+@endpoint("session.login", "session")
+def session_login(ctx, i):
+    return {"method": "POST", "path": "/session", "json": {"username": BENCH_USERNAME, "password": BENCH_PASSWORD}}
+
+
+@endpoint("session.refresh", "session")
+def session_refresh(ctx, i):
+    if not hasattr(ctx, "_refresh"):
+        ctx._refresh = ctx.refresh_token(ctx.fixture["user_id"])
+    return {"method": "GET", "path": "/session", "headers": ctx.auth(ctx._refresh)}
+
+
+@endpoint("session.logout", "session")
+def session_logout(ctx, i):
+    token = ctx.refresh_token(ctx.fixture["user_id"])
+    return {"method": "DELETE", "path": "/session", "headers": ctx.auth(token)}
+
+
+# Users namespace
+
+
+@endpoint("users.get", "users", load=True)
+def users_get(ctx, i):
+    return {"method": "GET", "path": f"/users/{ctx.fixture['user_id']}", "headers": ctx.auth(ctx.user_token)}
+
+
+@endpoint("users.put", "users")
+def users_put(ctx, i):
+    return {
+        "method": "PUT",
+        "path": f"/users/{ctx.fixture['user_id']}",
+        "headers": ctx.auth(ctx.admin_token),
+        "json": {"username": BENCH_USERNAME, "nickname": f"bench{i}", "permission_level": 1},
+    }
+
+
+@endpoint("users.post", "users", expect=201)
+def users_post(ctx, i):
+    n = next(ctx.counter)
+    return {
+        "method": "POST",
+        "path": "/users",
+        "json": {"username": f"created{n}", "nickname": f"created{n}", "password": "created", "permission_level": 1},
+    }
+
+
+@endpoint("users.delete", "users")
+def users_delete(ctx, i):
+    from orm.user import UserORM
+
+    n = next(ctx.counter)
+    user_id = ctx.insert(UserORM, username=f"doomed{n}", nickname=f"doomed{n}", permission_level=1)
+    return {"method": "DELETE", "path": f"/users/{user_id}", "headers": ctx.auth(ctx.admin_token)}
+
+
+# Images namespace
+
+
+@endpoint("images.list.anonymous", "images", load=True)
+def images_list_anonymous(ctx, i):
+    return {"method": "GET", "path": "/images"}
+
+
+@endpoint("images.list.user", "images")
+def images_list_user(ctx, i):
+    return {"method": "GET", "path": "/images", "headers": ctx.auth(ctx.user_token)}
+
+
+@endpoint("images.list.admin", "images")
+def images_list_admin(ctx, i):
+    return {"method": "GET", "path": "/images", "headers": ctx.auth(ctx.admin_token)}
+
+
+@endpoint("images.list.sparse", "images")
+def images_list_sparse(ctx, i):
+    return {"method": "GET", "path": "/images?fields=id,hash_value"}
+
+
+@endpoint("images.list.tagged", "images", load=True)
+def images_list_tagged(ctx, i):
+    return {"method": "GET", "path": "/images?tags=tag1,tag2", "headers": ctx.auth(ctx.user_token)}
+
+
+@endpoint("images.list.after", "images", load=True)
+def images_list_after(ctx, i):
+    path = f"/images?owner_id={ctx.fixture['user_id']}&after=2000-01-01T00:00:00&limit=50"
+    return {"method": "GET", "path": path, "headers": ctx.auth(ctx.user_token)}
+
+
+@endpoint("images.timeline", "images", load=True)
+def images_timeline(ctx, i):
+    return {"method": "GET", "path": "/images/timeline?granularity=day", "headers": ctx.auth(ctx.user_token)}
+
+
+@endpoint("images.get", "images", load=True)
+def images_get(ctx, i):
+    image_id = ctx.pick(ctx.fixture["public_image_ids"], i)
+    return {"method": "GET", "path": f"/images/{image_id}", "headers": ctx.auth(ctx.user_token)}
+
+
+@endpoint("images.get.not_modified", "images", expect=304)
+def images_get_not_modified(ctx, i):
+    # Seeded images are never updated, so they stay at version 1
+    image_id = ctx.pick(ctx.fixture["public_image_ids"], i)
+    headers = dict(ctx.auth(ctx.user_token), **{"If-None-Match": '"1"'})
+    return {"method": "GET", "path": f"/images/{image_id}", "headers": headers}
+
+
+@endpoint("images.put", "images")
+def images_put(ctx, i):
+    image_id = ctx.pick(ctx.fixture["user_image_ids"], i)
+    return {
+        "method": "PUT",
+        "path": f"/images/{image_id}",
+        "headers": ctx.auth(ctx.user_token),
+        "json": {"description": f"updated {i}", "visibility": 0},
+    }
+
+
+@endpoint("images.post", "images", expect=201)
+def images_post(ctx, i):
+    return {
+        "method": "POST",
+        "path": "/images",
+        "headers": ctx.auth(ctx.user_token),
+        "json": {"description": f"created {i}", "visibility": 0},
+    }
+
+
+@endpoint("images.delete", "images")
+def images_delete(ctx, i):
+    from orm.image import ImageORM
+
+    image_id = ctx.insert(ImageORM, description="doomed", owner_id=ctx.fixture["user_id"], visibility=0)
+    return {"method": "DELETE", "path": f"/images/{image_id}", "headers": ctx.auth(ctx.user_token)}
+
+
+@endpoint("images.file.get", "images", load=True)
+def images_file_get(ctx, i):
+    image_id = ctx.pick(ctx.fixture["public_image_ids"], i)
+    return {"method": "GET", "path": f"/images/{image_id}/file"}
+
+
+@endpoint("images.file_url", "images")
+def images_file_url(ctx, i):
+    image_id = ctx.pick(ctx.fixture["public_image_ids"], i)
+    return {"method": "POST", "path": f"/images/{image_id}/file-url"}
+
+
+@endpoint("files.get.signed", "images", load=True)
+def files_get_signed(ctx, i):
+    from signed_urls import sign
+
+    image_id = ctx.pick(ctx.fixture["public_image_ids"], i)
+    with ctx.app.app_context():
+        path, _ = sign(image_id, ctx.fixture["hash_value"], "image/png")
+    return {"method": "GET", "path": path}
+
+
+@endpoint("images.stats", "images", load=True)
+def images_stats(ctx, i):
+    image_id = ctx.pick(ctx.fixture["public_image_ids"], i)
+    return {"method": "GET", "path": f"/images/{image_id}/stats"}
+
+
+@endpoint("images.popular", "images", load=True)
+def images_popular(ctx, i):
+    return {"method": "GET", "path": "/images/popular"}
+
+
+@endpoint("images.file.post", "images")
+def images_file_post(ctx, i):
+    image_id = ctx.pick(ctx.fixture["user_image_ids"], i)
+    return {
+        "method": "POST",
+        "path": f"/images/{image_id}/file",
+        "headers": ctx.auth(ctx.user_token),
+        "data": {"file": (io.BytesIO(ctx.fixture["blob"]), "test.png", "image/png")},
+        "content_type": "multipart/form-data",
+    }
+
+
+# Albums namespace
+
+
+@endpoint("albums.list.anonymous", "albums", load=True)
+def albums_list_anonymous(ctx, i):
+    return {"method": "GET", "path": "/albums"}
+
+
+@endpoint("albums.list.user", "albums")
+def albums_list_user(ctx, i):
+    return {"method": "GET", "path": "/albums", "headers": ctx.auth(ctx.user_token)}
+
+
+@endpoint("albums.get.large", "albums", load=True)
+def albums_get_large(ctx, i):
+    return {"method": "GET", "path": f"/albums/{ctx.fixture['large_album_id']}"}
+
+
+@endpoint("albums.put", "albums")
+def albums_put(ctx, i):
+    return {
+        "method": "PUT",
+        "path": f"/albums/{ctx.fixture['user_album_id']}",
+        "headers": ctx.auth(ctx.user_token),
+        "json": {
+            "album_name": "updated",
+            "description": f"updated {i}",
+            "visibility": 0,
+            "images": ctx.fixture["public_image_ids"][:50],
+        },
+    }
+
+
+@endpoint("albums.post", "albums", expect=201)
+def albums_post(ctx, i):
+    return {
+        "method": "POST",
+        "path": "/albums",
+        "headers": ctx.auth(ctx.user_token),
+        "json": {
+            "album_name": f"created {i}",
+            "description": "created",
+            "visibility": 0,
+            "images": ctx.fixture["public_image_ids"][:50],
+        },
+    }
+
+
+@endpoint("albums.delete", "albums")
+def albums_delete(ctx, i):
+    from orm.album import AlbumORM
+
+    album_id = ctx.insert(AlbumORM, album_name="doomed", description="doomed", owner_id=ctx.fixture["user_id"])
+    return {"method": "DELETE", "path": f"/albums/{album_id}", "headers": ctx.auth(ctx.user_token)}
+
+
+# Tags namespace
+
+
+@endpoint("tags.list.anonymous", "tags", load=True)
+def tags_list_anonymous(ctx, i):
+    return {"method": "GET", "path": "/tags"}
+
+
+@endpoint("tags.list.user", "tags", load=True)
+def tags_list_user(ctx, i):
+    return {"method": "GET", "path": "/tags", "headers": ctx.auth(ctx.user_token)}
+
+
+# Export namespace
+
+
+@endpoint("export.images", "export")
+def export_images(ctx, i):
+    return {"method": "GET", "path": "/export/images", "headers": ctx.auth(ctx.admin_token)}
+
+
+@endpoint("export.albums", "export")
+def export_albums(ctx, i):
+    return {"method": "GET", "path": "/export/albums", "headers": ctx.auth(ctx.admin_token)}
+
+
+def login(client, username, password):
+    response = client.post("/session", json={"username": username, "password": password})
+    if response.status_code != 200:
+        raise RuntimeError(f"Login as {username} failed: {response.status_code} {response.data!r}")
+    return response.get_json()["access_token"]
+
+
+def run_endpoint(ctx, client, queries, name, iterations, warmup, memory_iterations):
+    spec = ENDPOINTS[name]
+    for i in range(warmup):
+        client.open(**spec["build"](ctx, i))
+
+    samples = []
+    errors = 0
+    query_total = 0
+    elapsed = 0.0
+    for i in range(warmup, warmup + iterations):
+        request = spec["build"](ctx, i)
+        before = queries.count
+        start = time.perf_counter()
+        response = client.open(**request)
+        response.get_data()
+        duration = time.perf_counter() - start
+        query_total += queries.count - before
+        elapsed += duration
+        samples.append(duration)
+        if response.status_code != spec["expect"]:
+            errors += 1
+
+    # Memory is measured in a separate pass because tracemalloc slows every allocation down.
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    for i in range(memory_iterations):
+        client.open(**spec["build"](ctx, warmup + iterations + i)).get_data()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = summarize(samples, elapsed)
+    result.update(
+        {
+            "namespace": spec["namespace"],
+            "errors": errors,
+            "queries_per_request": round(query_total / iterations, 2) if iterations else None,
+            "peak_memory_kib": round((peak - baseline) / 1024, 1),
+        }
+    )
+    return result
+
+
+def run_load(ctx, names, threads, duration):
+    """
+    Drive a round-robin mix of read endpoints from several threads, one test client per thread.
+    """
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(offset):
+        client = ctx.app.test_client()
+        local = {name: [] for name in names}
+        local_errors = {name: 0 for name in names}
+        for i in itertools.count(offset):
+            if time.perf_counter() >= deadline:
+                break
+            name = names[i % len(names)]
+            spec = ENDPOINTS[name]
+            request = spec["build"](ctx, i)
+            start = time.perf_counter()
+            response = client.open(**request)
+            response.get_data()
+            local[name].append(time.perf_counter() - start)
+            if response.status_code != spec["expect"]:
+                local_errors[name] += 1
+        with lock:
+            for name in names:
+                samples[name].extend(local[name])
+                errors[name] += local_errors[name]
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    for name in names:
+        endpoints[name] = summarize(samples[name], elapsed)
+        endpoints[name]["errors"] = errors[name]
+    total = summarize([s for name in names for s in samples[name]], elapsed)
+    return {"threads": threads, "duration_s": round(elapsed, 3), "total": total, "endpoints": endpoints}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous, current):
+    """
+    Print a per-endpoint comparison of two reports to stderr.
+    """
+    print(f"{'endpoint':32} {'p50 before':>11} {'p50 after':>10} {'change':>8}", file=sys.stderr)
+    for name, after in current["endpoints"].items():
+        before = previous.get("endpoints", {}).get(name)
+        if not before or not before.get("p50_ms") or after.get("p50_ms") is None:
+            continue
+        change = (after["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100
+        print(f"{name:32} {before['p50_ms']:>11} {after['p50_ms']:>10} {change:>+7.1f}%", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Image Repository API in-process.")
+    parser.add_argument("--dataset", choices=sorted(DATASETS), default="small")
+    parser.add_argument("--iterations", type=int, default=100, help="Timed requests per endpoint.")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed requests per endpoint.")
+    parser.add_argument("--memory-iterations", type=int, default=3, help="Requests per endpoint under tracemalloc.")
+    parser.add_argument("--only", action="append", help="Only run endpoints whose name starts with this prefix.")
+    parser.add_argument("--threads", type=int, default=0, help="Also run the multi-threaded load generator.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Load generator duration in seconds.")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout.")
+    parser.add_argument("--compare", help="Previous JSON report to compare against.")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary database and storage directory.")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="image-repo-bench-")
+    try:
+        app = boot_app(workdir)
+        with open(TEST_IMAGE, "rb") as file:
+            blob = file.read()
+        setup_started = time.perf_counter()
+        fixture = seed(app, args.dataset, blob)
+        fixture["blob"] = blob
+        setup_seconds = time.perf_counter() - setup_started
+
+        from extensions import db
+
+        with app.app_context():
+            queries = QueryCounter(db.engine)
+
+        ctx = Context(app, fixture)
+        client = app.test_client()
+        ctx.admin_token = login(client, app.config["ADMIN_USERNAME"], app.config["ADMIN_PASSWORD"])
+        ctx.user_token = login(client, BENCH_USERNAME, BENCH_PASSWORD)
+
+        names = [
+            name for name in ENDPOINTS if not args.only or any(name.startswith(prefix) for prefix in args.only)
+        ]
+        report = {
+            "meta": {
+                "revision": git_revision(),
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "dataset": args.dataset,
+                "dataset_spec": fixture["spec"],
+                "seed_seconds": round(setup_seconds, 3),
+                "iterations": args.iterations,
+                "warmup": args.warmup,
+            },
+            "endpoints": {},
+        }
+        for name in names:
+            report["endpoints"][name] = run_endpoint(
+                ctx, client, queries, name, args.iterations, args.warmup, args.memory_iterations
+            )
+            print(f"{name}: {report['endpoints'][name]['p50_ms']} ms p50", file=sys.stderr)
+
+        if args.threads:
+            load_names = [name for name in names if ENDPOINTS[name]["load"]]
+            report["load"] = run_load(ctx, load_names, args.threads, args.duration)
+
+        output = json.dumps(report, indent=2)
+        if args.output:
+            with open(args.output, "w") as file:
+                file.write(output + "\n")
+        else:
+            print(output)
+
+        if args.compare:
+            with open(args.compare) as file:
+                compare(json.load(file), report)
+    finally:
+        from stats import stats
+
+        # Written while the database still exists, instead of by the exit hook after it is removed
+        stats.flush()
+        if args.keep:
+            print(f"Benchmark data kept in {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
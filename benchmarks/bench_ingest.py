@@ -0,0 +1,122 @@
+"""
+Compare ingest throughput of the content hash algorithms on the same dataset.
+
+Each algorithm gets a fresh process and database, since `Config` reads CONTENT_HASH_ALGORITHM at import
+time. The same deterministic files are uploaded through `POST /images/<id>/file` in each, and hashed on
+their own as well, so the share of ingest time spent hashing is visible.
+
+Usage:
+    python -m benchmarks.bench_ingest --files 200 --size 1048576 --output ingest.json
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import SEED, boot_app
+
+MB = 1024 * 1024
+
+
+def dataset(files, size):
+    rng = random.Random(SEED)
+    return [rng.randbytes(size) for _ in range(files)]
+
+
+def probe(algorithm, files, size):
+    """
+    Upload the dataset with `algorithm` in this process and return the throughput.
+    """
+    os.environ["CONTENT_HASH_ALGORITHM"] = algorithm
+    with tempfile.TemporaryDirectory(prefix="image-repo-ingest-") as workdir:
+        app = boot_app(workdir)
+
+        import io
+        from content_hash import digest
+        from extensions import db
+        from orm.image import ImageORM
+        from orm.user import UserORM
+
+        with app.app_context():
+            admin = UserORM(username="admin", nickname="admin", permission_level=2)
+            admin.set_password("admin")
+            db.session.add(admin)
+            db.session.flush()
+            images = [ImageORM(description=f"ingest {i}", owner_id=admin.id, visibility=0) for i in range(files)]
+            db.session.add_all(images)
+            db.session.commit()
+            image_ids = [image.id for image in images]
+
+        blobs = dataset(files, size)
+        client = app.test_client()
+        token = client.post("/session", json={"username": "admin", "password": "admin"}).get_json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        started = time.perf_counter()
+        for image_id, blob in zip(image_ids, blobs):
+            response = client.post(
+                f"/images/{image_id}/file",
+                headers=headers,
+                data={"file": (io.BytesIO(blob), "ingest.bin", "application/octet-stream")},
+                content_type="multipart/form-data",
+            )
+            if response.status_code != 200:
+                raise RuntimeError(f"Upload failed: {response.status_code} {response.data!r}")
+        ingest_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for blob in blobs:
+            digest(blob, algorithm)
+        hash_s = time.perf_counter() - started
+
+    total_mb = files * size / MB
+    return {
+        "algorithm": algorithm,
+        "ingest_mb_s": round(total_mb / ingest_s, 1),
+        "hash_mb_s": round(total_mb / hash_s, 1),
+        "hash_share": round(hash_s / ingest_s, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare upload throughput of the content hash algorithms.")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--size", type=int, default=MB, help="Bytes per file.")
+    parser.add_argument("--algorithm", action="append", help="Algorithm to measure; repeatable. Defaults to all.")
+    parser.add_argument("--probe", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout.")
+    args = parser.parse_args(argv)
+
+    if args.probe:
+        print(json.dumps(probe(args.probe, args.files, args.size)))
+        return
+
+    from content_hash import ALGORITHMS
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+    results = []
+    for algorithm in args.algorithm or list(ALGORITHMS):
+        command = [
+            sys.executable, "-m", "benchmarks.bench_ingest",
+            "--probe", algorithm, "--files", str(args.files), "--size", str(args.size),
+        ]
+        result = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+        results.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    report = {"meta": {"files": args.files, "size": args.size, "seed": SEED}, "results": results}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Compare process x thread configurations of serve.py under the same HTTP load.
+
+Each configuration serves a seeded SQLite database from a fresh `serve.py` master. The load is a fixed mix
+of image reads, image listings and logins sent by several client processes over keep-alive connections,
+so the Python load generator itself is not the bottleneck.
+
+Usage:
+    python -m benchmarks.bench_serving --config 1x8 --config 2x4 --config 4x2 --clients 8 --duration 10
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import BENCH_PASSWORD, BENCH_USERNAME, DATASETS, boot_app, seed, summarize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_IMAGE = os.path.join(ROOT, "tests", "test.png")
+
+# (weight, method, path, body); the image ID is filled in per request
+MIX = [
+    (6, "GET", "/images/{image_id}", None),
+    (3, "GET", "/images", None),
+    (1, "POST", "/session", {"username": BENCH_USERNAME, "password": BENCH_PASSWORD}),
+]
+
+
+def wait_until_up(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/health")
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"serve.py did not come up on port {port}")
+
+
+def client(port, image_ids, duration, seed_value, results):
+    rng = random.Random(seed_value)
+    requests = [entry for entry in MIX for _ in range(entry[0])]
+    latencies, errors = [], 0
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        _, method, path, body = rng.choice(requests)
+        path = path.format(image_id=rng.choice(image_ids))
+        headers = {"Content-Type": "application/json"} if body else {}
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, body=json.dumps(body) if body else None, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            continue
+        if response.status >= 400:
+            errors += 1
+        else:
+            latencies.append(time.perf_counter() - started)
+    results.put((latencies, errors))
+
+
+def run_config(port, workers, threads, clients, duration, image_ids):
+    command = [
+        sys.executable, os.path.join(ROOT, "serve.py"),
+        "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--threads", str(threads),
+    ]
+    server = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(port)
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=client, args=(port, image_ids, duration, index, results))
+            for index in range(clients)
+        ]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        elapsed = time.perf_counter() - started
+        for process in processes:
+            process.join()
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+    summary = summarize([latency for latencies, _ in collected for latency in latencies], elapsed)
+    summary["errors"] = sum(errors for _, errors in collected)
+    return summary
+
+
+def parse_config(value):
+    workers, _, threads = value.partition("x")
+    return int(workers), int(threads)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark serve.py process/thread configurations.")
+    parser.add_argument("--dataset", choices=sorted(DATASETS), default="small")
+    parser.add_argument(
+        "--config", action="append", type=parse_config, help="WORKERSxTHREADS, may be repeated (default 1x8, 2x4, 4x2)."
+    )
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent client processes.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per configuration.")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout.")
+    args = parser.parse_args(argv)
+    configs = args.config or [(1, 8), (2, 4), (4, 2)]
+
+    workdir = tempfile.mkdtemp(prefix="image-repo-bench-")
+    try:
+        # Seeds the database and leaves the environment pointing at it for the serve.py children
+        app = boot_app(workdir)
+        with open(TEST_IMAGE, "rb") as file:
+            fixture = seed(app, args.dataset, file.read())
+        report = {"dataset": args.dataset, "clients": args.clients, "duration": args.duration, "configs": {}}
+        for workers, threads in configs:
+            name = f"{workers}x{threads}"
+            report["configs"][name] = run_config(
+                args.port, workers, threads, args.clients, args.duration, fixture["public_image_ids"]
+            )
+            print(f"{name}: {report['configs'][name]}", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Measure how long a fresh worker takes to import the application and run create_app().
+
+Usage:
+    python -m benchmarks.bench_startup --runs 10 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.harness import configure_environment
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+created = time.perf_counter()
+print(json.dumps({"import_s": imported - started, "create_app_s": created - imported}))
+"""
+
+
+def run_probe(env, importtime=False):
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", PROBE]
+    result = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def slowest_imports(stderr, limit):
+    """
+    Parse `-X importtime` output and return the modules with the largest self time.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:") :].split("|")
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue
+        rows.append({"module": parts[2].strip(), "self_ms": self_us / 1000, "cumulative_ms": cumulative_us / 1000})
+    return sorted(rows, key=lambda row: row["self_ms"], reverse=True)[:limit]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure application import and create_app() time.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest imports to report.")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="image-repo-startup-") as workdir:
+        configure_environment(workdir)
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+
+        samples = [run_probe(env)[0] for _ in range(args.runs)]
+        _, importtime = run_probe(env, importtime=True)
+
+    report = {}
+    for key in ("import_s", "create_app_s"):
+        values = [sample[key] for sample in samples]
+        report[key.replace("_s", "_ms")] = {
+            "median": round(statistics.median(values) * 1000, 2),
+            "min": round(min(values) * 1000, 2),
+            "max": round(max(values) * 1000, 2),
+        }
+    report["slowest_imports"] = slowest_imports(importtime, args.top)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import hashlib
+import io
+import math
+import os
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert
+
+SEED = 20240601
+
+DATASETS = {
+    "small": {
+        "users": 10,
+        "images": 1000,
+        "albums": 20,
+        "album_size": 50,
+        "large_album_size": 500,
+        "revoked_tokens": 1000,
+        "tags": 50,
+        "tags_per_image": 3,
+    },
+    "large": {
+        "users": 100,
+        "images": 100000,
+        "albums": 200,
+        "album_size": 100,
+        "large_album_size": 10000,
+        "revoked_tokens": 100000,
+        "tags": 500,
+        "tags_per_image": 3,
+    },
+}
+
+# Revoked tokens in the dataset expire far in the future, so compaction keeps them all
+REVOKED_TOKEN_EXP = 4102444800
+
+CREATED_FROM = datetime(2022, 1, 1)
+CREATED_SPAN = timedelta(days=730)
+
+BENCH_USERNAME = "bench"
+BENCH_PASSWORD = "bench"
+
+
+def configure_environment(workdir):
+    """
+    Point the application at a throwaway SQLite database and storage directory.
+    Must run before `config` is imported, since `Config` reads the environment at import time.
+    """
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["STORAGE_PATH"] = os.path.join(workdir, "uploads")
+    os.environ["DEBUG"] = ""
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret-key-not-for-production")
+    os.environ.setdefault("JWT_ACCESS_TOKEN_EXPIRES", "15")
+    os.environ.setdefault("JWT_REFRESH_TOKEN_EXPIRES", "43200")
+    os.environ.setdefault("MAX_CONTENT_LENGTH", "10485760")
+    os.environ.setdefault("ADMIN_USERNAME", "admin")
+    os.environ.setdefault("ADMIN_PASSWORD", "admin")
+    # Every benchmark request comes from the same client, so shedding would only skew the numbers
+    os.environ.setdefault("ADMISSION_ENABLED", "False")
+    os.makedirs(os.environ["STORAGE_PATH"], exist_ok=True)
+
+
+def boot_app(workdir):
+    configure_environment(workdir)
+
+    from app import create_app
+    from extensions import db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+class QueryCounter:
+    """
+    Counts statements sent to the database through the given engine.
+    """
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def _chunks(rows, size=10000):
+    for start in range(0, len(rows), size):
+        yield rows[start : start + size]
+
+
+def seed(app, dataset, blob):
+    """
+    Fill the database with a deterministic synthetic dataset and return the IDs the benchmarks need.
+    """
+    from extensions import db
+    from orm.user import UserORM, TokenBlocklistORM
+    from orm.image import ImageORM
+    from orm.album import AlbumORM, AlbumImagesORM
+    from orm.tag import TagORM, ImageTagsORM
+    from image_metadata import read_metadata
+    from tags import recount as recount_tags
+    from timeline import recount as recount_timeline
+
+    spec = DATASETS[dataset]
+    rng = random.Random(SEED)
+
+    with app.app_context():
+        admin = UserORM(
+            id=1,
+            username=app.config["ADMIN_USERNAME"],
+            nickname=app.config["ADMIN_USERNAME"],
+            permission_level=2,
+        )
+        admin.set_password(app.config["ADMIN_PASSWORD"])
+        user = UserORM(id=2, username=BENCH_USERNAME, nickname=BENCH_USERNAME, permission_level=1)
+        user.set_password(BENCH_PASSWORD)
+        db.session.add_all([admin, user])
+        db.session.flush()
+
+        user_ids = list(range(1, spec["users"] + 1))
+        db.session.execute(
+            insert(UserORM),
+            [
+                {
+                    "id": user_id,
+                    "username": f"user{user_id}",
+                    "nickname": f"user{user_id}",
+                    "password_hash": user.password_hash,
+                    "permission_level": 1,
+                }
+                for user_id in user_ids[2:]
+            ],
+        )
+
+        metadata = read_metadata(io.BytesIO(blob)) or {}
+        hash_value = hashlib.sha256(blob).hexdigest()
+        with open(os.path.join(app.config["STORAGE_PATH"], hash_value), "wb") as file:
+            file.write(blob)
+
+        images = [
+            {
+                "id": image_id,
+                "description": f"synthetic image {image_id}",
+                "owner_id": user_ids[image_id % len(user_ids)],
+                "hash_value": hash_value,
+                "mimetype": metadata.get("mimetype"),
+                "visibility": rng.choice((0, 0, 1, 2)),
+                "format": metadata.get("format"),
+                "width": metadata.get("width"),
+                "height": metadata.get("height"),
+                "size": len(blob),
+                # Spread over two years so the timeline has many days to bucket
+                "created_at": CREATED_FROM + image_id * CREATED_SPAN / spec["images"],
+            }
+            for image_id in range(1, spec["images"] + 1)
+        ]
+        for chunk in _chunks(images):
+            db.session.execute(insert(ImageORM), chunk)
+
+        public_image_ids = [row["id"] for row in images if row["visibility"] == 0]
+        user_image_ids = [row["id"] for row in images if row["owner_id"] == user.id]
+
+        albums = [
+            {
+                "id": album_id,
+                "album_name": f"album{album_id}",
+                "description": f"synthetic album {album_id}",
+                "owner_id": user.id if album_id <= 2 else user_ids[album_id % len(user_ids)],
+                "visibility": 0 if album_id <= 2 else rng.choice((0, 1, 2)),
+            }
+            for album_id in range(1, spec["albums"] + 1)
+        ]
+        db.session.execute(insert(AlbumORM), albums)
+
+        links = []
+        for album in albums:
+            size = spec["large_album_size"] if album["id"] == 1 else spec["album_size"]
+            for image_id in rng.sample(range(1, spec["images"] + 1), min(size, spec["images"])):
+                links.append({"album_id": album["id"], "image_id": image_id})
+        for chunk in _chunks(links):
+            db.session.execute(insert(AlbumImagesORM), chunk)
+
+        tokens = [
+            {"jti": str(uuid.UUID(int=rng.getrandbits(128))), "exp": REVOKED_TOKEN_EXP}
+            for _ in range(spec["revoked_tokens"])
+        ]
+        for chunk in _chunks(tokens):
+            db.session.execute(insert(TokenBlocklistORM), chunk)
+
+        # Tag popularity is skewed so facets and tag filters see both common and rare tags
+        tag_ids = list(range(1, spec["tags"] + 1))
+        db.session.execute(insert(TagORM), [{"id": tag_id, "name": f"tag{tag_id}"} for tag_id in tag_ids])
+        weights = [1 / tag_id for tag_id in tag_ids]
+        image_tags = []
+        for image in images:
+            chosen = set(rng.choices(tag_ids, weights, k=spec["tags_per_image"]))
+            image_tags.extend({"image_id": image["id"], "tag_id": tag_id} for tag_id in chosen)
+        for chunk in _chunks(image_tags):
+            db.session.execute(insert(ImageTagsORM), chunk)
+        recount_tags()
+        recount_timeline()
+
+        db.session.commit()
+
+    return {
+        "admin_id": 1,
+        "user_id": 2,
+        "large_album_id": 1,
+        "user_album_id": 2,
+        "public_image_ids": public_image_ids,
+        "user_image_ids": user_image_ids,
+        "hash_value": hash_value,
+        "spec": spec,
+    }
+
+
+def percentile(sorted_samples, fraction):
+    if not sorted_samples:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_samples)))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+
+def summarize(samples, elapsed):
+    """
+    Latency samples are in seconds; the summary is reported in milliseconds.
+    """
+    ordered = sorted(samples)
+    return {
+        "requests": len(ordered),
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3) if ordered else None,
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3) if ordered else None,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else None,
+        "throughput_rps": round(len(ordered) / elapsed, 1) if elapsed > 0 else None,
+    }
@@ -0,0 +1,74 @@
+import os
+import threading
+from collections import OrderedDict
+from metrics import BLOB_CACHE_REQUESTS, BLOB_CACHE_BYTES_SAVED, BLOB_CACHE_SIZE
+
+# Blobs found to be over the size ceiling are remembered, up to this many, so they aren't probed again
+MAX_LARGE_NAMES = 10000
+
+
+class BlobCache:
+    """
+    Keeps the bytes of small stored files in memory, least recently used first out, within a byte budget.
+    Files are addressed by their content hash (variants by <hash_value>.<extension>) and never change,
+    so entries need no invalidation. Each worker process has its own cache.
+    """
+
+    def __init__(self):
+        self.budget = 0
+        self.max_object = 0
+        self.size = 0
+        self._entries = OrderedDict()
+        self._large = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.budget = app.config["BLOB_CACHE_BYTES"]
+        self.max_object = min(app.config["BLOB_CACHE_MAX_OBJECT_BYTES"], self.budget)
+
+    def read(self, storage_path, name):
+        """
+        Return the contents of a stored file if it is small enough to cache, or None if it should be
+        streamed from disk. Raises FileNotFoundError if the file is missing.
+        """
+        if not self.budget or name in self._large:
+            BLOB_CACHE_REQUESTS.labels("bypass").inc()
+            return None
+
+        with self._lock:
+            data = self._entries.get(name)
+            if data is not None:
+                self._entries.move_to_end(name)
+        if data is not None:
+            BLOB_CACHE_REQUESTS.labels("hit").inc()
+            BLOB_CACHE_BYTES_SAVED.inc(len(data))
+            return data
+
+        with open(os.path.join(storage_path, name), "rb") as file:
+            if os.fstat(file.fileno()).st_size > self.max_object:
+                if len(self._large) >= MAX_LARGE_NAMES:
+                    self._large.clear()
+                self._large.add(name)
+                BLOB_CACHE_REQUESTS.labels("bypass").inc()
+                return None
+            data = file.read()
+        BLOB_CACHE_REQUESTS.labels("miss").inc()
+        self._put(name, data)
+        return data
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def _put(self, name, data):
+        with self._lock:
+            if name in self._entries:
+                return
+            self._entries[name] = data
+            self.size += len(data)
+            while self.size > self.budget:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+            BLOB_CACHE_SIZE.set(self.size)
+
+
+blob_cache = BlobCache()
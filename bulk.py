@@ -0,0 +1,202 @@
+from flask_jwt_extended import current_user
+from flask_restx import reqparse, inputs
+from sqlalchemy import delete, func, update
+from extensions import db
+from orm.album import AlbumORM, AlbumImagesORM
+from orm.blob import BlobCleanupORM
+from orm.change import ChangeORM
+from orm.image import ImageORM
+from orm.stats import StatsORM
+from orm.user import UserORM
+from usage import images_deleted
+from timeline import images_removed
+from tags import images_untagged
+
+# Rows deleted per transaction, which also keeps IN lists well below database parameter limits
+CHUNK_SIZE = 1000
+
+bulk_delete_parser = reqparse.RequestParser()
+bulk_delete_parser.add_argument(
+    "ids", type=int, action="append", help="IDs to delete."
+)
+bulk_delete_parser.add_argument(
+    "owner_id", type=int, help="Delete everything owned by this user (admins only for other users)."
+)
+bulk_delete_parser.add_argument(
+    "created_after",
+    type=inputs.datetime_from_iso8601,
+    help="Delete everything created at or after this ISO 8601 time.",
+)
+bulk_delete_parser.add_argument(
+    "created_before",
+    type=inputs.datetime_from_iso8601,
+    help="Delete everything created before this ISO 8601 time.",
+)
+
+
+class BulkDeleteError(Exception):
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def chunked(ids, size=CHUNK_SIZE):
+    for start in range(0, len(ids), size):
+        yield ids[start : start + size]
+
+
+def resolve_targets(model, args):
+    """
+    Work out which rows of `model` a bulk delete request may remove.
+    Returns the IDs to delete and the per-ID results, checking ownership with one query per chunk.
+    """
+    is_admin = current_user.permission_level >= 2
+
+    if args["ids"]:
+        requested = list(dict.fromkeys(args["ids"]))
+        owners = {}
+        for chunk in chunked(requested):
+            owners.update(
+                db.session.query(model.id, model.owner_id).filter(model.id.in_(chunk)).all()
+            )
+        results = {}
+        for id in requested:
+            if id not in owners:
+                results[id] = "not_found"
+            elif owners[id] != current_user.id and not is_admin:
+                results[id] = "forbidden"
+            else:
+                results[id] = "deleted"
+        return [id for id, status in results.items() if status == "deleted"], results
+
+    if args["owner_id"] is None and not args["created_after"] and not args["created_before"]:
+        raise BulkDeleteError("Either ids or a filter is required", 400)
+
+    owner_id = args["owner_id"]
+    if owner_id is None and not is_admin:
+        owner_id = current_user.id
+    if owner_id != current_user.id and not is_admin:
+        raise BulkDeleteError("Permission denied", 403)
+
+    query = db.session.query(model.id)
+    if owner_id is not None:
+        query = query.filter(model.owner_id == owner_id)
+    if args["created_after"]:
+        query = query.filter(model.created_at >= args["created_after"])
+    if args["created_before"]:
+        query = query.filter(model.created_at < args["created_before"])
+    ids = [row.id for row in query.order_by(model.id)]
+    return ids, {id: "deleted" for id in ids}
+
+
+bulk_tag_parser = bulk_delete_parser.copy()
+bulk_tag_parser.replace_argument("ids", type=int, action="append", help="IDs of the images to change.")
+bulk_tag_parser.replace_argument(
+    "owner_id", type=int, help="Change every image owned by this user (admins only for other users)."
+)
+bulk_tag_parser.replace_argument(
+    "created_after",
+    type=inputs.datetime_from_iso8601,
+    help="Change every image created at or after this ISO 8601 time.",
+)
+bulk_tag_parser.replace_argument(
+    "created_before",
+    type=inputs.datetime_from_iso8601,
+    help="Change every image created before this ISO 8601 time.",
+)
+bulk_tag_parser.add_argument("tags", type=str, action="append", required=True, help="Tag names.")
+
+
+def results_body(results, done="deleted"):
+    return {
+        done: sum(1 for status in results.values() if status == done),
+        "results": [{"id": id, "status": status} for id, status in results.items()],
+    }
+
+
+def delete_images(ids):
+    """
+    Delete the given images and their album links, updating their owners' storage usage and timeline
+    and queueing blobs nobody references any more. Runs in the caller's transaction.
+    """
+    deleted = db.session.query(
+        ImageORM.owner_id, ImageORM.hash_value, ImageORM.size, ImageORM.created_at, ImageORM.visibility
+    ).filter(ImageORM.id.in_(ids)).all()
+    # Albums that lose images change too
+    album_ids = [
+        row.album_id
+        for row in db.session.query(AlbumImagesORM.album_id)
+        .filter(AlbumImagesORM.image_id.in_(ids))
+        .distinct()
+    ]
+    db.session.execute(
+        update(AlbumORM)
+        .where(AlbumORM.id.in_(album_ids))
+        .values(version=AlbumORM.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(delete(AlbumImagesORM).where(AlbumImagesORM.image_id.in_(ids)))
+    images_untagged(ids)
+    db.session.execute(
+        delete(ImageORM)
+        .where(ImageORM.id.in_(ids))
+        .execution_options(synchronize_session=False)
+    )
+    StatsORM.forget("image", ids)
+    images_deleted([(row.owner_id, row.hash_value, row.size) for row in deleted])
+    images_removed([(row.owner_id, row.created_at, row.visibility) for row in deleted])
+    BlobCleanupORM.enqueue_orphans(row.hash_value for row in deleted)
+    # Recorded last, right before the caller commits, so the change feed's settle window covers the commit
+    ChangeORM.record("album", "upsert", album_ids)
+    ChangeORM.record("image", "delete", ids)
+
+
+def delete_albums(ids):
+    """
+    Delete the given albums and their image links. Runs in the caller's transaction.
+    """
+    StatsORM.forget("album", ids)
+    db.session.execute(delete(AlbumImagesORM).where(AlbumImagesORM.album_id.in_(ids)))
+    db.session.execute(
+        delete(AlbumORM)
+        .where(AlbumORM.id.in_(ids))
+        .execution_options(synchronize_session=False)
+    )
+    ChangeORM.record("album", "delete", ids)
+
+
+def count_user_rows(user_id):
+    return sum(
+        db.session.query(func.count(model.id)).filter(model.owner_id == user_id).scalar()
+        for model in (AlbumORM, ImageORM)
+    )
+
+
+def delete_user(user_id, progress=None):
+    """
+    Delete a user with everything they own, album_images -> albums -> images -> user, one chunk per
+    transaction. Only IDs are ever loaded. `progress` is called with the number of rows deleted after each
+    chunk, inside the chunk's transaction, so a job can record it atomically.
+    """
+    for model, delete_chunk in ((AlbumORM, delete_albums), (ImageORM, delete_images)):
+        while True:
+            ids = [
+                row.id
+                for row in db.session.query(model.id)
+                .filter(model.owner_id == user_id)
+                .order_by(model.id)
+                .limit(CHUNK_SIZE)
+            ]
+            if not ids:
+                break
+            delete_chunk(ids)
+            if progress:
+                progress(len(ids))
+            db.session.commit()
+    db.session.execute(
+        delete(UserORM)
+        .where(UserORM.id == user_id)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
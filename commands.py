@@ -0,0 +1,391 @@
+import click
+import glob
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from flask import current_app
+from flask.cli import with_appcontext
+from datetime import timedelta
+from sqlalchemy import and_, bindparam, delete, func, inspect, select, text, update
+from sqlalchemy.orm import aliased
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.sql.elements import TextClause
+from extensions import db
+from orm.image import ImageORM
+from orm.blob import BlobCleanupORM
+from orm.change import ChangeORM, ChangeHorizonORM
+from orm.user import UserORM
+from image_metadata import read_metadata
+from jwt_auth import compact_blocklist
+from usage import recount
+from content_hash import ALGORITHMS, count_rekey, rekey_blobs as rekey
+from orm.scrub import ScrubIssueORM
+from scrub import count_blobs, scrub, unfinished_run
+from tags import recount as recount_tag_counts
+from timeline import recount as recount_timeline_counts
+
+
+def _read_blob_metadata(storage_path, hash_value):
+    try:
+        with open(os.path.join(storage_path, hash_value), "rb") as file:
+            return hash_value, read_metadata(file), os.fstat(file.fileno()).st_size
+    except FileNotFoundError:
+        return hash_value, None, None
+
+
+def _apply_metadata(recognized, unrecognized):
+    images = ImageORM.__table__
+    if recognized:
+        db.session.execute(
+            update(images)
+            .where(images.c.hash_value == bindparam("blob_hash"))
+            .values(
+                mimetype=bindparam("mimetype"),
+                format=bindparam("format"),
+                width=bindparam("width"),
+                height=bindparam("height"),
+                orientation=bindparam("orientation"),
+                taken_at=bindparam("taken_at"),
+                size=bindparam("size"),
+                version=images.c.version + 1,
+            ),
+            recognized,
+        )
+    if unrecognized:
+        db.session.execute(
+            update(images)
+            .where(images.c.hash_value == bindparam("blob_hash"))
+            .values(size=bindparam("size"), version=images.c.version + 1),
+            unrecognized,
+        )
+    hashes = [row["blob_hash"] for row in recognized + unrecognized]
+    if hashes:
+        ChangeORM.record_select(
+            "image", "upsert", select(images.c.id).where(images.c.hash_value.in_(hashes))
+        )
+    db.session.commit()
+
+
+@click.command("backfill-image-metadata")
+@click.option("--workers", default=8, show_default=True, help="Number of blobs read in parallel.")
+@click.option("--batch-size", default=500, show_default=True, help="Blobs updated per transaction.")
+@click.option("--all", "reprocess", is_flag=True, help="Also reprocess images that already have metadata.")
+@with_appcontext
+def backfill_image_metadata(workers, batch_size, reprocess):
+    """
+    Extract metadata for images uploaded before it was recorded at upload time.
+    """
+    query = db.session.query(ImageORM.hash_value).filter(ImageORM.hash_value.isnot(None))
+    if not reprocess:
+        query = query.filter(ImageORM.size.is_(None))
+    hashes = [row.hash_value for row in query.distinct()]
+    click.echo(f"Processing {len(hashes)} blobs with {workers} workers")
+
+    recognized, unrecognized = [], []
+    processed = missing = 0
+    read = partial(_read_blob_metadata, current_app.config["STORAGE_PATH"])
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for hash_value, metadata, size in pool.map(read, hashes):
+            if size is None:
+                missing += 1
+                continue
+            if metadata:
+                recognized.append(dict(metadata, blob_hash=hash_value, size=size))
+            else:
+                unrecognized.append({"blob_hash": hash_value, "size": size})
+            processed += 1
+            if len(recognized) + len(unrecognized) >= batch_size:
+                _apply_metadata(recognized, unrecognized)
+                recognized, unrecognized = [], []
+                click.echo(f"{processed}/{len(hashes)} blobs processed")
+    _apply_metadata(recognized, unrecognized)
+    click.echo(f"Done: {processed} blobs processed, {missing} missing from storage")
+
+
+@click.command("cleanup-blobs")
+@click.option("--batch-size", default=500, show_default=True, help="Blobs removed per transaction.")
+@with_appcontext
+def cleanup_blobs(batch_size):
+    """
+    Remove stored blobs, and their transcoded variants, that deleted images left behind.
+    """
+    storage_path = current_app.config["STORAGE_PATH"]
+    removed = kept = 0
+    last_hash = ""
+    while True:
+        hashes = [
+            row.hash_value
+            for row in db.session.query(BlobCleanupORM.hash_value)
+            .filter(BlobCleanupORM.hash_value > last_hash)
+            .order_by(BlobCleanupORM.hash_value)
+            .limit(batch_size)
+        ]
+        if not hashes:
+            break
+        last_hash = hashes[-1]
+        # An upload may have referenced a blob again since it was queued
+        referenced = {
+            row.hash_value
+            for row in db.session.query(ImageORM.hash_value)
+            .filter(ImageORM.hash_value.in_(hashes))
+            .distinct()
+        }
+        for hash_value in hashes:
+            if hash_value in referenced:
+                kept += 1
+                continue
+            paths = [os.path.join(storage_path, hash_value)]
+            paths += glob.glob(os.path.join(storage_path, glob.escape(hash_value) + ".*"))
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            removed += 1
+        db.session.execute(
+            delete(BlobCleanupORM).where(BlobCleanupORM.hash_value.in_(hashes))
+        )
+        db.session.commit()
+    click.echo(f"Done: {removed} blobs removed, {kept} still referenced")
+
+
+@click.command("compact-changes")
+@click.option("--retention-days", type=int, help="Drop changes older than this. Defaults to CHANGES_RETENTION_DAYS.")
+@click.option("--batch-size", default=1000, show_default=True, help="Changes deleted per transaction.")
+@with_appcontext
+def compact_changes(retention_days, batch_size):
+    """
+    Compact the change feed. Changes superseded by a later change to the same object are dropped, which
+    loses nothing; changes past the retention are dropped and move the horizon, so clients that last synced
+    before it get a 410.
+    """
+    if retention_days is None:
+        retention_days = current_app.config["CHANGES_RETENTION_DAYS"]
+
+    newer = aliased(ChangeORM)
+    superseded = expired = 0
+    while True:
+        seqs = [
+            row.seq
+            for row in db.session.query(ChangeORM.seq)
+            .join(
+                newer,
+                and_(
+                    newer.kind == ChangeORM.kind,
+                    newer.object_id == ChangeORM.object_id,
+                    newer.seq > ChangeORM.seq,
+                ),
+            )
+            .distinct()
+            .limit(batch_size)
+        ]
+        if not seqs:
+            break
+        db.session.execute(delete(ChangeORM).where(ChangeORM.seq.in_(seqs)))
+        db.session.commit()
+        superseded += len(seqs)
+
+    cutoff = db.session.execute(select(func.now())).scalar() - timedelta(days=retention_days)
+    while True:
+        seqs = [
+            row.seq
+            for row in db.session.query(ChangeORM.seq)
+            .filter(ChangeORM.created_at < cutoff)
+            .order_by(ChangeORM.seq)
+            .limit(batch_size)
+        ]
+        if not seqs:
+            break
+        horizon = db.session.get(ChangeHorizonORM, 1) or ChangeHorizonORM(id=1, seq=0)
+        horizon.seq = max(horizon.seq, seqs[-1])
+        db.session.add(horizon)
+        db.session.execute(delete(ChangeORM).where(ChangeORM.seq.in_(seqs)))
+        db.session.commit()
+        expired += len(seqs)
+
+    click.echo(
+        f"Done: {superseded} superseded and {expired} expired changes removed, "
+        f"horizon at {ChangeHorizonORM.get()}"
+    )
+
+
+@click.command("compact-token-blocklist")
+@click.option("--batch-size", default=1000, show_default=True, help="Entries deleted per transaction.")
+@with_appcontext
+def compact_token_blocklist(batch_size):
+    """
+    Remove blocklist entries for tokens that have expired anyway. Workers also do this every
+    TOKEN_BLOCKLIST_COMPACT_SECONDS; each batch is its own short transaction.
+    """
+    removed = compact_blocklist(batch_size)
+    click.echo(f"Done: {removed} expired blocklist entries removed")
+
+
+@click.command("recount-tags")
+@with_appcontext
+def recount_tags():
+    """
+    Recompute every tag's image counts from image_tags.
+    """
+    recount_tag_counts()
+    db.session.commit()
+    click.echo("Done: tag counts recomputed")
+
+
+@click.command("recount-timeline")
+@with_appcontext
+def recount_timeline():
+    """
+    Rebuild the per-day image counts behind GET /images/timeline.
+    """
+    recount_timeline_counts()
+    db.session.commit()
+    click.echo("Done: timeline counts recomputed")
+
+
+@click.command("rekey-blobs")
+@click.option(
+    "--algorithm",
+    type=click.Choice(sorted(ALGORITHMS)),
+    help="Algorithm to address blobs by. Defaults to CONTENT_HASH_ALGORITHM.",
+)
+@click.option("--batch-size", default=500, show_default=True, help="Blobs re-keyed per transaction.")
+@with_appcontext
+def rekey_blobs(algorithm, batch_size):
+    """
+    Re-address blobs stored under another hash algorithm. Old names are queued for cleanup-blobs.
+    """
+    algorithm = algorithm or current_app.config["CONTENT_HASH_ALGORITHM"]
+    total = count_rekey(algorithm)
+    click.echo(f"Re-keying {total} blobs to {algorithm}")
+    done = 0
+
+    def progress(count):
+        nonlocal done
+        done += count
+        click.echo(f"{done}/{total} blobs processed")
+
+    rekey(algorithm, batch_size, progress=progress)
+    click.echo(f"Done: {count_rekey(algorithm)} blobs left under other algorithms")
+
+
+@click.command("scrub-blobs")
+@click.option("--workers", type=int, help="Threads re-hashing blobs. Defaults to SCRUB_WORKERS.")
+@click.option("--rate", type=float, help="Read ceiling in MB/s, 0 for none. Defaults to SCRUB_MB_PER_SECOND.")
+@click.option("--batch-size", default=500, show_default=True, help="Blobs checked per checkpoint.")
+@click.option("--restart", is_flag=True, help="Start a new pass instead of resuming an interrupted one.")
+@with_appcontext
+def scrub_blobs(workers, rate, batch_size, restart):
+    """
+    Verify stored blobs against their hashes and report corrupt, missing and orphaned files.
+    """
+    workers = workers or current_app.config["SCRUB_WORKERS"]
+    rate = current_app.config["SCRUB_MB_PER_SECOND"] if rate is None else rate
+    previous = None if restart else unfinished_run()
+    total = count_blobs(previous.last_hash if previous else "")
+    click.echo(f"{'Resuming' if previous else 'Starting'} scrub of {total} blobs with {workers} workers")
+    done = 0
+
+    def progress(count):
+        nonlocal done
+        done += count
+        click.echo(f"{done}/{total} blobs checked")
+
+    run = scrub(workers, rate * 1024 * 1024, batch_size, restart=restart, progress=progress)
+    for issue in ScrubIssueORM.query.filter_by(run_id=run.id).order_by(ScrubIssueORM.id):
+        click.echo(f"{issue.problem}: {issue.name}")
+    click.echo(
+        f"Done: {run.checked} blobs checked, {run.corrupt} corrupt, {run.missing} missing, "
+        f"{run.orphaned} orphaned"
+    )
+
+
+@click.command("recount-storage")
+@click.option("--batch-size", default=1000, show_default=True, help="Users recounted per transaction.")
+@with_appcontext
+def recount_storage(batch_size):
+    """
+    Recompute every user's image count and storage usage from the images table.
+    """
+    last_id = 0
+    recounted = 0
+    while True:
+        user_ids = [
+            row.id
+            for row in db.session.query(UserORM.id)
+            .filter(UserORM.id > last_id)
+            .order_by(UserORM.id)
+            .limit(batch_size)
+        ]
+        if not user_ids:
+            break
+        last_id = user_ids[-1]
+        recount(user_ids)
+        db.session.commit()
+        recounted += len(user_ids)
+    click.echo(f"Done: {recounted} users recounted")
+
+
+def _add_column(connection, column):
+    """
+    ALTER TABLE ... ADD COLUMN for a model column. SQLite can't add a column whose default is an expression
+    such as CURRENT_TIMESTAMP, so there it is added without one and filled for the existing rows; the models
+    set such columns on insert too.
+    """
+    default = column.server_default
+    if (
+        connection.dialect.name == "sqlite"
+        and default is not None
+        and not isinstance(default.arg, (str, TextClause))
+    ):
+        connection.execute(
+            text(
+                f"ALTER TABLE {column.table.name} ADD COLUMN "
+                f"{column.name} {column.type.compile(dialect=connection.dialect)}"
+            )
+        )
+        connection.execute(column.table.update().values({column.name: default.arg}))
+    else:
+        ddl = CreateColumn(column).compile(dialect=connection.dialect)
+        connection.execute(text(f"ALTER TABLE {column.table.name} ADD COLUMN {ddl}"))
+
+
+@click.command("upgrade-schema")
+@with_appcontext
+def upgrade_schema():
+    """
+    Bring a database created by an older version up to the models: create missing tables, add missing columns
+    and create missing indexes. Existing columns are never changed or dropped. Run it once after upgrading,
+    before the backfill and recount commands.
+    """
+    db.create_all()
+    inspector = inspect(db.engine)
+    added = 0
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    _add_column(connection, column)
+                    click.echo(f"Added column {table.name}.{column.name}")
+                    added += 1
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(connection)
+                    click.echo(f"Created index {index.name}")
+                    added += 1
+    click.echo(f"Done: {added} columns and indexes added")
+
+
+def init_app(app):
+    app.cli.add_command(backfill_image_metadata)
+    app.cli.add_command(cleanup_blobs)
+    app.cli.add_command(compact_changes)
+    app.cli.add_command(compact_token_blocklist)
+    app.cli.add_command(recount_storage)
+    app.cli.add_command(recount_tags)
+    app.cli.add_command(recount_timeline)
+    app.cli.add_command(rekey_blobs)
+    app.cli.add_command(scrub_blobs)
+    app.cli.add_command(upgrade_schema)
@@ -0,0 +1,48 @@
+from flask import Response, request
+from flask_jwt_extended import current_user
+from sqlalchemy import update, or_
+from werkzeug.http import quote_etag
+from extensions import db
+
+
+def etag(version):
+    return quote_etag(str(version))
+
+
+def not_modified(version):
+    """
+    Whether If-None-Match already names this version, so the body can be skipped.
+    """
+    return request.if_none_match.contains_weak(str(version))
+
+
+def not_modified_response(version):
+    return Response(status=304, headers={"ETag": etag(version)})
+
+
+def update_owned(model, id, values):
+    """
+    Apply `values` to a row the current user may edit and bump its version, in a single UPDATE that also
+    checks If-Match when the header is present.
+    Returns the new version and None, or None and the status code explaining why nothing changed.
+    """
+    statement = update(model).where(
+        model.id == id,
+        or_(model.owner_id == current_user.id, current_user.permission_level >= 2),
+    )
+    if "If-Match" in request.headers and not request.if_match.star_tag:
+        versions = [int(tag) for tag in request.if_match.as_set() if tag.isdigit()]
+        statement = statement.where(model.version.in_(versions))
+    result = db.session.execute(
+        statement.values(version=model.version + 1, **values).execution_options(
+            synchronize_session=False
+        )
+    )
+    row = db.session.query(model.version, model.owner_id).filter(model.id == id).first()
+    if result.rowcount:
+        return row.version, None
+    if not row:
+        return None, 404
+    if row.owner_id != current_user.id and current_user.permission_level < 2:
+        return None, 403
+    return None, 412
@@ -14,6 +14,7 @@ class Config:
     SERVER_NAME = os.getenv("SERVER_NAME") if os.getenv("SERVER_NAME") else None
     DEBUG = bool(os.getenv("DEBUG"))
     PROPAGATE_EXCEPTIONS = True
+    API_DOCS_ENABLED = (os.getenv("API_DOCS_ENABLED") or "True").lower() in ("true", "1")
 
     # MySQL configuration
     MYSQL_DATABASE_USER = os.getenv("MYSQL_DATABASE_USER")
@@ -32,11 +33,79 @@ class Config:
     # JWT configuration
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=int(os.getenv("JWT_ACCESS_TOKEN_EXPIRES")))
-    JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=int(os.getenv("JWT_ACCESS_TOKEN_EXPIRES")))
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(minutes=int(os.getenv("JWT_REFRESH_TOKEN_EXPIRES")))
+    TOKEN_BLOCKLIST_COMPACT_SECONDS = int(os.getenv("TOKEN_BLOCKLIST_COMPACT_SECONDS") or 3600)
 
     # Other configurations
     MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH"))
     STORAGE_TYPE = os.getenv("STORAGE_TYPE")
     STORAGE_PATH = os.getenv("STORAGE_PATH")
     ADMIN_USERNAME = os.getenv("ADMIN_USERNAME")
-    ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")
\ No newline at end of file
+    ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")
+
+    # SQL profiler configuration
+    SQL_PROFILER_SAMPLE_RATE = float(os.getenv("SQL_PROFILER_SAMPLE_RATE") or 0)
+    SQL_PROFILER_REPEAT_THRESHOLD = int(os.getenv("SQL_PROFILER_REPEAT_THRESHOLD") or 10)
+
+    # Transcoding configuration
+    TRANSCODE_ENABLED = (os.getenv("TRANSCODE_ENABLED") or "True").lower() in ("true", "1")
+    TRANSCODE_FORMATS = [
+        mimetype.strip() for mimetype in (os.getenv("TRANSCODE_FORMATS") or "image/avif,image/webp").split(",")
+    ]
+    TRANSCODE_WORKERS = int(os.getenv("TRANSCODE_WORKERS") or 2)
+    TRANSCODE_QUALITY = int(os.getenv("TRANSCODE_QUALITY") or 80)
+
+    # Background job configuration
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS") or 2)
+    JOB_HEARTBEAT_SECONDS = int(os.getenv("JOB_HEARTBEAT_SECONDS") or 10)
+    JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS") or 60)
+
+    # Change feed configuration
+    CHANGES_SETTLE_SECONDS = float(os.getenv("CHANGES_SETTLE_SECONDS") or 1)
+    CHANGES_RETENTION_DAYS = int(os.getenv("CHANGES_RETENTION_DAYS") or 30)
+
+    # Admission control configuration (concurrency limits per route class, token bucket per client)
+    ADMISSION_ENABLED = (os.getenv("ADMISSION_ENABLED") or "True").lower() in ("true", "1")
+    ADMISSION_LIMITS = {
+        route.strip(): int(limit)
+        for route, limit in (
+            item.split(":")
+            for item in (os.getenv("ADMISSION_LIMITS") or "upload:2,download:4,auth:2,metadata:8").split(",")
+        )
+    }
+    ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE") or 2)
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT") or 0.25)
+    RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND") or 50)
+    RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST") or 100)
+
+    # Blob cache configuration (per process; a budget of 0 disables it)
+    BLOB_CACHE_BYTES = int(os.getenv("BLOB_CACHE_BYTES") or 64 * 1024 * 1024)
+    BLOB_CACHE_MAX_OBJECT_BYTES = int(os.getenv("BLOB_CACHE_MAX_OBJECT_BYTES") or 256 * 1024)
+
+    # Content addressing configuration (sha256 or blake2b; existing blobs keep theirs until re-keyed)
+    CONTENT_HASH_ALGORITHM = os.getenv("CONTENT_HASH_ALGORITHM") or "sha256"
+
+    # Storage scrubber configuration (threads re-hashing blobs, and their combined read ceiling; 0 is unlimited)
+    SCRUB_WORKERS = int(os.getenv("SCRUB_WORKERS") or 4)
+    SCRUB_MB_PER_SECOND = float(os.getenv("SCRUB_MB_PER_SECOND") or 20)
+
+    # Access statistics configuration (counts are written in batches; the popular list is rebuilt from them)
+    STATS_FLUSH_SECONDS = float(os.getenv("STATS_FLUSH_SECONDS") or 10)
+    POPULAR_REFRESH_SECONDS = float(os.getenv("POPULAR_REFRESH_SECONDS") or 60)
+    POPULAR_SIZE = int(os.getenv("POPULAR_SIZE") or 100)
+
+    # Storage quota configuration per non-admin user (0 means unlimited)
+    QUOTA_IMAGES = int(os.getenv("QUOTA_IMAGES") or 0)
+    QUOTA_BYTES = int(os.getenv("QUOTA_BYTES") or 0)
+
+    # Signed file URL configuration (the secret defaults to one derived from JWT_SECRET_KEY)
+    FILE_URL_SECRET = os.getenv("FILE_URL_SECRET")
+    FILE_URL_TTL = int(os.getenv("FILE_URL_TTL") or 300)
+
+    # Multi-process server configuration (serve.py)
+    SERVE_HOST = os.getenv("SERVE_HOST") or "0.0.0.0"
+    SERVE_PORT = int(os.getenv("SERVE_PORT") or 8080)
+    SERVE_WORKERS = int(os.getenv("SERVE_WORKERS") or os.cpu_count() or 1)
+    SERVE_THREADS = int(os.getenv("SERVE_THREADS") or 8)
+    SERVE_TIMEOUT = float(os.getenv("SERVE_TIMEOUT") or 30)
+    SERVE_GRACEFUL_TIMEOUT = float(os.getenv("SERVE_GRACEFUL_TIMEOUT") or 30)
@@ -0,0 +1,147 @@
+import hashlib
+import logging
+import os
+import shutil
+from functools import partial
+from flask import current_app
+from sqlalchemy import bindparam, delete, func, or_, update
+from extensions import db
+from orm.blob import BlobCleanupORM
+from orm.change import ChangeORM
+from orm.image import ImageORM
+from usage import recount
+
+log = logging.getLogger(__name__)
+
+# Digests are 32 bytes whichever algorithm made them, so every blob name fits ImageORM.hash_value
+ALGORITHMS = {
+    "sha256": hashlib.sha256,
+    "blake2b": partial(hashlib.blake2b, digest_size=32),
+}
+
+READ_SIZE = 1024 * 1024
+REKEY_BATCH_SIZE = 500
+
+
+def init_app(app):
+    if app.config["CONTENT_HASH_ALGORITHM"] not in ALGORITHMS:
+        raise ValueError(
+            f"CONTENT_HASH_ALGORITHM must be one of {', '.join(ALGORITHMS)}, "
+            f"not {app.config['CONTENT_HASH_ALGORITHM']!r}"
+        )
+
+
+def configured():
+    """
+    The algorithm new uploads are addressed by.
+    """
+    return current_app.config["CONTENT_HASH_ALGORITHM"]
+
+
+def digest(content, algorithm):
+    return ALGORITHMS[algorithm](content).hexdigest()
+
+
+def digest_file(path, algorithm):
+    hasher = ALGORITHMS[algorithm]()
+    with open(path, "rb") as file:
+        while chunk := file.read(READ_SIZE):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _stale(algorithm):
+    return ImageORM.hash_value.isnot(None), or_(
+        ImageORM.hash_algorithm.is_(None), ImageORM.hash_algorithm != algorithm
+    )
+
+
+def count_rekey(algorithm):
+    """
+    How many blobs are still addressed by another algorithm.
+    """
+    return db.session.query(func.count(ImageORM.hash_value.distinct())).filter(*_stale(algorithm)).scalar()
+
+
+def _store_as(storage_path, hash_value, algorithm):
+    """
+    Make the blob available under its name in `algorithm` as well, and return that name.
+    """
+    source = os.path.join(storage_path, hash_value)
+    new_hash = digest_file(source, algorithm)
+    destination = os.path.join(storage_path, new_hash)
+    if not os.path.exists(destination):
+        try:
+            os.link(source, destination)
+        except FileExistsError:
+            pass
+        except OSError:
+            # Storage without hard links gets a copy, moved into place whole
+            temporary = f"{destination}.rekey-{os.getpid()}"
+            shutil.copyfile(source, temporary)
+            os.replace(temporary, destination)
+    return new_hash
+
+
+def rekey_blobs(algorithm, batch_size=REKEY_BATCH_SIZE, progress=None):
+    """
+    Re-address every blob stored under another algorithm by its `algorithm` digest, one batch of blobs per
+    transaction. Images are pointed at the new name and the old name is queued for `flask cleanup-blobs`,
+    so the file stays readable throughout. `progress` is called with the number of blobs handled in each
+    batch, inside its transaction. Blobs missing from storage are skipped and left as they are.
+    """
+    storage_path = current_app.config["STORAGE_PATH"]
+    images = ImageORM.__table__
+    last_hash = ""
+    while True:
+        hashes = [
+            row.hash_value
+            for row in db.session.query(ImageORM.hash_value)
+            .filter(*_stale(algorithm), ImageORM.hash_value > last_hash)
+            .distinct()
+            .order_by(ImageORM.hash_value)
+            .limit(batch_size)
+        ]
+        if not hashes:
+            break
+        last_hash = hashes[-1]
+
+        renamed = []
+        for hash_value in hashes:
+            try:
+                new_hash = _store_as(storage_path, hash_value, algorithm)
+            except FileNotFoundError:
+                log.warning("Blob %s is missing from storage, not re-keyed", hash_value)
+                continue
+            renamed.append({"old_hash": hash_value, "new_hash": new_hash})
+
+        if renamed:
+            old_hashes = [row["old_hash"] for row in renamed]
+            new_hashes = [row["new_hash"] for row in renamed]
+            rekeyed = db.session.query(ImageORM.id, ImageORM.owner_id).filter(
+                ImageORM.hash_value.in_(old_hashes)
+            ).all()
+            owner_ids = list({row.owner_id for row in rekeyed})
+            db.session.execute(
+                update(images)
+                .where(
+                    images.c.hash_value == bindparam("old_hash"),
+                    or_(images.c.hash_algorithm.is_(None), images.c.hash_algorithm != algorithm),
+                )
+                .values(
+                    hash_value=bindparam("new_hash"),
+                    hash_algorithm=algorithm,
+                    version=images.c.version + 1,
+                ),
+                renamed,
+            )
+            db.session.execute(delete(BlobCleanupORM).where(BlobCleanupORM.hash_value.in_(new_hashes)))
+            BlobCleanupORM.enqueue_orphans(old_hashes)
+            # An owner holding the same file under both algorithms now has one blob where there were two
+            recount(owner_ids)
+        if progress:
+            progress(len(hashes))
+        if renamed:
+            # Recorded last, right before the commit, so the change feed's settle window covers the commit
+            ChangeORM.record("image", "upsert", [row.id for row in rekeyed])
+        db.session.commit()
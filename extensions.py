@@ -1,10 +1,75 @@
 from flask_sqlalchemy import SQLAlchemy
+from flask import Response, current_app, request
 from flask_restx import Resource, Api, marshal
 from models import message_model
+from metrics import registry, CONTENT_TYPE_LATEST
+import hashlib
+import json
+import threading
 
 db = SQLAlchemy()
 
-api = Api(
+
+class CachedSwaggerView(Resource):
+    """
+    Serve swagger.json from the memoized serialization, answering If-None-Match with 304.
+    """
+
+    def get(self):
+        body, etag = self.api.serialized_schema()
+        response = current_app.response_class(body, mimetype="application/json")
+        if etag is None:
+            response.status_code = 500
+            return response
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+
+class CachedSpecApi(Api):
+    """
+    The specification only changes when the code does, so it is serialized once per process.
+    The doc UI can be turned off with API_DOCS_ENABLED.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._serialized_schema = None
+        self._serialized_schema_lock = threading.Lock()
+
+    def init_app(self, app, **kwargs):
+        if not app.config.get("API_DOCS_ENABLED", True):
+            self._doc = False
+        super().init_app(app, **kwargs)
+
+    def _register_specs(self, app_or_blueprint):
+        if self._add_specs:
+            self._register_view(
+                app_or_blueprint,
+                CachedSwaggerView,
+                self.default_namespace,
+                "/" + self.default_swagger_filename,
+                endpoint="specs",
+                resource_class_args=(self,),
+            )
+            self.endpoints.add("specs")
+
+    def serialized_schema(self):
+        """
+        Return the JSON-encoded specification and its ETag, or a None ETag if it could not be rendered.
+        """
+        if self._serialized_schema is None:
+            with self._serialized_schema_lock:
+                if self._serialized_schema is None:
+                    schema = self.__schema__
+                    body = json.dumps(schema, separators=(",", ":")).encode()
+                    if "error" in schema:
+                        return body, None
+                    self._serialized_schema = (body, hashlib.sha256(body).hexdigest()[:32])
+        return self._serialized_schema
+
+
+api = CachedSpecApi(
     version="1.0",
     title="Image Repository API",
     description="A simple Image Repository API",
@@ -36,4 +101,14 @@ class Version(Resource):
         """
         Get version.
         """
-        return marshal({"message": api.version}, message_model), 200
\ No newline at end of file
+        return marshal({"message": api.version}, message_model), 200
+
+@api.route("/metrics")
+class Metrics(Resource):
+    @api.produces([CONTENT_TYPE_LATEST])
+    @api.response(200, "Success")
+    def get(self):
+        """
+        Get metrics in Prometheus text format.
+        """
+        return Response(registry.expose(), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,61 @@
+from flask_restx import reqparse
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only, lazyload, selectinload
+
+
+class FieldSet:
+    """
+    reqparse type for a comma-separated `fields` list, checked against the response model.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, value):
+        names = list(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+        unknown = [name for name in names if name not in self.model]
+        if not names or unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown) or '(none)'}")
+        return names
+
+
+def fields_parser(model, parser=None):
+    parser = parser or reqparse.RequestParser()
+    parser.add_argument(
+        "fields",
+        type=FieldSet(model),
+        location="args",
+        help=f"Comma-separated fields to return ({', '.join(model)}), all by default",
+    )
+    return parser
+
+
+def load_fields(orm, names, required=()):
+    """
+    Loader options that select only the columns behind `names` and `required`. Relationships, which are
+    serialized as lists of IDs, load only the related primary keys when asked for and not at all otherwise.
+    """
+    mapper = inspect(orm)
+    columns = [
+        getattr(orm, name) for name in dict.fromkeys((*names, *required)) if name in mapper.column_attrs
+    ]
+    options = [load_only(*columns)]
+    for relationship in mapper.relationships:
+        attribute = getattr(orm, relationship.key)
+        if relationship.key in names:
+            related = relationship.mapper
+            options.append(
+                selectinload(attribute).load_only(
+                    *(related.get_property_by_column(column).class_attribute for column in related.primary_key)
+                )
+            )
+        else:
+            options.append(lazyload(attribute))
+    return options
+
+
+def project(model, names):
+    """
+    The marshalling fields of `model` restricted to `names`.
+    """
+    return {name: model[name] for name in names}
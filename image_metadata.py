@@ -0,0 +1,151 @@
+import struct
+from datetime import datetime
+
+# Enough for the fixed-position headers of PNG, GIF, BMP and WebP. JPEG is walked segment by segment instead.
+HEADER_SIZE = 64
+MAX_EXIF_SIZE = 64 * 1024
+
+EXIF_ORIENTATION = 0x0112
+EXIF_DATETIME = 0x0132
+EXIF_IFD_POINTER = 0x8769
+EXIF_DATETIME_ORIGINAL = 0x9003
+
+MIMETYPES = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "gif": "image/gif",
+    "webp": "image/webp",
+    "bmp": "image/bmp",
+}
+
+
+def read_metadata(file):
+    """
+    Extract format, dimensions, EXIF orientation and capture time from the headers of an image file,
+    without decoding any pixel data. Returns None when the format is not recognized.
+    """
+    header = file.read(HEADER_SIZE)
+    try:
+        if header.startswith(b"\x89PNG\r\n\x1a\n") and header[12:16] == b"IHDR":
+            width, height = struct.unpack(">II", header[16:24])
+            return _metadata("png", width, height)
+        if header[:6] in (b"GIF87a", b"GIF89a"):
+            width, height = struct.unpack("<HH", header[6:10])
+            return _metadata("gif", width, height)
+        if header.startswith(b"BM"):
+            width, height = struct.unpack("<ii", header[18:26])
+            return _metadata("bmp", width, abs(height))
+        if header.startswith(b"RIFF") and header[8:12] == b"WEBP":
+            return _read_webp(header)
+        if header.startswith(b"\xff\xd8"):
+            file.seek(2)
+            return _read_jpeg(file)
+    except (struct.error, ValueError, IndexError):
+        return None
+    return None
+
+
+def _metadata(format, width, height, orientation=None, taken_at=None):
+    return {
+        "format": format,
+        "mimetype": MIMETYPES[format],
+        "width": width,
+        "height": height,
+        "orientation": orientation,
+        "taken_at": taken_at,
+    }
+
+
+def _read_webp(header):
+    chunk = header[12:16]
+    if chunk == b"VP8 ":
+        width, height = struct.unpack("<HH", header[26:30])
+        return _metadata("webp", width & 0x3FFF, height & 0x3FFF)
+    if chunk == b"VP8L":
+        bits = struct.unpack("<I", header[21:25])[0]
+        return _metadata("webp", (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1)
+    if chunk == b"VP8X":
+        width = int.from_bytes(header[24:27], "little") + 1
+        height = int.from_bytes(header[27:30], "little") + 1
+        return _metadata("webp", width, height)
+    return None
+
+
+def _read_jpeg(file):
+    orientation = None
+    taken_at = None
+    while True:
+        if file.read(1) != b"\xff":
+            return None
+        marker = file.read(1)
+        while marker == b"\xff":
+            marker = file.read(1)
+        if not marker:
+            return None
+        code = marker[0]
+        # Standalone markers carry no length field
+        if code == 0x01 or 0xD0 <= code <= 0xD7:
+            continue
+        if code in (0xD9, 0xDA):
+            return None
+        length = struct.unpack(">H", file.read(2))[0]
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            _, height, width = struct.unpack(">BHH", file.read(5))
+            return _metadata("jpeg", width, height, orientation, taken_at)
+        if code == 0xE1 and length - 2 <= MAX_EXIF_SIZE:
+            segment = file.read(length - 2)
+            if segment.startswith(b"Exif\x00\x00"):
+                orientation, taken_at = _read_exif(segment[6:])
+            continue
+        file.seek(length - 2, 1)
+
+
+def _read_exif(data):
+    try:
+        order = {b"II": "<", b"MM": ">"}[data[:2]]
+        ifd0 = _read_ifd(data, struct.unpack(order + "I", data[4:8])[0], order)
+        orientation = _tag_value(data, ifd0.get(EXIF_ORIENTATION), order)
+        taken = None
+        if EXIF_IFD_POINTER in ifd0:
+            exif_ifd = _read_ifd(data, _tag_value(data, ifd0[EXIF_IFD_POINTER], order), order)
+            taken = _tag_value(data, exif_ifd.get(EXIF_DATETIME_ORIGINAL), order)
+        if not taken:
+            taken = _tag_value(data, ifd0.get(EXIF_DATETIME), order)
+        return orientation, _parse_exif_datetime(taken)
+    except (KeyError, struct.error, IndexError, ValueError):
+        return None, None
+
+
+def _read_ifd(data, offset, order):
+    count = struct.unpack(order + "H", data[offset : offset + 2])[0]
+    entries = {}
+    for index in range(count):
+        start = offset + 2 + index * 12
+        tag, type, components = struct.unpack(order + "HHI", data[start : start + 8])
+        entries[tag] = (type, components, data[start + 8 : start + 12])
+    return entries
+
+
+def _tag_value(data, entry, order):
+    if entry is None:
+        return None
+    type, components, raw = entry
+    if type == 3:
+        return struct.unpack(order + "H", raw[:2])[0]
+    if type == 4:
+        return struct.unpack(order + "I", raw)[0]
+    if type == 2:
+        if components > 4:
+            offset = struct.unpack(order + "I", raw)[0]
+            raw = data[offset : offset + components]
+        return raw[:components].rstrip(b"\x00").decode("ascii", "replace")
+    return None
+
+
+def _parse_exif_datetime(value):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value.strip(), "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
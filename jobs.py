@@ -0,0 +1,176 @@
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from sqlalchemy import update, func, select
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from orm.job import JobORM
+
+log = logging.getLogger(__name__)
+
+
+def _process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobRunner:
+    """
+    Runs long maintenance work in a background thread pool, recording status and progress on a JobORM row
+    so any worker process can report on it. While a job is queued or running its process bumps the row's
+    heartbeat, so a job left behind by a process that was killed can be told apart and started again.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._executor = None
+        # Jobs submitted in this process and not finished yet
+        self._submitted = set()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def init_app(self, app):
+        self._app = app
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config["JOB_WORKERS"], thread_name_prefix="job"
+        )
+        self.heartbeat_interval = app.config["JOB_HEARTBEAT_SECONDS"]
+        self.stale_after = app.config["JOB_STALE_SECONDS"]
+
+    @staticmethod
+    def owner():
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def start(self, job, function, *args):
+        """
+        Commit a new job and run it in the background, unless a job of its kind (for its target) is already
+        pending or running: then that job is returned instead. The unique `active_key` makes concurrent starts
+        pick a single winner.
+        """
+        while True:
+            job.active_key = JobORM.key(job.kind, job.target_id)
+            db.session.add(job)
+            try:
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                # Another request got there first, unless its job has died and is now released
+                active = self.active(job.kind, job.target_id)
+                if active:
+                    return active
+                continue
+            self.submit(job, function, *args)
+            return job
+
+    def submit(self, job, function, *args):
+        """
+        Run `function(*args, progress=...)` for a committed job in the background.
+        """
+        self._set(job.id, owner=self.owner(), heartbeat_at=func.now())
+        with self._lock:
+            self._submitted.add(job.id)
+            # A forked worker beats for its own jobs
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._beat, name="job-heartbeat", daemon=True).start()
+        self._executor.submit(self._run, job.id, function, args)
+
+    def active(self, kind, target_id=None):
+        """
+        The pending or running job of `kind` (for `target_id`), if any. Jobs whose process has died or stopped
+        beating are marked failed instead, so the caller can start the work again.
+        """
+        query = JobORM.query.filter(JobORM.kind == kind, JobORM.status.in_(("pending", "running")))
+        if target_id is not None:
+            query = query.filter(JobORM.target_id == target_id)
+        now = db.session.execute(select(func.now())).scalar()
+        active = None
+        for job in query.order_by(JobORM.id):
+            if self._alive(job, now):
+                active = active or job
+            else:
+                log.warning("Job %s of %s stopped responding, marking it failed", job.id, job.owner)
+                job.status = "failed"
+                job.error = "The process running the job stopped"
+                job.finished_at = now
+                job.active_key = None
+        db.session.commit()
+        return active
+
+    def _alive(self, job, now):
+        host, _, pid = (job.owner or "").rpartition(":")
+        if host == socket.gethostname() and pid.isdigit():
+            if int(pid) == os.getpid():
+                with self._lock:
+                    return job.id in self._submitted
+            if not _process_exists(int(pid)):
+                return False
+        heartbeat = job.heartbeat_at or job.created_at
+        return heartbeat is not None and now - heartbeat < timedelta(seconds=self.stale_after)
+
+    def shutdown(self):
+        """
+        Wait for submitted jobs to finish, for a worker process that is about to exit.
+        """
+        if self._executor:
+            self._executor.shutdown(wait=True)
+
+    def _beat(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.heartbeat_interval)
+            with self._lock:
+                job_ids = list(self._submitted)
+            if not job_ids:
+                continue
+            try:
+                with self._app.app_context():
+                    db.session.execute(
+                        update(JobORM).where(JobORM.id.in_(job_ids)).values(heartbeat_at=func.now())
+                    )
+                    db.session.commit()
+            except Exception:
+                log.exception("Recording the job heartbeat failed")
+
+    def _run(self, job_id, function, args):
+        try:
+            with self._app.app_context():
+                self._set(job_id, status="running", heartbeat_at=func.now())
+
+                def progress(count):
+                    # Runs inside the caller's transaction, so progress commits together with the work
+                    db.session.execute(
+                        update(JobORM)
+                        .where(JobORM.id == job_id)
+                        .values(progress=JobORM.progress + count, heartbeat_at=func.now())
+                    )
+
+                try:
+                    function(*args, progress=progress)
+                except Exception as error:
+                    log.exception("Job %s failed", job_id)
+                    db.session.rollback()
+                    self._set(
+                        job_id, status="failed", error=str(error)[:255], finished_at=func.now(), active_key=None
+                    )
+                else:
+                    self._set(job_id, status="done", finished_at=func.now(), active_key=None)
+        finally:
+            with self._lock:
+                self._submitted.discard(job_id)
+
+    def _set(self, job_id, **values):
+        db.session.execute(update(JobORM).where(JobORM.id == job_id).values(**values))
+        db.session.commit()
+
+
+jobs = JobRunner()
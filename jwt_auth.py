@@ -1,23 +1,159 @@
+import logging
+import os
+import threading
+import time
+from flask import current_app
+from sqlalchemy import and_, delete, func, or_, select
 from orm.user import UserORM, TokenBlocklistORM
 from flask_jwt_extended import JWTManager
+from extensions import db
+from metrics import registry, Gauge
+
+log = logging.getLogger(__name__)
 
 jwt = JWTManager()
 
+# Counting the blocklist is a full index scan, so scrapes reuse the count for this long
+BLOCKLIST_SIZE_TTL = 60
+
+_blocklist_size = {"value": 0, "counted_at": None}
+_blocklist_size_lock = threading.Lock()
+
+
+def blocklist_size():
+    with _blocklist_size_lock:
+        now = time.monotonic()
+        if _blocklist_size["counted_at"] is None or now - _blocklist_size["counted_at"] > BLOCKLIST_SIZE_TTL:
+            _blocklist_size["value"] = db.session.query(TokenBlocklistORM.id).count()
+            _blocklist_size["counted_at"] = now
+        return _blocklist_size["value"]
+
+
+registry.register(
+    Gauge("token_blocklist_rows", "Rows in the token blocklist, counted at most once a minute.", function=blocklist_size)
+)
+
+
+def compact_blocklist(batch_size=1000):
+    """
+    Remove blocklist entries for tokens that have expired anyway, each batch in its own short transaction.
+    Returns the number of entries removed.
+    """
+    now = int(time.time())
+    # Entries written before the expiry was recorded outlive any refresh token after this long
+    legacy_cutoff = db.session.execute(select(func.now())).scalar() - current_app.config["JWT_REFRESH_TOKEN_EXPIRES"]
+    removed = 0
+    while True:
+        ids = [
+            row.id
+            for row in db.session.query(TokenBlocklistORM.id)
+            .filter(
+                or_(
+                    TokenBlocklistORM.exp < now,
+                    and_(TokenBlocklistORM.exp.is_(None), TokenBlocklistORM.created_at < legacy_cutoff),
+                )
+            )
+            .limit(batch_size)
+        ]
+        if not ids:
+            return removed
+        db.session.execute(delete(TokenBlocklistORM).where(TokenBlocklistORM.id.in_(ids)))
+        db.session.commit()
+        removed += len(ids)
+
+
+class BlocklistCompactor:
+    """
+    Runs compact_blocklist every TOKEN_BLOCKLIST_COMPACT_SECONDS on a daemon thread, so the blocklist stays
+    bounded without an external scheduler. Each worker process starts its thread on the first request it
+    serves; 0 disables it, for deployments that run `flask compact-token-blocklist` themselves.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def init_app(self, app):
+        self._app = app
+        self.interval = app.config["TOKEN_BLOCKLIST_COMPACT_SECONDS"]
+        if self.interval > 0:
+            app.before_request(self._start)
+
+    def _start(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                # A forked worker compacts with a thread of its own
+                if self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    threading.Thread(target=self._run, name="blocklist-compaction", daemon=True).start()
+
+    def _run(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.interval)
+            try:
+                with self._app.app_context():
+                    removed = compact_blocklist()
+                if removed:
+                    log.info("Removed %d expired token blocklist entries", removed)
+            except Exception:
+                log.exception("Compacting the token blocklist failed")
+
+
+blocklist_compactor = BlocklistCompactor()
+
+
+class TokenUser:
+    """
+    The user a verified token was issued to. `id` and `permission_level` come from the token's claims;
+    reading any other attribute loads the user row once and delegates to it.
+    """
+
+    def __init__(self, jwt_data):
+        self.id = jwt_data["sub"]
+        self._user = None
+        # Tokens issued before the claim existed fall back to the row
+        if "permission_level" in jwt_data:
+            self.permission_level = jwt_data["permission_level"]
+
+    def __getattr__(self, name):
+        if self._user is None:
+            self._user = UserORM.query.filter_by(id=self.id).one()
+        return getattr(self._user, name)
+
+
 @jwt.user_identity_loader
 def user_identity_lookup(user):
     return user.id
 
 
+@jwt.additional_claims_loader
+def add_user_claims(user):
+    return {"permission_level": user.permission_level, "generation": user.token_generation}
+
+
 @jwt.user_lookup_loader
 def user_lookup_callback(jwt_header, jwt_data):
-    identity = jwt_data["sub"]
-    return UserORM.query.filter_by(id=identity).one()
+    return TokenUser(jwt_data)
 
 
 @jwt.token_in_blocklist_loader
 def check_if_token_in_blocklist(jwt_header, jwt_data):
-    jti = jwt_data["jti"]
-    return TokenBlocklistORM.query.filter_by(jti=jti).one_or_none() is not None
+    """
+    One query checks the blocklist and that the user still exists with the token's generation,
+    so permission changes revoke outstanding tokens.
+    """
+    blocked = db.session.query(TokenBlocklistORM.id).filter_by(jti=jwt_data["jti"]).exists()
+    row = (
+        db.session.query(UserORM.token_generation, blocked)
+        .filter(UserORM.id == jwt_data["sub"])
+        .first()
+    )
+    if row is None:
+        return True
+    generation, is_blocked = row
+    return is_blocked or generation != jwt_data.get("generation", 0)
 
 
 @jwt.expired_token_loader
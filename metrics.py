@@ -0,0 +1,342 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from flask import g, request
+from sqlalchemy import event
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Value:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ("upper_bounds", "counts", "sum", "lock")
+
+    def __init__(self, upper_bounds):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, amount):
+        index = bisect_left(self.upper_bounds, amount)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += amount
+
+
+class Metric:
+    """
+    A metric family. Children are created once per distinct label tuple and reused afterwards,
+    so recording a sample only updates preallocated counters.
+    """
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            yield self.name, _format_labels(self.labelnames, values), child.value
+
+    def expose(self, others=None):
+        """
+        `others` maps (sample name, labels) to values from other processes, which are added to ours.
+        """
+        samples = {}
+        for name, labels, value in self._samples():
+            samples[(name, labels)] = value
+        for key, value in (others or {}).items():
+            samples[key] = samples.get(key, 0) + value
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for (name, labels), value in samples.items():
+            lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def _samples(self):
+        if self.function is not None:
+            yield self.name, "", self.function()
+            return
+        yield from super()._samples()
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, amount):
+        self.labels().observe(amount)
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            with child.lock:
+                counts = list(child.counts)
+                total = child.sum
+            cumulative = 0
+            for upper_bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(float(upper_bound))}"'
+                yield f"{self.name}_bucket", _format_labels(self.labelnames, values, le), cumulative
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class Registry:
+    """
+    When several worker processes serve the app (see serve.py), each one periodically writes a snapshot
+    of its samples to `multiprocess_dir` as <pid>.json, and exposition adds the other workers' snapshots
+    to the local samples. Counters and histograms of workers that exited are folded into dead.json by the
+    master so totals never go backwards; their gauges are dropped. Function gauges are always local.
+    """
+
+    DEAD_SNAPSHOT = "dead.json"
+
+    def __init__(self):
+        self._metrics = []
+        self.multiprocess_dir = None
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def snapshot(self):
+        return [
+            [metric.name, name, labels, value]
+            for metric in self._metrics
+            if getattr(metric, "function", None) is None
+            for name, labels, value in metric._samples()
+        ]
+
+    def write_snapshot(self):
+        path = os.path.join(self.multiprocess_dir, f"{os.getpid()}.json")
+        with open(path + ".tmp", "w") as file:
+            json.dump(self.snapshot(), file)
+        os.replace(path + ".tmp", path)
+
+    def _read_snapshot(self, filename):
+        try:
+            with open(os.path.join(self.multiprocess_dir, filename)) as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return []
+
+    def _other_samples(self):
+        types = {metric.name: metric.type for metric in self._metrics}
+        others = {}
+        for filename in os.listdir(self.multiprocess_dir):
+            if not filename.endswith(".json") or filename == f"{os.getpid()}.json":
+                continue
+            for metric_name, name, labels, value in self._read_snapshot(filename):
+                if metric_name not in types:
+                    continue
+                samples = others.setdefault(metric_name, {})
+                samples[(name, labels)] = samples.get((name, labels), 0) + value
+        return others
+
+    def retire(self, pid):
+        """
+        Fold the last snapshot of an exited worker into dead.json, keeping only cumulative samples.
+        """
+        cumulative = {metric.name for metric in self._metrics if metric.type != "gauge"}
+        totals = {}
+        for filename in (self.DEAD_SNAPSHOT, f"{pid}.json"):
+            for metric_name, name, labels, value in self._read_snapshot(filename):
+                if metric_name in cumulative:
+                    key = (metric_name, name, labels)
+                    totals[key] = totals.get(key, 0) + value
+        path = os.path.join(self.multiprocess_dir, self.DEAD_SNAPSHOT)
+        with open(path + ".tmp", "w") as file:
+            json.dump([[*key, value] for key, value in totals.items()], file)
+        os.replace(path + ".tmp", path)
+        try:
+            os.remove(os.path.join(self.multiprocess_dir, f"{pid}.json"))
+        except FileNotFoundError:
+            pass
+
+    def expose(self):
+        others = self._other_samples() if self.multiprocess_dir else {}
+        return "\n".join(metric.expose(others.get(metric.name)) for metric in self._metrics) + "\n"
+
+
+registry = Registry()
+
+REQUESTS = registry.register(
+    Counter("http_requests_total", "Total HTTP requests by route, method and status.", ("route", "method", "status"))
+)
+REQUEST_LATENCY = registry.register(
+    Histogram("http_request_duration_seconds", "HTTP request latency by route and method.", ("route", "method"))
+)
+REQUESTS_IN_FLIGHT = registry.register(Gauge("http_requests_in_flight", "HTTP requests currently being served."))
+REQUESTS_REJECTED = registry.register(
+    Counter(
+        "http_requests_rejected_total",
+        "HTTP requests shed by admission control, by route class and reason.",
+        ("route_class", "reason"),
+    )
+)
+IMAGE_BYTES_SENT = registry.register(
+    Counter("image_file_bytes_sent_total", "Bytes of image files sent to clients.")
+)
+IMAGE_BYTES_RECEIVED = registry.register(
+    Counter("image_file_bytes_received_total", "Bytes of image files received from uploads.")
+)
+BLOB_CACHE_REQUESTS = registry.register(
+    Counter(
+        "blob_cache_requests_total",
+        "Image file reads by blob cache outcome (hit, miss, bypass for files too large to cache).",
+        ("result",),
+    )
+)
+BLOB_CACHE_BYTES_SAVED = registry.register(
+    Counter("blob_cache_bytes_saved_total", "Bytes of image files served from memory instead of disk.")
+)
+BLOB_CACHE_SIZE = registry.register(Gauge("blob_cache_bytes", "Bytes of image files held in the blob cache."))
+DB_QUERY_LATENCY = registry.register(
+    Histogram("db_query_duration_seconds", "Database statement execution time.", buckets=DB_BUCKETS)
+)
+
+
+def _before_request():
+    g.metrics_started_at = time.perf_counter()
+    g.metrics_in_flight = True
+    REQUESTS_IN_FLIGHT.inc()
+
+
+def _observe(status):
+    # Popped, so a request is counted once whichever hook gets to it first
+    started_at = g.pop("metrics_started_at", None)
+    if started_at is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_LATENCY.labels(route, request.method).observe(time.perf_counter() - started_at)
+        REQUESTS.labels(route, request.method, status).inc()
+
+
+def _after_request(response):
+    _observe(response.status_code)
+    return response
+
+
+def _teardown_request(exc):
+    # With PROPAGATE_EXCEPTIONS, Flask skips after_request for unhandled exceptions; they end up as 500s
+    _observe(500)
+    if g.pop("metrics_in_flight", False):
+        REQUESTS_IN_FLIGHT.dec()
+
+
+# The start time lives on the statement's execution context, which is discarded with it when the statement
+# fails, so nothing accumulates on the pooled connection
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started_at = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started_at = getattr(context, "_metrics_started_at", None)
+    if started_at is not None:
+        DB_QUERY_LATENCY.observe(time.perf_counter() - started_at)
+
+
+def init_app(app, db):
+    """
+    Install request hooks on the app and statement timing on its database engine.
+    """
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(db.engine, "after_cursor_execute", _after_cursor_execute)
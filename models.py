@@ -26,6 +26,12 @@ album_model = Model(
         "images": fields.List(
             fields.Integer, description="List of image IDs in the album"
         ),
+        "updated_at": fields.DateTime(
+            required=False, description="The date and time the album was last changed"
+        ),
+        "version": fields.Integer(
+            required=True, description="Incremented on every change, and used as the ETag"
+        ),
     },
 )
 
@@ -52,6 +58,13 @@ user_model = Model(
             required=True,
             description="The permission level of the user (0: visitor, 1: user, 2: admin).",
         ),
+        "image_count": fields.Integer(description="The number of images the user owns"),
+        "logical_bytes": fields.Integer(
+            description="The total size of the user's image files, counting every image"
+        ),
+        "unique_bytes": fields.Integer(
+            description="The total size of the distinct files the user's images reference"
+        ),
     },
 )
 
@@ -81,6 +94,9 @@ image_model = Model(
         "hash_value": fields.String(
             required=False, description="The hash value of the image"
         ),
+        "hash_algorithm": fields.String(
+            required=False, description="The algorithm the hash value was computed with (sha256, blake2b)"
+        ),
         "mimetype": fields.String(
             required=False, description="The MIME type of the image"
         ),
@@ -88,6 +104,30 @@ image_model = Model(
             required=True,
             description="The visibility of the image (0: public, 1: hidden, 2: private)",
         ),
+        "width": fields.Integer(
+            required=False, description="The width of the image in pixels"
+        ),
+        "height": fields.Integer(
+            required=False, description="The height of the image in pixels"
+        ),
+        "format": fields.String(
+            required=False, description="The format detected from the file header (png, jpeg, gif, webp, bmp)"
+        ),
+        "size": fields.Integer(
+            required=False, description="The size of the image file in bytes"
+        ),
+        "taken_at": fields.DateTime(
+            required=False, description="The capture time recorded in the EXIF data"
+        ),
+        "orientation": fields.Integer(
+            required=False, description="The EXIF orientation of the image (1-8)"
+        ),
+        "updated_at": fields.DateTime(
+            required=False, description="The date and time the image was last changed"
+        ),
+        "version": fields.Integer(
+            required=True, description="Incremented on every change, and used as the ETag"
+        ),
     },
 )
 
@@ -112,3 +152,176 @@ token_model = Model(
         ),
     },
 )
+
+file_url_model = Model(
+    "FileUrl",
+    {
+        "url": fields.String(
+            required=True, description="Signed path that downloads the file without authentication"
+        ),
+        "expires_at": fields.DateTime(required=True, description="When the URL stops working"),
+    },
+)
+
+stats_model = Model(
+    "Stats",
+    {
+        "views": fields.Integer(required=True, description="How many times the metadata was fetched"),
+        "downloads": fields.Integer(required=True, description="How many times the file was downloaded"),
+    },
+)
+
+popular_image_model = Model(
+    "PopularImage",
+    {
+        "rank": fields.Integer(required=True, description="Position in the ranking, from 1"),
+        "image_id": fields.Integer(required=True, description="The image identifier"),
+        "views": fields.Integer(required=True, description="Views when the ranking was built"),
+        "downloads": fields.Integer(required=True, description="Downloads when the ranking was built"),
+    },
+)
+
+popular_images_model = Model(
+    "PopularImages",
+    {
+        "images": fields.List(fields.Nested(popular_image_model), required=True, description="Most popular first"),
+        "refreshed_at": fields.DateTime(description="When the ranking was built"),
+    },
+)
+
+timeline_bucket_model = Model(
+    "TimelineBucket",
+    {
+        "date": fields.String(required=True, description="The day (YYYY-MM-DD) or month (YYYY-MM)"),
+        "count": fields.Integer(required=True, description="How many images the caller can list were created in it"),
+    },
+)
+
+timeline_model = Model(
+    "Timeline",
+    {
+        "granularity": fields.String(required=True, description="day or month"),
+        "buckets": fields.List(fields.Nested(timeline_bucket_model), required=True, description="Newest first"),
+    },
+)
+
+bulk_delete_item_model = Model(
+    "BulkDeleteItem",
+    {
+        "id": fields.Integer(required=True, description="The requested identifier"),
+        "status": fields.String(
+            required=True,
+            description="The outcome for this identifier (deleted, not_found, forbidden)",
+        ),
+    },
+)
+
+bulk_delete_model = Model(
+    "BulkDeleteResult",
+    {
+        "deleted": fields.Integer(
+            required=True, description="The number of rows deleted"
+        ),
+        "results": fields.List(
+            fields.Nested(bulk_delete_item_model),
+            required=True,
+            description="The outcome for each identifier",
+        ),
+    },
+)
+
+bulk_tag_model = Model(
+    "BulkTagResult",
+    {
+        "updated": fields.Integer(required=True, description="The number of images changed"),
+        "results": fields.List(
+            fields.Nested(bulk_delete_item_model),
+            required=True,
+            description="The outcome for each identifier (updated, not_found, forbidden)",
+        ),
+    },
+)
+
+tag_model = Model(
+    "Tag",
+    {
+        "name": fields.String(required=True, description="The tag name"),
+        "count": fields.Integer(required=True, description="How many images the caller can list carry it"),
+    },
+)
+
+tags_list_model = Model(
+    "TagsList",
+    {"tags": fields.List(fields.Nested(tag_model), required=True, description="Most used first")},
+)
+
+image_tags_model = Model(
+    "ImageTags",
+    {"tags": fields.List(fields.String, required=True, description="The image's tag names")},
+)
+
+job_model = Model(
+    "Job",
+    {
+        "id": fields.Integer(required=True, description="The job identifier"),
+        "kind": fields.String(required=True, description="What the job does"),
+        "target_id": fields.Integer(description="The identifier the job acts on"),
+        "status": fields.String(
+            required=True, description="The job status (pending, running, done, failed)"
+        ),
+        "progress": fields.Integer(required=True, description="Rows processed so far"),
+        "total": fields.Integer(description="Rows to process, counted when the job was created"),
+        "error": fields.String(description="Why the job failed"),
+        "created_at": fields.DateTime(required=True, description="The job creation time"),
+        "finished_at": fields.DateTime(description="The job completion time"),
+    },
+)
+
+scrub_issue_model = Model(
+    "ScrubIssue",
+    {
+        "name": fields.String(required=True, description="The blob or variant file name"),
+        "problem": fields.String(required=True, description="corrupt, missing or orphaned"),
+    },
+)
+
+scrub_run_model = Model(
+    "ScrubRun",
+    {
+        "id": fields.Integer(required=True, description="The scrub run identifier"),
+        "started_at": fields.DateTime(required=True, description="When the run started"),
+        "finished_at": fields.DateTime(description="When the run finished, empty while it is incomplete"),
+        "checked": fields.Integer(required=True, description="Referenced blobs checked so far"),
+        "bytes_read": fields.Integer(required=True, description="Bytes re-hashed so far"),
+        "corrupt": fields.Integer(required=True, description="Blobs whose contents don't match their hash"),
+        "missing": fields.Integer(required=True, description="Referenced blobs not in storage"),
+        "orphaned": fields.Integer(required=True, description="Stored files no image references"),
+        "issues": fields.List(fields.Nested(scrub_issue_model), description="The problems found, first ones first"),
+    },
+)
+
+change_model = Model(
+    "Change",
+    {
+        "seq": fields.Integer(required=True, description="The sequence number of the change"),
+        "kind": fields.String(required=True, description="The kind of object that changed (image, album)"),
+        "id": fields.Integer(required=True, description="The identifier of the object that changed"),
+        "op": fields.String(
+            required=True,
+            description="upsert with the current state, or delete when the object is gone or no longer visible",
+        ),
+        "image": fields.Nested(image_model, allow_null=True, description="The image, for image upserts"),
+        "album": fields.Nested(album_model, allow_null=True, description="The album, for album upserts"),
+    },
+)
+
+changes_list_model = Model(
+    "ChangesList",
+    {
+        "changes": fields.List(
+            fields.Nested(change_model), required=True, description="Changes in sequence order"
+        ),
+        "next": fields.Integer(required=True, description="The `since` to pass on the next request"),
+        "has_more": fields.Boolean(required=True, description="Whether more changes are available now"),
+    },
+)
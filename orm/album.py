@@ -9,6 +9,9 @@ class AlbumORM(db.Model):
     created_at = Column(DateTime, server_default=func.now())
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     visibility = Column(Integer, default=1)
+    updated_at = Column(DateTime, default=func.now(), server_default=func.now(), onupdate=func.now())
+    # Bumped by every write, and used as the ETag
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     images = db.relationship(
         "ImageORM",
         secondary="album_images",
@@ -16,15 +19,32 @@ class AlbumORM(db.Model):
         backref=db.backref("albums", lazy=True),
     )
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "description": self.description,
-            "created_at": self.created_at.isoformat(),
-            "owner_id": self.owner_id,
-            "visibility": self.visibility,
-            "images": [image.id for image in self.images],
-        }
+    FIELDS = (
+        "id",
+        "album_name",
+        "description",
+        "created_at",
+        "owner_id",
+        "visibility",
+        "images",
+        "updated_at",
+        "version",
+    )
+
+    def to_dict(self, fields=None):
+        """
+        Serialize the album, or only the given fields so that columns left unloaded are never read.
+        """
+        data = {}
+        for name in fields or self.FIELDS:
+            if name == "images":
+                data[name] = [image.id for image in self.images]
+            elif name in ("created_at", "updated_at"):
+                value = getattr(self, name)
+                data[name] = value.isoformat() if value else None
+            else:
+                data[name] = getattr(self, name)
+        return data
 
 
 class AlbumImagesORM(db.Model):
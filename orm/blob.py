@@ -0,0 +1,46 @@
+from sqlalchemy import Column, String, DateTime, func
+from extensions import db
+from orm.image import ImageORM
+
+
+class BlobCleanupORM(db.Model):
+    """
+    Blobs no image referenced when the row was written. `flask cleanup-blobs` re-checks and removes them.
+    """
+
+    __tablename__ = "blob_cleanup"
+    hash_value = Column(String(64), primary_key=True)
+    created_at = Column(DateTime, server_default=func.now())
+
+    @staticmethod
+    def enqueue_orphans(hash_values):
+        """
+        Queue the given blobs for removal if no image references them any more.
+        Runs in the caller's transaction.
+        """
+        hash_values = {hash_value for hash_value in hash_values if hash_value}
+        if not hash_values:
+            return
+        referenced = {
+            row.hash_value
+            for row in db.session.query(ImageORM.hash_value)
+            .filter(ImageORM.hash_value.in_(hash_values))
+            .distinct()
+        }
+        queued = {
+            row.hash_value
+            for row in db.session.query(BlobCleanupORM.hash_value).filter(
+                BlobCleanupORM.hash_value.in_(hash_values - referenced)
+            )
+        }
+        db.session.add_all(
+            BlobCleanupORM(hash_value=hash_value)
+            for hash_value in hash_values - referenced - queued
+        )
+
+    @staticmethod
+    def dequeue(hash_value):
+        """
+        Keep a blob that is referenced again from being removed.
+        """
+        BlobCleanupORM.query.filter_by(hash_value=hash_value).delete()
@@ -0,0 +1,62 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index, func, insert, literal, select
+from extensions import db
+
+
+class ChangeORM(db.Model):
+    """
+    Change log for client sync. Rows are written in the same transaction as the change they record, as its
+    last statement before the commit, and only say which object changed; the feed serves the object's
+    current state.
+    """
+
+    __tablename__ = "changes"
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    # image or album
+    kind = Column(String(16), nullable=False)
+    object_id = Column(Integer, nullable=False)
+    # upsert or delete
+    op = Column(String(8), nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), index=True)
+
+    __table_args__ = (Index("ix_changes_kind_object_id", "kind", "object_id"),)
+
+    @staticmethod
+    def record(kind, op, ids):
+        """
+        Record a change to each of the given objects. Runs in the caller's transaction, and has to be the
+        last thing it does before committing: the feed holds changes back for CHANGES_SETTLE_SECONDS after
+        they are recorded, and a commit later than that could land behind a client's cursor.
+        """
+        if ids:
+            db.session.execute(
+                insert(ChangeORM),
+                [{"kind": kind, "object_id": id, "op": op} for id in ids],
+            )
+
+    @staticmethod
+    def record_select(kind, op, ids):
+        """
+        Record a change to each object whose ID the `ids` select returns, without fetching them. Like
+        `record`, the last thing before the commit.
+        """
+        db.session.execute(
+            insert(ChangeORM).from_select(
+                ["kind", "object_id", "op"],
+                select(literal(kind), ids.subquery().c[0], literal(op)).distinct(),
+            )
+        )
+
+
+class ChangeHorizonORM(db.Model):
+    """
+    A single row holding the highest sequence number compaction has discarded. Clients that last synced
+    before it may have missed changes.
+    """
+
+    __tablename__ = "change_horizon"
+    id = Column(Integer, primary_key=True)
+    seq = Column(Integer, nullable=False, default=0)
+
+    @staticmethod
+    def get():
+        return db.session.query(ChangeHorizonORM.seq).filter_by(id=1).scalar() or 0
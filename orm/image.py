@@ -1,23 +1,71 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, func
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, func
+from sqlalchemy.dialects import sqlite
+from datetime import datetime
 from extensions import db
 
+# SQLite's CURRENT_TIMESTAMP has whole seconds; binding parameters the same way keeps comparisons exact
+SQLITE_SECONDS = sqlite.DATETIME(
+    storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"
+)
+
 class ImageORM(db.Model):
     __tablename__ = "images"
     id = Column(Integer, primary_key=True)
     description = Column(String(255))
-    created_at = Column(DateTime, server_default=func.now())
+    created_at = Column(DateTime().with_variant(SQLITE_SECONDS, "sqlite"), server_default=func.now())
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     hash_value = Column(String(64), nullable=True)
+    # The algorithm hash_value was computed with; blobs stored before it was recorded are sha256
+    hash_algorithm = Column(String(16), nullable=True, server_default="sha256")
     mimetype = Column(String(64), nullable=True)
     visibility = Column(Integer, default=1)
+    width = Column(Integer, nullable=True, index=True)
+    height = Column(Integer, nullable=True, index=True)
+    format = Column(String(16), nullable=True, index=True)
+    size = Column(Integer, nullable=True, index=True)
+    taken_at = Column(DateTime, nullable=True, index=True)
+    orientation = Column(Integer, nullable=True)
+    updated_at = Column(DateTime, default=func.now(), server_default=func.now(), onupdate=func.now())
+    # Bumped by every write, and used as the ETag
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    # Serves an owner's images in creation order and date cursors within them
+    __table_args__ = (Index("ix_images_owner_id_created_at", "owner_id", "created_at"),)
+
+    FIELDS = (
+        "id",
+        "description",
+        "created_at",
+        "owner_id",
+        "hash_value",
+        "hash_algorithm",
+        "mimetype",
+        "visibility",
+        "width",
+        "height",
+        "format",
+        "size",
+        "taken_at",
+        "orientation",
+        "updated_at",
+        "version",
+    )
+
+    def set_file_metadata(self, metadata, size):
+        metadata = metadata or {}
+        self.size = size
+        self.format = metadata.get("format")
+        self.width = metadata.get("width")
+        self.height = metadata.get("height")
+        self.orientation = metadata.get("orientation")
+        self.taken_at = metadata.get("taken_at")
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "description": self.description,
-            "created_at": self.created_at.isoformat(),
-            "owner_id": self.owner_id,
-            "hash_value": self.hash_value,
-            "mimetype": self.mimetype,
-            "visibility": self.visibility,
-        }
\ No newline at end of file
+    def to_dict(self, fields=None):
+        """
+        Serialize the image, or only the given fields so that columns left unloaded are never read.
+        """
+        data = {}
+        for name in fields or self.FIELDS:
+            value = getattr(self, name)
+            data[name] = value.isoformat() if isinstance(value, datetime) else value
+        return data
@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, func
+from extensions import db
+
+
+class JobORM(db.Model):
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(32), nullable=False)
+    target_id = Column(Integer, index=True)
+    # pending, running, done or failed
+    status = Column(String(16), nullable=False, default="pending")
+    progress = Column(Integer, nullable=False, default=0)
+    total = Column(Integer)
+    error = Column(String(255))
+    created_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"))
+    created_at = Column(DateTime, server_default=func.now())
+    finished_at = Column(DateTime)
+    # host:pid of the process running the job, which bumps heartbeat_at while it is queued or running
+    owner = Column(String(255))
+    heartbeat_at = Column(DateTime)
+    # kind:target_id while pending or running and NULL after, so only one such job can be started at a time
+    active_key = Column(String(64), unique=True)
+
+    @staticmethod
+    def key(kind, target_id=None):
+        return f"{kind}:{'' if target_id is None else target_id}"
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "target_id": self.target_id,
+            "status": self.status,
+            "progress": self.progress,
+            "total": self.total,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
@@ -0,0 +1,46 @@
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, String, func
+from extensions import db
+
+
+class ScrubRunORM(db.Model):
+    """
+    One pass of the storage scrubber. Blobs are checked in hash order and `last_hash` is committed with each
+    batch, so an interrupted run resumes where it stopped.
+    """
+
+    __tablename__ = "scrub_runs"
+    id = Column(Integer, primary_key=True)
+    started_at = Column(DateTime, server_default=func.now())
+    finished_at = Column(DateTime)
+    last_hash = Column(String(128), nullable=False, default="")
+    checked = Column(Integer, nullable=False, default=0)
+    bytes_read = Column(BigInteger, nullable=False, default=0)
+    corrupt = Column(Integer, nullable=False, default=0)
+    missing = Column(Integer, nullable=False, default=0)
+    orphaned = Column(Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "checked": self.checked,
+            "bytes_read": self.bytes_read,
+            "corrupt": self.corrupt,
+            "missing": self.missing,
+            "orphaned": self.orphaned,
+        }
+
+
+class ScrubIssueORM(db.Model):
+    """
+    A blob a scrub run found wrong: corrupt (contents don't match the name), missing (referenced by images
+    but not in storage) or orphaned (in storage but referenced by no image and not queued for cleanup).
+    """
+
+    __tablename__ = "scrub_issues"
+    id = Column(Integer, primary_key=True)
+    run_id = Column(Integer, ForeignKey("scrub_runs.id", ondelete="CASCADE"), nullable=False, index=True)
+    # A blob or variant file name
+    name = Column(String(255), nullable=False)
+    problem = Column(String(16), nullable=False)
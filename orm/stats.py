@@ -0,0 +1,95 @@
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String, delete, func, insert, select
+from sqlalchemy.dialects import mysql, sqlite
+from extensions import db
+from orm.image import ImageORM
+
+
+class StatsORM(db.Model):
+    """
+    View and download counts per object, written in batches by stats.StatsRecorder rather than per request.
+    """
+
+    __tablename__ = "access_stats"
+    # image or album
+    kind = Column(String(16), primary_key=True)
+    object_id = Column(Integer, primary_key=True)
+    views = Column(BigInteger, nullable=False, default=0)
+    downloads = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    @staticmethod
+    def add(rows):
+        """
+        Add the given {kind, object_id, views, downloads} increments in one upsert statement.
+        Runs in the caller's transaction.
+        """
+        if not rows:
+            return
+        table = StatsORM.__table__
+        if db.engine.dialect.name == "mysql":
+            statement = mysql.insert(table)
+            statement = statement.on_duplicate_key_update(
+                views=table.c.views + statement.inserted.views,
+                downloads=table.c.downloads + statement.inserted.downloads,
+                updated_at=func.now(),
+            )
+        else:
+            statement = sqlite.insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.kind, table.c.object_id],
+                set_={
+                    "views": table.c.views + statement.excluded.views,
+                    "downloads": table.c.downloads + statement.excluded.downloads,
+                    "updated_at": func.now(),
+                },
+            )
+        db.session.execute(statement, rows)
+
+    @staticmethod
+    def forget(kind, ids):
+        """
+        Drop the counts of deleted objects. Runs in the caller's transaction.
+        """
+        db.session.execute(delete(StatsORM).where(StatsORM.kind == kind, StatsORM.object_id.in_(ids)))
+
+
+class PopularImageORM(db.Model):
+    """
+    The most viewed and downloaded images, ranked when the stats are flushed so reads are a plain scan.
+    """
+
+    __tablename__ = "popular_images"
+    rank = Column(Integer, primary_key=True)
+    image_id = Column(Integer, nullable=False)
+    views = Column(BigInteger, nullable=False)
+    downloads = Column(BigInteger, nullable=False)
+    # Naive UTC, set by the refreshing process
+    refreshed_at = Column(DateTime, nullable=False)
+
+    @staticmethod
+    def refresh(size, refreshed_at):
+        """
+        Replace the ranking with the current top `size` public images by views plus downloads.
+        Runs in the caller's transaction.
+        """
+        score = StatsORM.views + StatsORM.downloads
+        top = (
+            select(StatsORM.object_id, StatsORM.views, StatsORM.downloads)
+            .join(ImageORM, ImageORM.id == StatsORM.object_id)
+            .where(StatsORM.kind == "image", ImageORM.visibility == 0)
+            .order_by(score.desc(), StatsORM.object_id)
+            .limit(size)
+        )
+        rows = [
+            {
+                "rank": rank,
+                "image_id": row.object_id,
+                "views": row.views,
+                "downloads": row.downloads,
+                "refreshed_at": refreshed_at,
+            }
+            for rank, row in enumerate(db.session.execute(top), start=1)
+        ]
+        db.session.execute(delete(PopularImageORM))
+        if rows:
+            db.session.execute(insert(PopularImageORM), rows)
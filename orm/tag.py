@@ -0,0 +1,54 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, func
+from sqlalchemy.dialects import mysql, sqlite
+from extensions import db
+
+
+def _insert_ignoring(table):
+    """
+    An INSERT that skips rows clashing with an existing key, so concurrent writers can't fail each other.
+    """
+    if db.engine.dialect.name == "mysql":
+        return mysql.insert(table).prefix_with("IGNORE")
+    return sqlite.insert(table).on_conflict_do_nothing()
+
+
+class TagORM(db.Model):
+    """
+    A tag, with counts of the images carrying it kept up to date by every write to image_tags, so facet
+    counts are read from here rather than counted.
+    """
+
+    __tablename__ = "tags"
+    id = Column(Integer, primary_key=True)
+    name = Column(String(64), nullable=False, unique=True)
+    image_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Images with visibility 0, which is all anonymous users can see
+    public_count = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime, server_default=func.now())
+
+    @staticmethod
+    def create(names):
+        """
+        Create the tags that don't exist yet. Runs in the caller's transaction.
+        """
+        db.session.execute(_insert_ignoring(TagORM.__table__).values([{"name": name} for name in names]))
+
+
+class ImageTagsORM(db.Model):
+    __tablename__ = "image_tags"
+    # The primary key serves "tags of an image", the index "images with a tag"
+    image_id = Column(Integer, ForeignKey("images.id"), primary_key=True)
+    tag_id = Column(Integer, ForeignKey("tags.id"), primary_key=True)
+
+    __table_args__ = (Index("ix_image_tags_tag_id_image_id", "tag_id", "image_id"),)
+
+    @staticmethod
+    def link(tag_id, image_ids):
+        """
+        Link the images to the tag, skipping links that already exist, and return how many were added.
+        Runs in the caller's transaction.
+        """
+        if not image_ids:
+            return 0
+        rows = [{"image_id": image_id, "tag_id": tag_id} for image_id in image_ids]
+        return db.session.execute(_insert_ignoring(ImageTagsORM.__table__).values(rows)).rowcount
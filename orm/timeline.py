@@ -0,0 +1,44 @@
+from sqlalchemy import Column, ForeignKey, Integer, String
+from sqlalchemy.dialects import mysql, sqlite
+from extensions import db
+
+
+class TimelineORM(db.Model):
+    """
+    How many images each owner created on each day, kept up to date by every image create, delete and
+    visibility change, so date histograms are summed from here rather than counted from images.
+    """
+
+    __tablename__ = "image_timeline"
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    # YYYY-MM-DD of created_at, so a month is its first seven characters
+    day = Column(String(10), primary_key=True)
+    image_count = Column(Integer, nullable=False, default=0)
+    # Images with visibility 0, which is all anonymous users can see
+    public_count = Column(Integer, nullable=False, default=0)
+
+    @staticmethod
+    def add(rows):
+        """
+        Add the given {owner_id, day, image_count, public_count} increments, which may be negative, in one
+        upsert statement. Runs in the caller's transaction.
+        """
+        if not rows:
+            return
+        table = TimelineORM.__table__
+        if db.engine.dialect.name == "mysql":
+            statement = mysql.insert(table)
+            statement = statement.on_duplicate_key_update(
+                image_count=table.c.image_count + statement.inserted.image_count,
+                public_count=table.c.public_count + statement.inserted.public_count,
+            )
+        else:
+            statement = sqlite.insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.owner_id, table.c.day],
+                set_={
+                    "image_count": table.c.image_count + statement.excluded.image_count,
+                    "public_count": table.c.public_count + statement.excluded.public_count,
+                },
+            )
+        db.session.execute(statement, rows)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -11,8 +11,15 @@ class UserORM(db.Model):
     nickname = Column(String(64))
     password_hash = Column(String(192))
     permission_level = Column(Integer, default=1)
-    albums = db.relationship("AlbumORM", backref="owner", lazy=True)
-    images = db.relationship("ImageORM", backref="owner", lazy=True)
+    # Embedded in tokens and bumped to revoke them all, e.g. when the permission level changes
+    token_generation = Column(Integer, nullable=False, default=0, server_default="0")
+    # Storage usage, kept up to date by usage.py in the same transactions that change images
+    image_count = Column(Integer, nullable=False, default=0, server_default="0")
+    logical_bytes = Column(BigInteger, nullable=False, default=0, server_default="0")
+    unique_bytes = Column(BigInteger, nullable=False, default=0, server_default="0")
+    # Owned rows are removed by bulk.delete_user, never by loading the collections
+    albums = db.relationship("AlbumORM", backref="owner", lazy=True, passive_deletes="all")
+    images = db.relationship("ImageORM", backref="owner", lazy=True, passive_deletes="all")
 
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -20,19 +27,36 @@ class UserORM(db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
     
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "username": self.username,
-            "nickname": self.nickname,
-            "permission_level": self.permission_level,
-            "albums": [album.id for album in self.albums],
-            "images": [image.id for image in self.images],
-        }
+    FIELDS = (
+        "id",
+        "username",
+        "nickname",
+        "permission_level",
+        "image_count",
+        "logical_bytes",
+        "unique_bytes",
+        "albums",
+        "images",
+    )
+
+    def to_dict(self, fields=None):
+        """
+        Serialize the user, or only the given fields so that unrequested collections are never loaded.
+        """
+        data = {}
+        for name in fields or self.FIELDS:
+            if name in ("albums", "images"):
+                data[name] = [item.id for item in getattr(self, name)]
+            else:
+                data[name] = getattr(self, name)
+        return data
 
 
 class TokenBlocklistORM(db.Model):
     __tablename__ = "token_blocklist"
     id = Column(Integer, primary_key=True)
-    jti = Column(String(36), nullable=False)
-    created_at = Column(DateTime, server_default=func.now())
\ No newline at end of file
+    jti = Column(String(36), nullable=False, index=True)
+    created_at = Column(DateTime, server_default=func.now())
+    # The revoked token's own expiry (Unix time); past it the row is useless and `flask compact-token-blocklist`
+    # removes it
+    exp = Column(Integer, nullable=True, index=True)
\ No newline at end of file
@@ -0,0 +1,96 @@
+import random
+import time
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+
+
+class SQLProfile:
+    """
+    Statements executed while serving one request, grouped by their parameterized SQL text.
+    """
+
+    __slots__ = ("count", "duration", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = {}
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        entry = self.statements.get(statement)
+        if entry is None:
+            self.statements[statement] = [1, duration]
+        else:
+            entry[0] += 1
+            entry[1] += duration
+
+    def repeated(self, threshold):
+        return [
+            (statement, count, duration)
+            for statement, (count, duration) in self.statements.items()
+            if count > threshold
+        ]
+
+
+def _current_profile():
+    if not has_app_context():
+        return None
+    return g.get("sql_profile")
+
+
+def _before_request():
+    sample_rate = current_app.config["SQL_PROFILER_SAMPLE_RATE"]
+    if sample_rate > 0 and random.random() < sample_rate:
+        g.sql_profile = SQLProfile()
+
+
+def _after_request(response):
+    profile = g.pop("sql_profile", None)
+    if profile is None:
+        return response
+
+    response.headers.add(
+        "Server-Timing", f'db;dur={profile.duration * 1000:.2f};desc="{profile.count} queries"'
+    )
+
+    threshold = current_app.config["SQL_PROFILER_REPEAT_THRESHOLD"]
+    for statement, count, duration in profile.repeated(threshold):
+        current_app.logger.warning(
+            "Possible N+1 query: %s %s executed the same statement %d times (%.2f ms): %s",
+            request.method,
+            request.path,
+            count,
+            duration * 1000,
+            " ".join(statement.split()),
+        )
+    return response
+
+
+# Kept on the statement's execution context, which is discarded with it when the statement fails
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _current_profile() is not None:
+        context._profiler_started_at = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile()
+    started_at = getattr(context, "_profiler_started_at", None)
+    if profile is not None and started_at is not None:
+        profile.record(statement, time.perf_counter() - started_at)
+
+
+def init_app(app, db):
+    """
+    Profile the SQL issued by a sample of requests. Disabled when SQL_PROFILER_SAMPLE_RATE is 0.
+    """
+    if app.config["SQL_PROFILER_SAMPLE_RATE"] <= 0:
+        return
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(db.engine, "after_cursor_execute", _after_cursor_execute)
@@ -1,16 +1,43 @@
 from flask_restx import Namespace, Resource, reqparse, marshal
 from flask_jwt_extended import jwt_required, current_user
-from models import album_model, albums_list_model, message_model
-from orm.album import AlbumORM
+from flask import Response, current_app, request, stream_with_context
+from models import (
+    album_model,
+    albums_list_model,
+    message_model,
+    bulk_delete_item_model,
+    bulk_delete_model,
+    stats_model,
+)
+from orm.album import AlbumORM, AlbumImagesORM
 from orm.image import ImageORM
+from orm.change import ChangeORM
+from orm.stats import StatsORM
 from extensions import db
-from sqlalchemy import or_
+from archive import stream_zip
+from stats import stats
+from fieldsets import fields_parser, load_fields, project
+from conditional import etag, not_modified, not_modified_response, update_owned
+from bulk import (
+    BulkDeleteError,
+    bulk_delete_parser,
+    chunked,
+    delete_albums,
+    resolve_targets,
+    results_body,
+)
+from sqlalchemy import or_, delete, insert
+import mimetypes
+import os
 
 albums_namespace = Namespace("albums", description="Album operations")
 
 albums_namespace.add_model("Album", album_model)
 albums_namespace.add_model("AlbumsList", albums_list_model)
 albums_namespace.add_model("Message", message_model)
+albums_namespace.add_model("BulkDeleteItem", bulk_delete_item_model)
+albums_namespace.add_model("BulkDeleteResult", bulk_delete_model)
+albums_namespace.add_model("Stats", stats_model)
 
 album_parser = reqparse.RequestParser()
 album_parser.add_argument(
@@ -33,6 +60,31 @@ album_parser.add_argument(
     help="List of image IDs to include in the album.",
 )
 
+album_get_parser = fields_parser(album_model)
+
+archive_parser = reqparse.RequestParser()
+archive_parser.add_argument(
+    "offset",
+    type=int,
+    location="args",
+    default=0,
+    help="Number of images to skip, to resume an interrupted download.",
+)
+
+UPDATE_ERRORS = {
+    403: "Permission denied",
+    404: "Album not found",
+    412: "Album has been modified, fetch it again",
+}
+
+
+def can_view(album):
+    if album.visibility == 1 and not current_user:
+        return False
+    if album.visibility == 2 and (not current_user or album.owner_id != current_user.id):
+        return False
+    return True
+
 
 @albums_namespace.route("/<int:album_id>")
 @albums_namespace.param("album_id", "The album identifier")
@@ -40,23 +92,46 @@ class AlbumResource(Resource):
 
     @jwt_required(optional=True)
     @albums_namespace.doc(security="Bearer Auth")
+    @albums_namespace.expect(album_get_parser)
     @albums_namespace.response(200, "Success", album_model)
     @albums_namespace.response(403, "Permission denied", message_model)
     @albums_namespace.response(404, "Album not found", message_model)
     def get(self, album_id):
         """
         Get album by ID.
+        ---
+        Pass `fields` to select and return only some of the fields.
+        The response carries the album version as its ETag, and `If-None-Match` with a current ETag returns 304.
         """
-        album = AlbumORM.query.filter_by(id=album_id).first()
+        fields = album_get_parser.parse_args()["fields"] or list(album_model)
+        if request.if_none_match:
+            # Only the version and what the permission check needs, before loading the album and its images
+            current = (
+                db.session.query(AlbumORM.version, AlbumORM.visibility, AlbumORM.owner_id)
+                .filter_by(id=album_id)
+                .first()
+            )
+            if current and can_view(current) and not_modified(current.version):
+                stats.view("album", album_id)
+                return not_modified_response(current.version)
+
+        album = (
+            AlbumORM.query.options(
+                *load_fields(AlbumORM, fields, required=("visibility", "owner_id", "version"))
+            )
+            .filter_by(id=album_id)
+            .first()
+        )
         if not album:
             return marshal({"message": "Album not found"}, message_model), 404
-        if album.visibility == 1 and not current_user:
-            return marshal({"message": "Permission denied"}, message_model), 403
-        if album.visibility == 2 and (
-            not current_user or album.owner_id != current_user.id
-        ):
+        if not can_view(album):
             return marshal({"message": "Permission denied"}, message_model), 403
-        return marshal(album.to_dict(), album_model), 200
+        stats.view("album", album_id)
+        return (
+            marshal(album.to_dict(fields), project(album_model, fields)),
+            200,
+            {"ETag": etag(album.version)},
+        )
 
     @jwt_required()
     @albums_namespace.doc(security="Bearer Auth")
@@ -64,27 +139,48 @@ class AlbumResource(Resource):
     @albums_namespace.response(200, "Album updated successfully", message_model)
     @albums_namespace.response(404, "Album not found", message_model)
     @albums_namespace.response(403, "Permission denied", message_model)
+    @albums_namespace.response(412, "Album has been modified", message_model)
     def put(self, album_id):
         """
         Update album by ID.
+        ---
+        With `If-Match`, the update only applies if the album is still at that version.
         """
         data = album_parser.parse_args()
-        album = AlbumORM.query.filter_by(id=album_id).first()
-
-        if not album:
-            return marshal({"message": "Album not found"}, message_model), 404
-        if album.owner_id != current_user.id and current_user.permission_level < 2:
-            return marshal({"message": "Permission denied"}, message_model), 403
+        version, error = update_owned(
+            AlbumORM,
+            album_id,
+            {
+                "album_name": data["album_name"] if data["album_name"] else "Untitled",
+                "description": data["description"],
+                "visibility": data["visibility"],
+            },
+        )
+        if error:
+            db.session.rollback()
+            return marshal({"message": UPDATE_ERRORS[error]}, message_model), error
 
-        album.album_name = data["album_name"] if data["album_name"] else "Untitled"
-        album.description = data["description"]
-        album.visibility = data["visibility"]
-        album.images = [
-            ImageORM.query.get(id) for id in data["images"] if ImageORM.query.get(id)
+        # The album row is locked by the update above until the membership is rewritten
+        image_ids = [
+            row.id
+            for row in db.session.query(ImageORM.id).filter(
+                ImageORM.id.in_(set(data["images"]))
+            )
         ]
+        db.session.execute(delete(AlbumImagesORM).where(AlbumImagesORM.album_id == album_id))
+        if image_ids:
+            db.session.execute(
+                insert(AlbumImagesORM),
+                [{"album_id": album_id, "image_id": image_id} for image_id in image_ids],
+            )
+        ChangeORM.record("album", "upsert", [album_id])
 
         db.session.commit()
-        return marshal({"message": "Album updated successfully"}, message_model), 200
+        return (
+            marshal({"message": "Album updated successfully"}, message_model),
+            200,
+            {"ETag": etag(version)},
+        )
 
     @jwt_required()
     @albums_namespace.doc(security="Bearer Auth")
@@ -102,23 +198,152 @@ class AlbumResource(Resource):
         if album.owner_id != current_user.id and current_user.permission_level < 2:
             return marshal({"message": "Permission denied"}, message_model), 403
 
-        db.session.delete(album)
+        # The same cleanup as bulk deletes: image links, access statistics and the change feed
+        delete_albums([album_id])
 
         db.session.commit()
         return marshal({"message": "Album deleted successfully"}, message_model), 200
 
 
+@albums_namespace.route("/bulk-delete")
+class AlbumBulkDeleteResource(Resource):
+    @jwt_required()
+    @albums_namespace.doc(security="Bearer Auth")
+    @albums_namespace.expect(bulk_delete_parser)
+    @albums_namespace.response(200, "Success", bulk_delete_model)
+    @albums_namespace.response(400, "Invalid request", message_model)
+    @albums_namespace.response(403, "Permission denied", message_model)
+    def post(self):
+        """
+        Delete many albums at once.
+        ---
+        Takes either a list of `ids` or a filter (`owner_id`, `created_after`, `created_before`).
+        Only the albums are deleted, not the images in them.
+        """
+        args = bulk_delete_parser.parse_args()
+        try:
+            ids, results = resolve_targets(AlbumORM, args)
+        except BulkDeleteError as error:
+            return marshal({"message": error.message}, message_model), error.status
+
+        for chunk in chunked(ids):
+            delete_albums(chunk)
+            db.session.commit()
+
+        return marshal(results_body(results), bulk_delete_model), 200
+
+
+@albums_namespace.route("/<int:album_id>/stats")
+@albums_namespace.param("album_id", "The album identifier")
+class AlbumStatsResource(Resource):
+    @jwt_required(optional=True)
+    @albums_namespace.doc(security="Bearer Auth")
+    @albums_namespace.response(200, "Success", stats_model)
+    @albums_namespace.response(403, "Permission denied", message_model)
+    @albums_namespace.response(404, "Album not found", message_model)
+    def get(self, album_id):
+        """
+        Get view and archive download counts of an album.
+        ---
+        Counts are written every `STATS_FLUSH_SECONDS`, so the most recent requests may not be included yet.
+        """
+        album = (
+            db.session.query(AlbumORM.visibility, AlbumORM.owner_id, StatsORM.views, StatsORM.downloads)
+            .outerjoin(StatsORM, (StatsORM.kind == "album") & (StatsORM.object_id == AlbumORM.id))
+            .filter(AlbumORM.id == album_id)
+            .first()
+        )
+        if not album:
+            return marshal({"message": "Album not found"}, message_model), 404
+        if not can_view(album):
+            return marshal({"message": "Permission denied"}, message_model), 403
+        return marshal({"views": album.views or 0, "downloads": album.downloads or 0}, stats_model), 200
+
+
+@albums_namespace.route("/<int:album_id>/archive")
+@albums_namespace.param("album_id", "The album identifier")
+class AlbumArchiveResource(Resource):
+
+    @jwt_required(optional=True)
+    @albums_namespace.doc(security="Bearer Auth")
+    @albums_namespace.expect(archive_parser)
+    @albums_namespace.produces(["application/zip"])
+    @albums_namespace.response(200, "Success")
+    @albums_namespace.response(403, "Permission denied", message_model)
+    @albums_namespace.response(404, "Album not found", message_model)
+    def get(self, album_id):
+        """
+        Download every image in the album as a ZIP archive.
+        ---
+        The archive is streamed as it is built. Images the caller is not allowed to see are left out,
+        and images are ordered by ID so that `offset` can resume an interrupted download.
+        """
+        args = archive_parser.parse_args()
+        album = AlbumORM.query.filter_by(id=album_id).first()
+        if not album:
+            return marshal({"message": "Album not found"}, message_model), 404
+        if album.visibility == 1 and not current_user:
+            return marshal({"message": "Permission denied"}, message_model), 403
+        if album.visibility == 2 and (
+            not current_user or album.owner_id != current_user.id
+        ):
+            return marshal({"message": "Permission denied"}, message_model), 403
+
+        # Same rules as GET /images/<id>/file, checked for all members at once
+        if current_user:
+            visible = or_(
+                ImageORM.visibility.in_((0, 1)), ImageORM.owner_id == current_user.id
+            )
+        else:
+            visible = ImageORM.visibility == 0
+        images = (
+            db.session.query(
+                ImageORM.id, ImageORM.hash_value, ImageORM.mimetype, ImageORM.created_at
+            )
+            .join(AlbumImagesORM, AlbumImagesORM.image_id == ImageORM.id)
+            .filter(
+                AlbumImagesORM.album_id == album_id,
+                ImageORM.hash_value.isnot(None),
+                visible,
+            )
+            .order_by(ImageORM.id)
+            .offset(max(args["offset"], 0))
+            .all()
+        )
+
+        storage_path = current_app.config["STORAGE_PATH"]
+        entries = (
+            (
+                f"{image.id}{mimetypes.guess_extension(image.mimetype or '') or ''}",
+                os.path.join(storage_path, image.hash_value),
+                image.created_at,
+            )
+            for image in images
+        )
+        stats.download("album", album_id)
+        return Response(
+            stream_with_context(stream_zip(entries)),
+            mimetype="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="album-{album_id}.zip"'},
+        )
+
+
 @albums_namespace.route("")
 class AlbumListResource(Resource):
     @jwt_required(optional=True)
     @albums_namespace.doc(security="Bearer Auth")
+    @albums_namespace.expect(album_get_parser)
     @albums_namespace.response(200, "Success", albums_list_model)
     def get(self):
         """
         Get list of albums.
+        ---
+        Pass `fields` to select and return only some of the fields.
         """
+        fields = album_get_parser.parse_args()["fields"] or list(album_model)
+        query = AlbumORM.query.options(*load_fields(AlbumORM, fields))
         if current_user:
-            albums = AlbumORM.query.filter(
+            albums = query.filter(
                 or_(
                     AlbumORM.visibility == 0,
                     AlbumORM.owner_id == current_user.id,
@@ -126,12 +351,15 @@ class AlbumListResource(Resource):
                 )
             ).all()
         else:
-            albums = AlbumORM.query.filter(AlbumORM.visibility == 0).all()
+            albums = query.filter(AlbumORM.visibility == 0).all()
 
         return (
-            marshal(
-                {"albums": [album.to_dict() for album in albums]}, albums_list_model
-            ),
+            {
+                "albums": marshal(
+                    [album.to_dict(fields) for album in albums],
+                    project(album_model, fields),
+                )
+            },
             200,
         )
 
@@ -159,7 +387,8 @@ class AlbumListResource(Resource):
             ImageORM.query.get(id) for id in data["images"] if ImageORM.query.get(id)
         ]
         db.session.add(album)
-        current_user.albums.append(album)
+        db.session.flush()
+        ChangeORM.record("album", "upsert", [album.id])
 
         db.session.commit()
         return (
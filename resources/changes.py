@@ -0,0 +1,135 @@
+from flask import current_app
+from flask_restx import Namespace, Resource, reqparse, marshal
+from flask_jwt_extended import jwt_required
+from datetime import timedelta
+from models import (
+    message_model,
+    image_model,
+    album_model,
+    change_model,
+    changes_list_model,
+)
+from orm.change import ChangeORM, ChangeHorizonORM
+from orm.image import ImageORM
+from orm.album import AlbumORM
+from extensions import db
+from fieldsets import load_fields
+from resources.export import visible
+from sqlalchemy import func, select
+
+changes_namespace = Namespace("changes", description="Change feed operations")
+
+changes_namespace.add_model("Image", image_model)
+changes_namespace.add_model("Album", album_model)
+changes_namespace.add_model("Change", change_model)
+changes_namespace.add_model("ChangesList", changes_list_model)
+changes_namespace.add_model("Message", message_model)
+
+changes_parser = reqparse.RequestParser()
+changes_parser.add_argument(
+    "since",
+    type=int,
+    location="args",
+    help="Return changes after this sequence number. Omit to get the current position without changes.",
+)
+changes_parser.add_argument(
+    "limit",
+    type=int,
+    location="args",
+    default=100,
+    help="Maximum number of changes to return (at most 1000)",
+)
+
+MAX_LIMIT = 1000
+
+
+def load_visible(model, ids, options=()):
+    if not ids:
+        return {}
+    rows = model.query.options(*options).filter(model.id.in_(ids), visible(model))
+    return {row.id: row for row in rows}
+
+
+@changes_namespace.route("")
+class ChangesResource(Resource):
+    @jwt_required(optional=True)
+    @changes_namespace.doc(security="Bearer Auth")
+    @changes_namespace.expect(changes_parser)
+    @changes_namespace.response(200, "Success", changes_list_model)
+    @changes_namespace.response(410, "Too far behind, resync from the full lists", message_model)
+    def get(self):
+        """
+        Return what changed since the last sync.
+        ---
+        Each image or album that changed is listed once, as an `upsert` with its current state or as a `delete`
+        tombstone when it was deleted or is no longer visible to the caller. Start by calling without `since`,
+        then pass the returned `next`. A 410 means changes after `since` were compacted away, and the client
+        has to reload `GET /images` and `GET /albums`.
+        """
+        args = changes_parser.parse_args()
+        limit = min(max(args["limit"], 1), MAX_LIMIT)
+
+        # Sequence numbers are assigned on insert but become visible on commit, so a recent change can still
+        # be followed by one with a lower number. Writers record changes right before committing, and only
+        # settled changes are served to keep cursors safe.
+        settled = db.session.execute(select(func.now())).scalar() - timedelta(
+            seconds=current_app.config["CHANGES_SETTLE_SECONDS"]
+        )
+        if args["since"] is None:
+            latest = (
+                db.session.query(func.max(ChangeORM.seq))
+                .filter(ChangeORM.created_at <= settled)
+                .scalar()
+            )
+            return marshal({"changes": [], "next": latest or 0, "has_more": False}, changes_list_model), 200
+        if args["since"] < ChangeHorizonORM.get():
+            return (
+                marshal({"message": "Too far behind, resync from the full lists"}, message_model),
+                410,
+            )
+
+        rows = (
+            db.session.query(ChangeORM.seq, ChangeORM.kind, ChangeORM.object_id, ChangeORM.op)
+            .filter(ChangeORM.seq > args["since"], ChangeORM.created_at <= settled)
+            .order_by(ChangeORM.seq)
+            .limit(limit + 1)
+            .all()
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        # Only the latest change per object matters, since the current state is served
+        latest = {}
+        for row in rows:
+            latest[(row.kind, row.object_id)] = row
+        latest = sorted(latest.values(), key=lambda row: row.seq)
+
+        def upserted(kind):
+            return [row.object_id for row in latest if row.kind == kind and row.op == "upsert"]
+
+        objects = {
+            "image": load_visible(ImageORM, upserted("image")),
+            "album": load_visible(
+                AlbumORM, upserted("album"), load_fields(AlbumORM, list(album_model))
+            ),
+        }
+        changes = []
+        for row in latest:
+            change = {"seq": row.seq, "kind": row.kind, "id": row.object_id, "op": "delete"}
+            current = objects[row.kind].get(row.object_id) if row.op == "upsert" else None
+            if current:
+                change["op"] = "upsert"
+                change[row.kind] = current.to_dict()
+            changes.append(change)
+
+        return (
+            marshal(
+                {
+                    "changes": changes,
+                    "next": rows[-1].seq if rows else args["since"],
+                    "has_more": has_more,
+                },
+                changes_list_model,
+            ),
+            200,
+        )
@@ -0,0 +1,129 @@
+from flask_restx import Namespace, Resource, reqparse
+from flask_jwt_extended import jwt_required, current_user
+from flask import Response, stream_with_context
+from models import message_model
+from orm.image import ImageORM
+from orm.album import AlbumORM, AlbumImagesORM
+from extensions import db
+from sqlalchemy import or_, select
+import json
+
+export_namespace = Namespace("export", description="Streaming export operations")
+
+export_namespace.add_model("Message", message_model)
+
+export_parser = reqparse.RequestParser()
+export_parser.add_argument(
+    "after_id",
+    type=int,
+    location="args",
+    default=0,
+    help="Resume the export after this ID",
+)
+
+# Rows fetched per round trip from the server-side cursor
+BATCH_SIZE = 1000
+
+
+def visible(model):
+    if current_user:
+        return or_(
+            model.visibility == 0,
+            model.owner_id == current_user.id,
+            current_user.permission_level >= 2,
+        )
+    return model.visibility == 0
+
+
+def ndjson_response(lines):
+    return Response(stream_with_context(lines), mimetype="application/x-ndjson")
+
+
+def album_lines(connection, albums):
+    # One query per batch for the memberships instead of one per album
+    images = {album.id: [] for album in albums}
+    memberships = connection.execute(
+        select(AlbumImagesORM.album_id, AlbumImagesORM.image_id)
+        .where(AlbumImagesORM.album_id.in_(list(images)))
+        .order_by(AlbumImagesORM.album_id, AlbumImagesORM.image_id)
+    )
+    for album_id, image_id in memberships:
+        images[album_id].append(image_id)
+    for album in albums:
+        yield json.dumps(
+            {
+                "id": album.id,
+                "album_name": album.album_name,
+                "description": album.description,
+                "created_at": album.created_at.isoformat(),
+                "owner_id": album.owner_id,
+                "visibility": album.visibility,
+                "images": images[album.id],
+            }
+        ) + "\n"
+
+
+@export_namespace.route("/images")
+class ImageExportResource(Resource):
+    @jwt_required(optional=True)
+    @export_namespace.doc(security="Bearer Auth")
+    @export_namespace.expect(export_parser)
+    @export_namespace.produces(["application/x-ndjson"])
+    @export_namespace.response(200, "Success")
+    def get(self):
+        """
+        Export image metadata as NDJSON.
+        ---
+        Streams one JSON object per line in ID order. Pass the last ID received as `after_id` to resume.
+        """
+        args = export_parser.parse_args()
+        statement = (
+            select(ImageORM)
+            .where(visible(ImageORM), ImageORM.id > args["after_id"])
+            .order_by(ImageORM.id)
+            .execution_options(yield_per=BATCH_SIZE)
+        )
+
+        def generate():
+            for image in db.session.execute(statement).scalars():
+                yield json.dumps(image.to_dict()) + "\n"
+
+        return ndjson_response(generate())
+
+
+@export_namespace.route("/albums")
+class AlbumExportResource(Resource):
+    @jwt_required(optional=True)
+    @export_namespace.doc(security="Bearer Auth")
+    @export_namespace.expect(export_parser)
+    @export_namespace.produces(["application/x-ndjson"])
+    @export_namespace.response(200, "Success")
+    def get(self):
+        """
+        Export album metadata as NDJSON.
+        ---
+        Streams one JSON object per line in ID order. Pass the last ID received as `after_id` to resume.
+        """
+        args = export_parser.parse_args()
+        statement = (
+            select(
+                AlbumORM.id,
+                AlbumORM.album_name,
+                AlbumORM.description,
+                AlbumORM.created_at,
+                AlbumORM.owner_id,
+                AlbumORM.visibility,
+            )
+            .where(visible(AlbumORM), AlbumORM.id > args["after_id"])
+            .order_by(AlbumORM.id)
+            .execution_options(yield_per=BATCH_SIZE)
+        )
+
+        def generate():
+            # Memberships are read on a second connection, since MySQL can't run another query on a
+            # connection while a server-side cursor is open on it.
+            with db.engine.connect() as lookup:
+                for albums in db.session.execute(statement).partitions():
+                    yield from album_lines(lookup, albums)
+
+        return ndjson_response(generate())
@@ -0,0 +1,84 @@
+from flask_restx import Namespace, Resource, marshal, reqparse
+from flask import send_file, current_app, request
+from models import message_model
+from metrics import IMAGE_BYTES_SENT
+from transcoding import transcoder
+from signed_urls import verify
+from blob_cache import blob_cache
+from stats import stats
+import io
+import os
+import time
+
+files_namespace = Namespace("files", description="Signed file downloads")
+
+files_namespace.add_model("Message", message_model)
+
+signed_file_parser = reqparse.RequestParser()
+signed_file_parser.add_argument("image", type=int, location="args", required=True, help="Signed image ID")
+signed_file_parser.add_argument("mimetype", type=str, location="args", required=True, help="Signed mimetype")
+signed_file_parser.add_argument("expires", type=int, location="args", required=True, help="Signed expiry time")
+signed_file_parser.add_argument("signature", type=str, location="args", required=True, help="URL signature")
+
+
+def send_blob(hash_value, mimetype):
+    """
+    Send a stored blob, or a transcoded variant of it if the client accepts one.
+    Returns None if the file is missing. Small files come from the blob cache, larger ones stream from disk.
+    """
+    storage_path = current_app.config["STORAGE_PATH"]
+    name = hash_value
+
+    # Serve a smaller format if the client accepts one. On a cache miss the original is served
+    # right away and the variant is built in the background for the next request.
+    target = transcoder.negotiate(request.accept_mimetypes, mimetype)
+    if target:
+        variant_path = transcoder.variant_path(storage_path, hash_value, target)
+        variant = os.path.basename(variant_path)
+        if variant in blob_cache or os.path.exists(variant_path):
+            name, mimetype = variant, target
+        else:
+            transcoder.schedule(storage_path, hash_value, target)
+
+    # Files never change, so the name makes a stable ETag whichever way the file is read
+    try:
+        data = blob_cache.read(storage_path, name)
+        if data is not None:
+            response = send_file(io.BytesIO(data), mimetype=mimetype, etag=name)
+        else:
+            response = send_file(os.path.join(storage_path, name), mimetype=mimetype, etag=name)
+    except FileNotFoundError:
+        return None
+    if transcoder.enabled:
+        response.vary.add("Accept")
+    IMAGE_BYTES_SENT.inc(response.content_length or 0)
+    return response
+
+
+@files_namespace.route("/<string:hash_value>")
+@files_namespace.param("hash_value", "The content hash of the file")
+class SignedFileResource(Resource):
+    @files_namespace.expect(signed_file_parser)
+    @files_namespace.response(200, "Success")
+    @files_namespace.response(403, "Invalid or expired signature", message_model)
+    @files_namespace.response(404, "File not found", message_model)
+    def get(self, hash_value):
+        """
+        Download a file through a signed URL.
+        ---
+        URLs come from `POST /images/{id}/file-url`. Only the signature is checked, so no token or database
+        access is needed; access granted by a URL lasts until it expires even if the image is changed.
+        """
+        args = signed_file_parser.parse_args()
+        error = verify(args["image"], hash_value, args["mimetype"], args["expires"], args["signature"])
+        if error:
+            return marshal({"message": error}, message_model), 403
+
+        response = send_blob(hash_value, args["mimetype"])
+        if response is None:
+            return marshal({"message": "File not found"}, message_model), 404
+        stats.download("image", args["image"])
+        # The content behind a signed URL never changes, so it can be cached until the URL expires
+        response.cache_control.private = True
+        response.cache_control.max_age = max(0, args["expires"] - int(time.time()))
+        return response
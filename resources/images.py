@@ -1,12 +1,51 @@
-from flask_restx import Resource, Namespace, marshal, reqparse
+from flask_restx import Resource, Namespace, marshal, reqparse, inputs
 from werkzeug.datastructures import FileStorage
 from flask_jwt_extended import jwt_required, current_user
-from flask import send_file, current_app, request
-from models import image_model, images_list_model, message_model
+from flask import current_app, request
+from models import (
+    image_model,
+    images_list_model,
+    message_model,
+    bulk_delete_item_model,
+    bulk_delete_model,
+    file_url_model,
+    stats_model,
+    popular_image_model,
+    popular_images_model,
+    bulk_tag_model,
+    image_tags_model,
+    timeline_bucket_model,
+    timeline_model,
+)
 from orm.image import ImageORM
+from orm.blob import BlobCleanupORM
+from orm.change import ChangeORM
+from orm.stats import StatsORM, PopularImageORM
+from orm.tag import TagORM, ImageTagsORM
 from extensions import db
-from sqlalchemy import or_
-import hashlib
+from metrics import IMAGE_BYTES_RECEIVED
+from image_metadata import read_metadata
+from usage import QuotaExceeded, check_upload_size, file_replaced, image_created
+from signed_urls import sign
+import content_hash
+import timeline
+from resources.files import send_blob
+from stats import stats
+from tags import TagError, parse_names, tag_filter, tag_images, untag_images, visibility_changed
+from fieldsets import fields_parser, load_fields, project
+from conditional import etag, not_modified, not_modified_response, update_owned
+from bulk import (
+    BulkDeleteError,
+    bulk_delete_parser,
+    bulk_tag_parser,
+    chunked,
+    delete_images,
+    resolve_targets,
+    results_body,
+)
+from sqlalchemy import func, or_
+from datetime import datetime, timezone
+import io
 import os
 
 images_namespace = Namespace("images", description="Image operations")
@@ -14,6 +53,16 @@ images_namespace = Namespace("images", description="Image operations")
 images_namespace.add_model("Image", image_model)
 images_namespace.add_model("ImagesList", images_list_model)
 images_namespace.add_model("Message", message_model)
+images_namespace.add_model("BulkDeleteItem", bulk_delete_item_model)
+images_namespace.add_model("BulkDeleteResult", bulk_delete_model)
+images_namespace.add_model("FileUrl", file_url_model)
+images_namespace.add_model("Stats", stats_model)
+images_namespace.add_model("PopularImage", popular_image_model)
+images_namespace.add_model("PopularImages", popular_images_model)
+images_namespace.add_model("BulkTagResult", bulk_tag_model)
+images_namespace.add_model("ImageTags", image_tags_model)
+images_namespace.add_model("TimelineBucket", timeline_bucket_model)
+images_namespace.add_model("Timeline", timeline_model)
 
 image_parser = reqparse.RequestParser()
 image_parser.add_argument(
@@ -29,11 +78,127 @@ image_parser.add_argument(
     help="Visibility of the image (0: public, 1: hidden, 2: private)",
 )
 
+image_list_parser = reqparse.RequestParser()
+image_list_parser.add_argument(
+    "format", type=str, location="args", help="Only return images of this format"
+)
+for dimension in ("width", "height", "size"):
+    image_list_parser.add_argument(
+        f"min_{dimension}", type=int, location="args", help=f"Minimum {dimension} of the image"
+    )
+    image_list_parser.add_argument(
+        f"max_{dimension}", type=int, location="args", help=f"Maximum {dimension} of the image"
+    )
+image_list_parser.add_argument(
+    "taken_after",
+    type=inputs.datetime_from_iso8601,
+    location="args",
+    help="Only return images captured at or after this ISO 8601 time",
+)
+image_list_parser.add_argument(
+    "taken_before",
+    type=inputs.datetime_from_iso8601,
+    location="args",
+    help="Only return images captured before this ISO 8601 time",
+)
+image_list_parser.add_argument(
+    "sort",
+    type=str,
+    location="args",
+    default="id",
+    choices=("id", "created_at", "taken_at", "width", "height", "size"),
+    help="Field to sort by",
+)
+image_list_parser.add_argument(
+    "order",
+    type=str,
+    location="args",
+    default="asc",
+    choices=("asc", "desc"),
+    help="Sort order",
+)
+image_list_parser.add_argument(
+    "tags", type=str, location="args", help="Comma-separated tags the images must carry"
+)
+image_list_parser.add_argument(
+    "tag_mode",
+    type=str,
+    location="args",
+    default="all",
+    choices=("all", "any"),
+    help="Whether images need all of `tags` or any of them",
+)
+image_list_parser.add_argument(
+    "owner_id", type=int, location="args", help="Only return images of this owner"
+)
+image_list_parser.add_argument(
+    "after",
+    type=inputs.datetime_from_iso8601,
+    location="args",
+    help="Only return images created at or after this ISO 8601 time, oldest first",
+)
+image_list_parser.add_argument(
+    "after_id",
+    type=int,
+    location="args",
+    help="With `after`, skip images created at that time up to and including this ID",
+)
+image_list_parser.add_argument(
+    "before",
+    type=inputs.datetime_from_iso8601,
+    location="args",
+    help="Only return images created before this ISO 8601 time, newest first",
+)
+image_list_parser.add_argument(
+    "before_id",
+    type=int,
+    location="args",
+    help="With `before`, also return images created at that time with a lower ID",
+)
+image_list_parser.add_argument(
+    "limit", type=int, location="args", help="Return at most this many images"
+)
+fields_parser(image_model, image_list_parser)
+
+timeline_parser = reqparse.RequestParser()
+timeline_parser.add_argument(
+    "granularity",
+    type=str,
+    location="args",
+    default="month",
+    choices=timeline.GRANULARITIES,
+    help="Count images per day or per month",
+)
+timeline_parser.add_argument(
+    "owner_id", type=int, location="args", help="Only count images of this owner"
+)
+
+popular_parser = reqparse.RequestParser()
+popular_parser.add_argument(
+    "limit", type=int, location="args", default=20, help="How many images to return, at most POPULAR_SIZE"
+)
+
+image_get_parser = fields_parser(image_model)
+
 file_parser = images_namespace.parser()
 file_parser.add_argument(
     "file", location="files", type=FileStorage, required=True, help="Image file"
 )
 
+UPDATE_ERRORS = {
+    403: "Permission denied",
+    404: "Image not found",
+    412: "Image has been modified, fetch it again",
+}
+
+
+def can_view(image):
+    if image.visibility == 1 and not current_user:
+        return False
+    if image.visibility == 2 and (not current_user or image.owner_id != current_user.id):
+        return False
+    return True
+
 
 @images_namespace.route("/<int:image_id>")
 @images_namespace.param("image_id", "The image identifier")
@@ -41,48 +206,90 @@ class ImageResource(Resource):
 
     @jwt_required(optional=True)
     @images_namespace.doc(security="Bearer Auth")
+    @images_namespace.expect(image_get_parser)
     @images_namespace.response(200, "Success", image_model)
     @images_namespace.response(403, "Permission denied", message_model)
     @images_namespace.response(404, "Image not found", message_model)
     def get(self, image_id):
         """
         Get image by ID.
+        ---
+        Pass `fields` to select and return only some of the fields.
+        The response carries the image version as its ETag, and `If-None-Match` with a current ETag returns 304.
         """
-        image = ImageORM.query.get(image_id)
+        fields = image_get_parser.parse_args()["fields"] or list(image_model)
+        if request.if_none_match:
+            # Only the version and what the permission check needs, before loading the whole row
+            current = (
+                db.session.query(ImageORM.version, ImageORM.visibility, ImageORM.owner_id)
+                .filter_by(id=image_id)
+                .first()
+            )
+            if current and can_view(current) and not_modified(current.version):
+                stats.view("image", image_id)
+                return not_modified_response(current.version)
+
+        image = (
+            ImageORM.query.options(
+                *load_fields(ImageORM, fields, required=("visibility", "owner_id", "version"))
+            )
+            .filter_by(id=image_id)
+            .first()
+        )
 
         if not image:
             return marshal({"message": "Image not found"}, message_model), 404
-        if image.visibility == 1 and not current_user:
-            return marshal({"message": "Permission denied"}, message_model), 403
-        if image.visibility == 2 and (
-            not current_user or image.owner_id != current_user.id
-        ):
+        if not can_view(image):
             return marshal({"message": "Permission denied"}, message_model), 403
 
-        return marshal(image.to_dict(), image_model), 200
+        stats.view("image", image_id)
+        return (
+            marshal(image.to_dict(fields), project(image_model, fields)),
+            200,
+            {"ETag": etag(image.version)},
+        )
 
     @jwt_required()
     @images_namespace.doc(security="Bearer Auth")
     @images_namespace.expect(image_parser)
-    @images_namespace.response(201, "Image created successfully", message_model)
+    @images_namespace.response(200, "Image updated successfully", message_model)
     @images_namespace.response(403, "Permission denied", message_model)
+    @images_namespace.response(404, "Image not found", message_model)
+    @images_namespace.response(412, "Image has been modified", message_model)
     def put(self, image_id):
         """
         Update image by ID.
+        ---
+        With `If-Match`, the update only applies if the image is still at that version.
         """
         data = image_parser.parse_args()
-        image = ImageORM.query.get(image_id)
-
-        if not image:
-            return marshal({"message": "Image not found"}, message_model), 404
-        if image.owner_id != current_user.id and current_user.permission_level < 2:
-            return marshal({"message": "Permission denied"}, message_model), 403
+        # Locked until commit, so the tag and timeline counters move by exactly the change this update makes
+        previous = (
+            db.session.query(ImageORM.visibility, ImageORM.owner_id, ImageORM.created_at)
+            .filter_by(id=image_id)
+            .with_for_update()
+            .first()
+        )
+        version, error = update_owned(
+            ImageORM,
+            image_id,
+            {"description": data["description"], "visibility": data["visibility"]},
+        )
+        if error:
+            db.session.rollback()
+            return marshal({"message": UPDATE_ERRORS[error]}, message_model), error
 
-        image.description = data["description"]
-        image.visibility = data["visibility"]
+        visibility_changed(image_id, previous.visibility == 0, data["visibility"] == 0)
+        timeline.visibility_changed(
+            previous.owner_id, previous.created_at, previous.visibility == 0, data["visibility"] == 0
+        )
+        ChangeORM.record("image", "upsert", [image_id])
         db.session.commit()
-
-        return marshal({"message": "Image updated successfully"}, message_model), 200
+        return (
+            marshal({"message": "Image updated successfully"}, message_model),
+            200,
+            {"ETag": etag(version)},
+        )
 
     @jwt_required()
     @images_namespace.doc(security="Bearer Auth")
@@ -98,34 +305,266 @@ class ImageResource(Resource):
             return marshal({"message": "Image not found"}, message_model), 404
         if image.owner_id != current_user.id and current_user.permission_level < 2:
             return marshal({"message": "Permission denied"}, message_model), 403
-        db.session.delete(image)
+        delete_images([image_id])
         db.session.commit()
         return marshal({"message": "Image deleted"}, message_model), 200
 
 
+@images_namespace.route("/<int:image_id>/stats")
+@images_namespace.param("image_id", "The image identifier")
+class ImageStatsResource(Resource):
+    @jwt_required(optional=True)
+    @images_namespace.doc(security="Bearer Auth")
+    @images_namespace.response(200, "Success", stats_model)
+    @images_namespace.response(403, "Permission denied", message_model)
+    @images_namespace.response(404, "Image not found", message_model)
+    def get(self, image_id):
+        """
+        Get view and download counts of an image.
+        ---
+        Counts are kept in memory by each worker and written every `STATS_FLUSH_SECONDS`,
+        so the most recent requests may not be included yet.
+        """
+        image = (
+            db.session.query(ImageORM.visibility, ImageORM.owner_id, StatsORM.views, StatsORM.downloads)
+            .outerjoin(StatsORM, (StatsORM.kind == "image") & (StatsORM.object_id == ImageORM.id))
+            .filter(ImageORM.id == image_id)
+            .first()
+        )
+        if not image:
+            return marshal({"message": "Image not found"}, message_model), 404
+        if not can_view(image):
+            return marshal({"message": "Permission denied"}, message_model), 403
+        return marshal({"views": image.views or 0, "downloads": image.downloads or 0}, stats_model), 200
+
+
+@images_namespace.route("/popular")
+class PopularImagesResource(Resource):
+    @images_namespace.expect(popular_parser)
+    @images_namespace.response(200, "Success", popular_images_model)
+    def get(self):
+        """
+        Return the most viewed and downloaded public images.
+        ---
+        Served from a ranking rebuilt every `POPULAR_REFRESH_SECONDS` rather than computed per request.
+        Images made non-public or deleted since are left out.
+        """
+        limit = min(max(popular_parser.parse_args()["limit"], 0), current_app.config["POPULAR_SIZE"])
+        ranking = (
+            db.session.query(
+                PopularImageORM.rank, PopularImageORM.image_id, PopularImageORM.views, PopularImageORM.downloads
+            )
+            .join(ImageORM, ImageORM.id == PopularImageORM.image_id)
+            .filter(ImageORM.visibility == 0)
+            .order_by(PopularImageORM.rank)
+            .limit(limit)
+            .all()
+        )
+        refreshed_at = db.session.query(func.max(PopularImageORM.refreshed_at)).scalar()
+        return marshal(
+            {"images": [row._asdict() for row in ranking], "refreshed_at": refreshed_at}, popular_images_model
+        ), 200
+
+
+@images_namespace.route("/timeline")
+class ImageTimelineResource(Resource):
+    @jwt_required(optional=True)
+    @images_namespace.doc(security="Bearer Auth")
+    @images_namespace.expect(timeline_parser)
+    @images_namespace.response(200, "Success", timeline_model)
+    def get(self):
+        """
+        Return how many images were created per day or month.
+        ---
+        Counts the images the caller can list, newest first, from per-day counters rather than the images.
+        To jump to a bucket, list images with `after` set to its first day.
+        """
+        args = timeline_parser.parse_args()
+        buckets = timeline.histogram(current_user, args["granularity"], args["owner_id"])
+        return marshal({"granularity": args["granularity"], "buckets": buckets}, timeline_model), 200
+
+
+@images_namespace.route("/bulk-delete")
+class ImageBulkDeleteResource(Resource):
+    @jwt_required()
+    @images_namespace.doc(security="Bearer Auth")
+    @images_namespace.expect(bulk_delete_parser)
+    @images_namespace.response(200, "Success", bulk_delete_model)
+    @images_namespace.response(400, "Invalid request", message_model)
+    @images_namespace.response(403, "Permission denied", message_model)
+    def post(self):
+        """
+        Delete many images at once.
+        ---
+        Takes either a list of `ids` or a filter (`owner_id`, `created_after`, `created_before`).
+        Rows are removed with set-based statements in chunked transactions, and blobs no longer
+        referenced by any image are queued for `flask cleanup-blobs`.
+        """
+        args = bulk_delete_parser.parse_args()
+        try:
+            ids, results = resolve_targets(ImageORM, args)
+        except BulkDeleteError as error:
+            return marshal({"message": error.message}, message_model), error.status
+
+        for chunk in chunked(ids):
+            delete_images(chunk)
+            db.session.commit()
+
+        return marshal(results_body(results), bulk_delete_model), 200
+
+
+def bulk_change_tags(change):
+    args = bulk_tag_parser.parse_args()
+    try:
+        names = parse_names(args["tags"])
+        ids, results = resolve_targets(ImageORM, args)
+    except (TagError, BulkDeleteError) as error:
+        return marshal({"message": error.message}, message_model), error.status
+
+    for chunk in chunked(ids):
+        change(chunk, names)
+        db.session.commit()
+    results = {id: "updated" if status == "deleted" else status for id, status in results.items()}
+    return marshal(results_body(results, "updated"), bulk_tag_model), 200
+
+
+@images_namespace.route("/bulk-tag")
+class ImageBulkTagResource(Resource):
+    @jwt_required()
+    @images_namespace.doc(security="Bearer Auth")
+    @images_namespace.expect(bulk_tag_parser)
+    @images_namespace.response(200, "Success", bulk_tag_model)
+    @images_namespace.response(400, "Invalid request", message_model)
+    @images_namespace.response(403, "Permission denied", message_model)
+    def post(self):
+        """
+        Add tags to many images at once.
+        ---
+        Takes `tags` and either a list of `ids` or a filter (`owner_id`, `created_after`, `created_before`),
+        like bulk delete. Missing tags are created, and images that already carry a tag keep it.
+        """
+        return bulk_change_tags(tag_images)
+
+
+@images_namespace.route("/bulk-untag")
+class ImageBulkUntagResource(Resource):
+    @jwt_required()
+    @images_namespace.doc(security="Bearer Auth")
+    @images_namespace.expect(bulk_tag_parser)
+    @images_namespace.response(200, "Success", bulk_tag_model)
+    @images_namespace.response(400, "Invalid request", message_model)
+    @images_namespace.response(403, "Permission denied", message_model)
+    def post(self):
+        """
+        Remove tags from many images at once.
+        ---
+        Takes the same arguments as `POST /images/bulk-tag`.
+        """
+        return bulk_change_tags(untag_images)
+
+
+@images_namespace.route("/<int:image_id>/tags")
+@images_namespace.param("image_id", "The image identifier")
+class ImageTagsResource(Resource):
+    @jwt_required(optional=True)
+    @images_namespace.doc(security="Bearer Auth")
+    @images_namespace.response(200, "Success", image_tags_model)
+    @images_namespace.response(403, "Permission denied", message_model)
+    @images_namespace.response(404, "Image not found", message_model)
+    def get(self, image_id):
+        """
+        Get the tags of an image.
+        """
+        image = (
+            db.session.query(ImageORM.visibility, ImageORM.owner_id).filter(ImageORM.id == image_id).first()
+        )
+        if not image:
+            return marshal({"message": "Image not found"}, message_model), 404
+        if not can_view(image):
+            return marshal({"message": "Permission denied"}, message_model), 403
+        names = [
+            row.name
+            for row in db.session.query(TagORM.name)
+            .join(ImageTagsORM, ImageTagsORM.tag_id == TagORM.id)
+            .filter(ImageTagsORM.image_id == image_id)
+            .order_by(TagORM.name)
+        ]
+        return marshal({"tags": names}, image_tags_model), 200
+
+
 @images_namespace.route("")
 class ImageListResource(Resource):
     @jwt_required(optional=True)
     @images_namespace.doc(security="Bearer Auth")
+    @images_namespace.expect(image_list_parser)
     @images_namespace.response(200, "Success", images_list_model)
     def get(self):
         """
         Return a list of images.
+        ---
+        Images can be filtered and sorted by the metadata extracted at upload time,
+        and filtered by `tags`, requiring all of them or, with `tag_mode=any`, any of them.
+        `after` and `before` are keyset cursors on the creation time, which order the images by it instead of
+        `sort`: to page, pass the `created_at` and `id` of the last image as `after` and `after_id`
+        (or `before` and `before_id`).
+        Pass `fields` to select and return only some of the fields.
         """
+        args = image_list_parser.parse_args()
+        fields = args["fields"] or list(image_model)
         if current_user:
-            images = ImageORM.query.filter(
+            query = ImageORM.query.filter(
                 or_(
                     ImageORM.visibility == 0,
                     ImageORM.owner_id == current_user.id,
                     current_user.permission_level >= 2,
                 )
-            ).all()
+            )
         else:
-            images = ImageORM.query.filter(ImageORM.visibility == 0).all()
+            query = ImageORM.query.filter(ImageORM.visibility == 0)
+
+        if args["format"]:
+            query = query.filter(ImageORM.format == args["format"].lower())
+        for dimension in ("width", "height", "size"):
+            column = getattr(ImageORM, dimension)
+            if args[f"min_{dimension}"] is not None:
+                query = query.filter(column >= args[f"min_{dimension}"])
+            if args[f"max_{dimension}"] is not None:
+                query = query.filter(column <= args[f"max_{dimension}"])
+        if args["taken_after"]:
+            query = query.filter(ImageORM.taken_at >= args["taken_after"])
+        if args["taken_before"]:
+            query = query.filter(ImageORM.taken_at < args["taken_before"])
+        if args["tags"]:
+            try:
+                query = query.filter(tag_filter(parse_names(args["tags"]), args["tag_mode"]))
+            except TagError as error:
+                return marshal({"message": error.message}, message_model), error.status
+        if args["owner_id"] is not None:
+            query = query.filter(ImageORM.owner_id == args["owner_id"])
+
+        if args["after"] or args["before"]:
+            query = query.filter(
+                timeline.cursor_filter(args["after"], args["after_id"], args["before"], args["before_id"])
+            )
+            if args["after"]:
+                order = (ImageORM.created_at.asc(), ImageORM.id.asc())
+            else:
+                order = (ImageORM.created_at.desc(), ImageORM.id.desc())
+        else:
+            sort_column = getattr(ImageORM, args["sort"])
+            sort_column = sort_column.desc() if args["order"] == "desc" else sort_column.asc()
+            order = (sort_column, ImageORM.id)
+        query = query.options(*load_fields(ImageORM, fields)).order_by(*order)
+        if args["limit"] is not None:
+            query = query.limit(max(args["limit"], 0))
+        images = query.all()
         return (
-            marshal(
-                {"images": [image.to_dict() for image in images]}, images_list_model
-            ),
+            {
+                "images": marshal(
+                    [image.to_dict(fields) for image in images],
+                    project(image_model, fields),
+                )
+            },
             200,
         )
 
@@ -133,7 +572,7 @@ class ImageListResource(Resource):
     @images_namespace.doc(security="Bearer Auth")
     @images_namespace.expect(image_parser)
     @images_namespace.response(201, "Image created successfully", message_model)
-    @images_namespace.response(403, "Permission denied", message_model)
+    @images_namespace.response(403, "Permission denied or image quota exceeded", message_model)
     def post(self):
         """
         Create a new image.
@@ -141,6 +580,11 @@ class ImageListResource(Resource):
         data = image_parser.parse_args()
         if current_user.permission_level < 1:
             return marshal({"message": "Permission denied"}, message_model), 403
+        try:
+            image_created(current_user.id)
+        except QuotaExceeded as error:
+            db.session.rollback()
+            return marshal({"message": error.message}, message_model), error.status
         image = ImageORM(
             description=data["description"] if data["description"] else "",
             owner_id=current_user.id,
@@ -149,7 +593,9 @@ class ImageListResource(Resource):
             visibility=data["visibility"] if data["visibility"] is not None else 1,
         )
         db.session.add(image)
-        current_user.images.append(image)
+        db.session.flush()
+        timeline.image_added(image.owner_id, image.created_at, image.visibility == 0)
+        ChangeORM.record("image", "upsert", [image.id])
         db.session.commit()
         return (
             marshal({"message": "Image created successfully"}, message_model),
@@ -184,10 +630,11 @@ class ImageFileResource(Resource):
         if not image.hash_value:
             return {"message": "Image file not found"}, 404
 
-        return send_file(
-            os.path.join(current_app.config["STORAGE_PATH"], image.hash_value),
-            mimetype=image.mimetype,
-        )
+        response = send_blob(image.hash_value, image.mimetype)
+        if response is None:
+            return {"message": "Image file not found"}, 404
+        stats.download("image", image_id)
+        return response
 
     @jwt_required()
     @images_namespace.doc(security="Bearer Auth")
@@ -195,6 +642,7 @@ class ImageFileResource(Resource):
     @images_namespace.response(201, "Image uploaded", message_model)
     @images_namespace.response(403, "Permission denied", message_model)
     @images_namespace.response(404, "Image not found", message_model)
+    @images_namespace.response(413, "Storage quota exceeded", message_model)
     def post(self, image_id):
         """
         Upload an image file.
@@ -206,14 +654,71 @@ class ImageFileResource(Resource):
         if image.owner_id != current_user.id and current_user.permission_level < 2:
             return marshal({"message": "Permission denied"}, message_model), 403
 
-        image_file = request.files["file"]
-        file_hash = hashlib.sha256(image_file.read()).hexdigest()
+        try:
+            # Judged on Content-Length first, so an upload that can't fit is never parsed or hashed
+            check_upload_size(
+                image.owner_id, request.content_length, (image.size or 0) if image.hash_value else 0
+            )
+            image_file = request.files["file"]
+            content = image_file.read()
+            IMAGE_BYTES_RECEIVED.inc(len(content))
+            algorithm = content_hash.configured()
+            file_hash = content_hash.digest(content, algorithm)
+            file_replaced(image, file_hash, len(content))
+        except QuotaExceeded as error:
+            db.session.rollback()
+            return marshal({"message": error.message}, message_model), error.status
+
         file_path = os.path.join(current_app.config["STORAGE_PATH"], file_hash)
         if not os.path.exists(file_path):
             image_file.seek(0)
             image_file.save(file_path)
-        image.mimetype = image_file.mimetype
+        metadata = read_metadata(io.BytesIO(content))
+        previous_hash = image.hash_value
+        image.mimetype = metadata["mimetype"] if metadata else image_file.mimetype
         image.hash_value = file_hash
+        image.hash_algorithm = algorithm
+        image.set_file_metadata(metadata, len(content))
+        image.version = ImageORM.version + 1
+        BlobCleanupORM.dequeue(file_hash)
+        if previous_hash != file_hash:
+            BlobCleanupORM.enqueue_orphans([previous_hash])
+        ChangeORM.record("image", "upsert", [image_id])
 
         db.session.commit()
         return marshal({"message": "Image uploaded"}, message_model), 200
+
+
+@images_namespace.route("/<int:image_id>/file-url")
+@images_namespace.param("image_id", "The image identifier")
+class ImageFileUrlResource(Resource):
+    @jwt_required(optional=True)
+    @images_namespace.doc(security="Bearer Auth")
+    @images_namespace.response(200, "Success", file_url_model)
+    @images_namespace.response(403, "Permission denied", message_model)
+    @images_namespace.response(404, "Image not found or file not found", message_model)
+    def post(self, image_id):
+        """
+        Get a signed URL for the image file.
+        ---
+        Checks access once and returns a short-lived URL that downloads the file without a token,
+        so pages showing many images need one authorized call per image instead of one per download.
+        """
+        image = (
+            db.session.query(
+                ImageORM.visibility, ImageORM.owner_id, ImageORM.hash_value, ImageORM.mimetype
+            )
+            .filter(ImageORM.id == image_id)
+            .first()
+        )
+        if not image:
+            return marshal({"message": "Image not found"}, message_model), 404
+        if not can_view(image):
+            return marshal({"message": "Permission denied"}, message_model), 403
+        if not image.hash_value:
+            return marshal({"message": "Image file not found"}, message_model), 404
+
+        url, expires = sign(image_id, image.hash_value, image.mimetype)
+        return marshal(
+            {"url": url, "expires_at": datetime.fromtimestamp(expires, timezone.utc)}, file_url_model
+        ), 200
@@ -0,0 +1,149 @@
+from flask_restx import Resource, Namespace, marshal, reqparse, inputs
+from flask_jwt_extended import jwt_required, current_user
+from flask import current_app
+from models import job_model, message_model, scrub_issue_model, scrub_run_model
+from orm.job import JobORM
+from orm.scrub import ScrubRunORM, ScrubIssueORM
+from extensions import db
+from jobs import jobs
+from content_hash import ALGORITHMS, count_rekey, rekey_blobs
+from scrub import count_blobs, scrub, unfinished_run
+
+jobs_namespace = Namespace("jobs", description="Background job operations")
+
+jobs_namespace.add_model("Job", job_model)
+jobs_namespace.add_model("Message", message_model)
+jobs_namespace.add_model("ScrubIssue", scrub_issue_model)
+jobs_namespace.add_model("ScrubRun", scrub_run_model)
+
+rekey_parser = reqparse.RequestParser()
+rekey_parser.add_argument(
+    "algorithm",
+    type=str,
+    location="args",
+    choices=tuple(ALGORITHMS),
+    help="Algorithm to address blobs by. Defaults to CONTENT_HASH_ALGORITHM.",
+)
+
+scrub_parser = reqparse.RequestParser()
+scrub_parser.add_argument(
+    "restart",
+    type=inputs.boolean,
+    location="args",
+    default=False,
+    help="Start a new pass instead of resuming an interrupted one.",
+)
+
+scrub_report_parser = reqparse.RequestParser()
+scrub_report_parser.add_argument(
+    "limit", type=int, location="args", default=100, help="Maximum number of issues to return"
+)
+
+
+@jobs_namespace.route("/<int:job_id>")
+@jobs_namespace.param("job_id", "The job identifier")
+class JobResource(Resource):
+    @jwt_required()
+    @jobs_namespace.doc(security="Bearer Auth")
+    @jobs_namespace.response(200, "Success", job_model)
+    @jobs_namespace.response(403, "Permission denied", message_model)
+    @jobs_namespace.response(404, "Job not found", message_model)
+    def get(self, job_id):
+        """
+        Get the status and progress of a background job
+        """
+        job = JobORM.query.filter_by(id=job_id).first()
+        if not job:
+            return marshal({"message": "Job not found"}, message_model), 404
+        if job.created_by != current_user.id and current_user.permission_level < 2:
+            return marshal({"message": "Permission denied"}, message_model), 403
+        return marshal(job.to_dict(), job_model), 200
+
+
+@jobs_namespace.route("/rekey-blobs")
+class RekeyBlobsResource(Resource):
+    @jwt_required()
+    @jobs_namespace.doc(security="Bearer Auth")
+    @jobs_namespace.expect(rekey_parser)
+    @jobs_namespace.response(202, "Job started", job_model)
+    @jobs_namespace.response(403, "Permission denied", message_model)
+    def post(self):
+        """
+        Re-address stored blobs by another hash algorithm in a background job
+        ---
+        Blobs stay readable throughout, and their old names are queued for `flask cleanup-blobs`.
+        Progress counts blobs. A job already running is returned instead of starting another, unless its
+        process has stopped, in which case it is marked failed and a new one started.
+        """
+        if current_user.permission_level < 2:
+            return marshal({"message": "Permission denied"}, message_model), 403
+        algorithm = rekey_parser.parse_args()["algorithm"] or current_app.config["CONTENT_HASH_ALGORITHM"]
+
+        job = jobs.active("rekey_blobs")
+        if not job:
+            job = JobORM(kind="rekey_blobs", total=count_rekey(algorithm), created_by=current_user.id)
+            job = jobs.start(job, rekey_blobs, algorithm)
+        return marshal(job.to_dict(), job_model), 202, {"Location": f"/jobs/{job.id}"}
+
+
+def run_scrub(restart, progress):
+    config = current_app.config
+    scrub(config["SCRUB_WORKERS"], config["SCRUB_MB_PER_SECOND"] * 1024 * 1024, restart=restart, progress=progress)
+
+
+@jobs_namespace.route("/scrub-blobs")
+class ScrubBlobsResource(Resource):
+    @jwt_required()
+    @jobs_namespace.doc(security="Bearer Auth")
+    @jobs_namespace.expect(scrub_report_parser)
+    @jobs_namespace.response(200, "Success", scrub_run_model)
+    @jobs_namespace.response(403, "Permission denied", message_model)
+    @jobs_namespace.response(404, "No scrub has run", message_model)
+    def get(self):
+        """
+        Report on the latest storage scrub
+        ---
+        Counts and issues are committed batch by batch, so an unfinished run shows what it has found so far.
+        """
+        if current_user.permission_level < 2:
+            return marshal({"message": "Permission denied"}, message_model), 403
+        run = ScrubRunORM.query.order_by(ScrubRunORM.id.desc()).first()
+        if not run:
+            return marshal({"message": "No scrub has run"}, message_model), 404
+        issues = (
+            ScrubIssueORM.query.filter_by(run_id=run.id)
+            .order_by(ScrubIssueORM.id)
+            .limit(max(scrub_report_parser.parse_args()["limit"], 0))
+        )
+        report = dict(run.to_dict(), issues=[{"name": issue.name, "problem": issue.problem} for issue in issues])
+        return marshal(report, scrub_run_model), 200
+
+    @jwt_required()
+    @jobs_namespace.doc(security="Bearer Auth")
+    @jobs_namespace.expect(scrub_parser)
+    @jobs_namespace.response(202, "Job started", job_model)
+    @jobs_namespace.response(403, "Permission denied", message_model)
+    def post(self):
+        """
+        Verify stored blobs against their hashes in a background job
+        ---
+        Blobs are re-hashed on `SCRUB_WORKERS` threads reading at most `SCRUB_MB_PER_SECOND` together.
+        An interrupted run is resumed from its last checkpoint unless `restart` is set.
+        Progress counts blobs; the findings are at `GET /jobs/scrub-blobs`.
+        A job already running is returned instead of starting another, unless its process has stopped,
+        in which case it is marked failed and a new one resumes from the checkpoint.
+        """
+        if current_user.permission_level < 2:
+            return marshal({"message": "Permission denied"}, message_model), 403
+        restart = scrub_parser.parse_args()["restart"]
+
+        job = jobs.active("scrub_blobs")
+        if not job:
+            previous = None if restart else unfinished_run()
+            job = JobORM(
+                kind="scrub_blobs",
+                total=count_blobs(previous.last_hash if previous else ""),
+                created_by=current_user.id,
+            )
+            job = jobs.start(job, run_scrub, restart)
+        return marshal(job.to_dict(), job_model), 202, {"Location": f"/jobs/{job.id}"}
@@ -74,8 +74,7 @@ class SessionResource(Resource):
         !!! Refresh token required
         This will blacklist the user's refresh token
         """
-        jti = get_jwt()["jti"]
-        token = TokenBlocklistORM(jti=jti)
+        token = TokenBlocklistORM(jti=get_jwt()["jti"], exp=get_jwt()["exp"])
         db.session.add(token)
         db.session.commit()
         return marshal({"message": "User logged out"}, message_model), 200
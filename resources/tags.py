@@ -0,0 +1,31 @@
+from flask_restx import Namespace, Resource, reqparse, marshal
+from flask_jwt_extended import jwt_required, current_user
+from models import tag_model, tags_list_model
+from tags import facets
+
+tags_namespace = Namespace("tags", description="Tag operations")
+
+tags_namespace.add_model("Tag", tag_model)
+tags_namespace.add_model("TagsList", tags_list_model)
+
+tags_parser = reqparse.RequestParser()
+tags_parser.add_argument("prefix", type=str, location="args", help="Only return tags starting with this")
+tags_parser.add_argument("limit", type=int, location="args", default=100, help="Maximum number of tags to return")
+
+
+@tags_namespace.route("")
+class TagListResource(Resource):
+    @jwt_required(optional=True)
+    @tags_namespace.doc(security="Bearer Auth")
+    @tags_namespace.expect(tags_parser)
+    @tags_namespace.response(200, "Success", tags_list_model)
+    def get(self):
+        """
+        Return tags with the number of images carrying them.
+        ---
+        Counts cover the images the caller can list, as in `GET /images`, and come from counters
+        updated with every tag change rather than from counting image_tags.
+        """
+        args = tags_parser.parse_args()
+        tags = facets(current_user, args["prefix"], min(max(args["limit"], 0), 1000))
+        return marshal({"tags": tags}, tags_list_model), 200
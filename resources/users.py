@@ -1,14 +1,19 @@
 from flask_jwt_extended import jwt_required, get_jwt, current_user
-from flask_restx import Resource, Namespace, marshal, reqparse
-from models import user_model, users_list_model, message_model
+from flask_restx import Resource, Namespace, marshal, reqparse, inputs
+from models import user_model, users_list_model, message_model, job_model
 from orm.user import UserORM
+from orm.job import JobORM
 from extensions import db
+from bulk import count_user_rows, delete_user
+from jobs import jobs
+from fieldsets import fields_parser, load_fields, project
 
 users_namespace = Namespace("users", description="User operations")
 
 users_namespace.add_model("User", user_model)
 users_namespace.add_model("UsersList", users_list_model)
 users_namespace.add_model("Message", message_model)
+users_namespace.add_model("Job", job_model)
 
 user_parser = reqparse.RequestParser()
 user_parser.add_argument(
@@ -27,6 +32,17 @@ user_parser.add_argument(
     help="The permission level of the user (0: visitor, 1: user, 2: admin).",
 )
 
+delete_parser = reqparse.RequestParser()
+delete_parser.add_argument(
+    "background",
+    type=inputs.boolean,
+    location="args",
+    default=False,
+    help="Delete in a background job and return it instead of waiting.",
+)
+
+user_get_parser = fields_parser(user_model)
+
 
 @users_namespace.route("/<int:user_id>")
 @users_namespace.param("user_id", "The user identifier")
@@ -34,29 +50,43 @@ class UserResource(Resource):
 
     @jwt_required()
     @users_namespace.doc(security="Bearer Auth")
+    @users_namespace.expect(user_get_parser)
     @users_namespace.response(200, "Success", user_model)
     @users_namespace.response(403, "Permission denied", message_model)
     @users_namespace.response(404, "User not found", message_model)
     def get(self, user_id):
         """
         Get user by ID
+        ---
+        Pass `fields` to select and return only some of the fields.
         """
-        user = UserORM.query.filter_by(id=user_id).first()
+        fields = user_get_parser.parse_args()["fields"] or list(user_model)
+        user = (
+            UserORM.query.options(*load_fields(UserORM, fields))
+            .filter_by(id=user_id)
+            .first()
+        )
         if not user:
             return marshal({"message": "User not found"}, message_model), 404
         if user_id != current_user.id and current_user.permission_level < 2:
             return marshal({"message": "Permission denied"}, message_model), 403
-        return marshal(user.to_dict(), user_model), 200
+        return marshal(user.to_dict(fields), project(user_model, fields)), 200
 
     @jwt_required()
     @users_namespace.doc(security="Bearer Auth")
+    @users_namespace.expect(delete_parser)
     @users_namespace.response(200, "Success", message_model)
+    @users_namespace.response(202, "Deletion started", job_model)
     @users_namespace.response(403, "Permission denied", message_model)
     @users_namespace.response(404, "User not found", message_model)
     def delete(self, user_id):
         """
         Delete a user
+        ---
+        Albums and images owned by the user are deleted with them, in chunks.
+        With `background=true` the deletion runs as a job whose progress is available at `/jobs/{job_id}`.
         """
+        args = delete_parser.parse_args()
         user = UserORM.query.filter_by(id=user_id).first()
 
         if not user:
@@ -70,9 +100,20 @@ class UserResource(Resource):
                 403,
             )
 
-        db.session.delete(user)
-        db.session.commit()
-        return marshal({"message": "User deleted successfully"}, message_model), 200
+        if not args["background"]:
+            delete_user(user_id)
+            return marshal({"message": "User deleted successfully"}, message_model), 200
+
+        job = jobs.active("delete_user", user_id)
+        if not job:
+            job = JobORM(
+                kind="delete_user",
+                target_id=user_id,
+                total=count_user_rows(user_id),
+                created_by=current_user.id,
+            )
+            job = jobs.start(job, delete_user, user_id)
+        return marshal(job.to_dict(), job_model), 202, {"Location": f"/jobs/{job.id}"}
 
     @jwt_required()
     @users_namespace.doc(security="Bearer Auth")
@@ -126,6 +167,9 @@ class UserResource(Resource):
 
         user.username = data["username"]
         user.nickname = data["nickname"]
+        if data["permission_level"] != user.permission_level:
+            # Tokens carry the permission level, so the old ones must stop working
+            user.token_generation = UserORM.token_generation + 1
         user.permission_level = data["permission_level"]
         if data["password"]:
             user.set_password(data["password"])
@@ -4,6 +4,7 @@ from flask import current_app
 from orm.user import UserORM
 from models import message_model
 from extensions import db
+from stats import stats
 
 util_namespace = Namespace("util", description="Utility operations")
 
@@ -36,4 +37,14 @@ class Drop(Resource):
         Drop database.
         """
         db.drop_all()
-        return marshal({"message": "Database dropped"}, message_model), 200
\ No newline at end of file
+        return marshal({"message": "Database dropped"}, message_model), 200
+
+@util_namespace.route("/flush-stats")
+class FlushStats(Resource):
+    @util_namespace.response(200, "Success", message_model)
+    def get(self):
+        """
+        Write pending access statistics and rebuild the popular images list now.
+        """
+        stats.flush(refresh_popular=True)
+        return marshal({"message": "Statistics flushed"}, message_model), 200
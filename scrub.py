@@ -0,0 +1,173 @@
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from sqlalchemy import func, insert, update
+from extensions import db
+from orm.blob import BlobCleanupORM
+from orm.image import ImageORM
+from orm.scrub import ScrubRunORM, ScrubIssueORM
+from content_hash import ALGORITHMS, READ_SIZE
+
+log = logging.getLogger(__name__)
+
+# Blobs and their transcoded variants, <hash_value>[.<extension>]; anything else in storage is left alone
+BLOB_NAME = re.compile(r"^([0-9a-f]{16,128})(\.[a-z0-9]+)?$")
+
+SCRUB_BATCH_SIZE = 500
+
+
+class Throttle:
+    """
+    Caps the combined read rate of the scrubber threads, so scrubbing leaves disk bandwidth for serving.
+    Each read reserves the next slot of time its size takes at the allowed rate and waits for it to pass.
+    """
+
+    def __init__(self, bytes_per_second):
+        self.rate = bytes_per_second
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, count):
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._next = max(self._next, now) + count / self.rate
+            delay = self._next - now
+        time.sleep(delay)
+
+
+def _verify(storage_path, throttle, hash_value, algorithm):
+    """
+    Re-hash one blob. Returns (hash_value, problem or None, bytes read).
+    """
+    hasher = ALGORITHMS[algorithm]()
+    read = 0
+    try:
+        with open(os.path.join(storage_path, hash_value), "rb") as file:
+            while chunk := file.read(READ_SIZE):
+                hasher.update(chunk)
+                read += len(chunk)
+                throttle.consume(len(chunk))
+    except FileNotFoundError:
+        return hash_value, "missing", read
+    return hash_value, None if hasher.hexdigest() == hash_value else "corrupt", read
+
+
+def count_blobs(after=""):
+    return (
+        db.session.query(func.count(ImageORM.hash_value.distinct()))
+        .filter(ImageORM.hash_value.isnot(None), ImageORM.hash_value > after)
+        .scalar()
+    )
+
+
+def unfinished_run():
+    return ScrubRunORM.query.filter(ScrubRunORM.finished_at.is_(None)).order_by(ScrubRunORM.id.desc()).first()
+
+
+def scrub(workers, bytes_per_second, batch_size=SCRUB_BATCH_SIZE, restart=False, progress=None):
+    """
+    Check every blob images reference against storage, in one pass that merges the referenced hashes
+    with the sorted directory listing, both in hash order:
+    referenced and stored blobs are re-hashed on `workers` threads and compared with their name,
+    referenced blobs not stored are missing, and stored files no image references are orphaned unless
+    they are already queued for cleanup.
+    Resumes the last unfinished run unless `restart` is set. Each batch commits its findings together
+    with the checkpoint; `progress` is called with the number of blobs checked, inside that transaction.
+    Returns the run.
+    """
+    storage_path = current_app.config["STORAGE_PATH"]
+    run = None if restart else unfinished_run()
+    if not run:
+        run = ScrubRunORM(last_hash="")
+        db.session.add(run)
+        db.session.commit()
+
+    listing = sorted(
+        (match.group(1), name) for name in os.listdir(storage_path) if (match := BLOB_NAME.match(name))
+    )
+    bases = [base for base, _ in listing]
+    position = bisect.bisect_right(bases, run.last_hash)
+    throttle = Throttle(bytes_per_second)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scrub") as pool:
+        while True:
+            referenced = {}
+            for row in (
+                db.session.query(ImageORM.hash_value, ImageORM.hash_algorithm)
+                .filter(ImageORM.hash_value.isnot(None), ImageORM.hash_value > run.last_hash)
+                .distinct()
+                .order_by(ImageORM.hash_value)
+                .limit(batch_size)
+            ):
+                referenced[row.hash_value] = row.hash_algorithm or "sha256"
+            last_hash = max(referenced) if referenced else None
+            # The files in the same hash range as this batch, or all that are left after the last one
+            end = bisect.bisect_right(bases, last_hash) if last_hash else len(listing)
+            files = listing[position:end]
+            position = end
+
+            stored = {base for base, _ in files}
+            unreferenced = {base for base in stored if base not in referenced}
+            queued = set()
+            if unreferenced:
+                queued = {
+                    row.hash_value
+                    for row in db.session.query(BlobCleanupORM.hash_value).filter(
+                        BlobCleanupORM.hash_value.in_(unreferenced)
+                    )
+                }
+            issues = [
+                {"run_id": run.id, "name": name, "problem": "orphaned"}
+                for base, name in files
+                if base in unreferenced and base not in queued
+            ]
+
+            checks = [
+                (hash_value, algorithm) for hash_value, algorithm in referenced.items() if hash_value in stored
+            ]
+            bytes_read = 0
+            for hash_value, problem, read in pool.map(
+                lambda check: _verify(storage_path, throttle, *check), checks
+            ):
+                bytes_read += read
+                if problem:
+                    issues.append({"run_id": run.id, "name": hash_value, "problem": problem})
+            for hash_value in referenced:
+                # Stored since the listing was taken if it exists now
+                if hash_value not in stored and not os.path.exists(os.path.join(storage_path, hash_value)):
+                    issues.append({"run_id": run.id, "name": hash_value, "problem": "missing"})
+
+            if issues:
+                db.session.execute(insert(ScrubIssueORM), issues)
+            problems = [issue["problem"] for issue in issues]
+            values = {
+                "checked": ScrubRunORM.checked + len(referenced),
+                "bytes_read": ScrubRunORM.bytes_read + bytes_read,
+                "corrupt": ScrubRunORM.corrupt + problems.count("corrupt"),
+                "missing": ScrubRunORM.missing + problems.count("missing"),
+                "orphaned": ScrubRunORM.orphaned + problems.count("orphaned"),
+            }
+            if last_hash:
+                values["last_hash"] = last_hash
+            else:
+                values["finished_at"] = func.now()
+            db.session.execute(update(ScrubRunORM).where(ScrubRunORM.id == run.id).values(**values))
+            if progress and referenced:
+                progress(len(referenced))
+            db.session.commit()
+            db.session.refresh(run)
+            if not last_hash:
+                break
+
+    log.info(
+        "Scrub %s done: %s blobs checked, %s corrupt, %s missing, %s orphaned",
+        run.id, run.checked, run.corrupt, run.missing, run.orphaned,
+    )
+    return run
@@ -0,0 +1,326 @@
+"""
+Pre-forking server: create the application once, then serve it from several waitress worker processes
+sharing one listening socket.
+
+Usage:
+    python serve.py --workers 4 --threads 8 --port 8080
+
+Signals to the master process:
+    TERM, INT  stop accepting connections, let workers finish in-flight requests, then exit
+    HUP        replace the workers one at a time without dropping connections
+
+The application is loaded before forking, so HUP neither reloads code nor re-reads configuration; it only
+replaces the processes. Restart the master to deploy.
+
+Workers report a heartbeat through shared memory. A worker whose heartbeat is older than --timeout
+(because its event loop is stuck) is killed and replaced, as is any worker that exits.
+
+State that stays per worker: database connection pools, transcoding and job thread pools, rate limit
+buckets (each worker enforces 1/N of the configured rate) and the memoized API specification (rendered
+before forking, so identical everywhere). Prometheus metrics are merged across workers on /metrics.
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+import _thread
+from multiprocessing.sharedctypes import RawArray
+
+log = logging.getLogger("serve")
+
+# How often workers refresh their heartbeat and metrics snapshot
+HEARTBEAT_INTERVAL = 1.0
+
+# A worker that dies sooner than this after starting is respawned with an increasing delay
+MIN_WORKER_LIFETIME = 5.0
+MAX_RESPAWN_DELAY = 30.0
+
+
+def preload(workers):
+    """
+    Create the app in the master and do the per-process work that can be shared through fork.
+    """
+    from app import create_app
+    from extensions import api, db
+    import admission
+
+    app = create_app()
+    admission.split_between_workers(app, workers)
+    with app.test_request_context():
+        api.serialized_schema()
+        # Connections must not be shared between processes
+        db.engine.dispose()
+    return app
+
+
+def bind(host, port, backlog):
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.setblocking(False)
+    return sock
+
+
+def serve_worker(app, sock, threads, heartbeats, slot, graceful_timeout):
+    """
+    Runs in the forked child. Returns once the server has been shut down.
+    """
+    from waitress import create_server
+    from waitress.channel import HTTPChannel
+    from metrics import registry
+    from jobs import jobs
+    from stats import stats
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    server = create_server(app, sockets=[sock], threads=threads, ident="image-repository")
+    stopping = threading.Event()
+    finished = threading.Event()
+
+    def drained():
+        dispatcher = server.task_dispatcher
+        channels = [channel for channel in server._map.values() if isinstance(channel, HTTPChannel)]
+        return (
+            not dispatcher.queue
+            and not dispatcher.active_count
+            and not any(channel.requests or channel.total_outbufs_len for channel in channels)
+        )
+
+    def drain():
+        # Other workers take the new connections; wait for our requests and buffered responses to finish
+        server.accepting = False
+        deadline = time.monotonic() + graceful_timeout
+        while not drained() and time.monotonic() < deadline:
+            time.sleep(0.1)
+        finished.set()
+        _thread.interrupt_main(signal.SIGTERM)
+
+    def on_term(signum, frame):
+        if finished.is_set():
+            # Leaves the event loop; waitress then closes the remaining idle connections
+            raise SystemExit
+        if not stopping.is_set():
+            stopping.set()
+            threading.Thread(target=drain, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, on_term)
+
+    def mark_alive():
+        heartbeats[slot] = time.time()
+
+    def beat():
+        # The heartbeat is written by the event loop itself, so a wedged loop stops it
+        while True:
+            server.trigger.pull_trigger(mark_alive)
+            if registry.multiprocess_dir:
+                registry.write_snapshot()
+            time.sleep(HEARTBEAT_INTERVAL)
+
+    threading.Thread(target=beat, name="heartbeat", daemon=True).start()
+    log.info("Worker %d serving with %d threads", os.getpid(), threads)
+    server.run()
+    # Background jobs live in this process, so let them finish rather than abandoning them mid-chunk
+    jobs.shutdown()
+    # Forked workers exit without running atexit handlers, so counts still in memory are written here
+    try:
+        stats.flush()
+    except Exception:
+        log.exception("Flushing access statistics failed")
+    if registry.multiprocess_dir:
+        registry.write_snapshot()
+
+
+class Master:
+    def __init__(self, app, sock, workers, threads, timeout, graceful_timeout):
+        self.app = app
+        self.sock = sock
+        self.size = workers
+        self.threads = threads
+        self.timeout = timeout
+        self.graceful_timeout = graceful_timeout
+        # Two slots per worker, so replacements can start while the workers they replace drain
+        self.heartbeats = RawArray("d", workers * 2)
+        self.workers = {}  # pid -> slot
+        self.started = {}  # pid -> start time
+        self.retiring = set()
+        self.respawn_delay = 0
+        self.stopping = False
+        self.reloading = False
+
+    def free_slot(self):
+        return next(slot for slot in range(len(self.heartbeats)) if slot not in self.workers.values())
+
+    def spawn(self):
+        slot = self.free_slot()
+        self.heartbeats[slot] = 0
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                serve_worker(self.app, self.sock, self.threads, self.heartbeats, slot, self.graceful_timeout)
+            except BaseException:
+                log.exception("Worker %d failed", os.getpid())
+                code = 1
+            finally:
+                logging.shutdown()
+                os._exit(code)
+        self.workers[pid] = slot
+        self.started[pid] = time.monotonic()
+        return pid
+
+    def reap(self):
+        from metrics import registry
+
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            if pid not in self.workers:
+                continue
+            del self.workers[pid]
+            lifetime = time.monotonic() - self.started.pop(pid)
+            if registry.multiprocess_dir:
+                registry.retire(pid)
+            if pid in self.retiring:
+                self.retiring.discard(pid)
+                continue
+            if self.stopping:
+                continue
+            log.warning("Worker %d exited with status %d", pid, os.waitstatus_to_exitcode(status))
+            if lifetime < MIN_WORKER_LIFETIME:
+                self.respawn_delay = min(MAX_RESPAWN_DELAY, max(1, self.respawn_delay * 2))
+                log.warning("Worker died after %.1f s, waiting %d s before respawning", lifetime, self.respawn_delay)
+                time.sleep(self.respawn_delay)
+            else:
+                self.respawn_delay = 0
+            self.spawn()
+
+    def check_heartbeats(self):
+        for pid, slot in list(self.workers.items()):
+            if self.heartbeats[slot]:
+                age = time.time() - self.heartbeats[slot]
+            else:
+                age = time.monotonic() - self.started[pid]
+            if age > self.timeout:
+                log.error("Worker %d missed its heartbeat for %.1f s, killing it", pid, age)
+                self.kill(pid, signal.SIGKILL)
+
+    def kill(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def wait_ready(self, pid):
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline and pid in self.workers:
+            if self.heartbeats[self.workers[pid]]:
+                return True
+            time.sleep(0.1)
+            self.reap()
+        return False
+
+    def reload(self):
+        """
+        Start a replacement for each worker and retire the old one once the new one is serving.
+        """
+        self.reloading = False
+        log.info("Reloading %d workers", len(self.workers))
+        for pid in [pid for pid in self.workers if pid not in self.retiring]:
+            if self.stopping:
+                return
+            replacement = self.spawn()
+            if not self.wait_ready(replacement):
+                log.error("Replacement worker %d did not start, keeping worker %d", replacement, pid)
+                continue
+            self.retiring.add(pid)
+            self.kill(pid, signal.SIGTERM)
+
+    def stop(self):
+        log.info("Stopping %d workers", len(self.workers))
+        for pid in self.workers:
+            self.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout + 1
+        while self.workers and time.monotonic() < deadline:
+            time.sleep(0.1)
+            self.reap()
+        for pid in self.workers:
+            self.kill(pid, signal.SIGKILL)
+        self.reap()
+
+    def run(self):
+        def on_stop(signum, frame):
+            self.stopping = True
+
+        def on_hup(signum, frame):
+            self.reloading = True
+
+        signal.signal(signal.SIGTERM, on_stop)
+        signal.signal(signal.SIGINT, on_stop)
+        signal.signal(signal.SIGHUP, on_hup)
+
+        for _ in range(self.size):
+            self.spawn()
+        while not self.stopping:
+            time.sleep(0.5)
+            self.reap()
+            self.check_heartbeats()
+            if self.reloading:
+                self.reload()
+        self.stop()
+
+
+def main(argv=None):
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Serve the Image Repository API from several processes.")
+    parser.add_argument("--host", default=Config.SERVE_HOST)
+    parser.add_argument("--port", type=int, default=Config.SERVE_PORT)
+    parser.add_argument("--workers", type=int, default=Config.SERVE_WORKERS)
+    parser.add_argument("--threads", type=int, default=Config.SERVE_THREADS, help="Threads per worker.")
+    parser.add_argument("--backlog", type=int, default=1024)
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=Config.SERVE_TIMEOUT,
+        help="Seconds without a heartbeat before a worker is killed and replaced.",
+    )
+    parser.add_argument(
+        "--graceful-timeout",
+        type=float,
+        default=Config.SERVE_GRACEFUL_TIMEOUT,
+        help="Seconds a stopping worker may spend finishing in-flight requests.",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(process)d] %(levelname)s %(message)s")
+
+    from metrics import registry
+
+    metrics_dir = tempfile.mkdtemp(prefix="image-repo-metrics-")
+    try:
+        # Even a single worker overlaps with its replacement during a reload
+        registry.multiprocess_dir = metrics_dir
+        app = preload(args.workers)
+        sock = bind(args.host, args.port, args.backlog)
+        log.info("Listening on %s:%d with %d workers", args.host, args.port, args.workers)
+        Master(app, sock, args.workers, args.threads, args.timeout, args.graceful_timeout).run()
+    finally:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
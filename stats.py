@@ -0,0 +1,140 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from sqlalchemy import func
+from extensions import db
+from orm.stats import StatsORM, PopularImageORM
+
+log = logging.getLogger(__name__)
+
+
+class StatsRecorder:
+    """
+    Counts views and downloads in memory and writes them to StatsORM in one upsert per interval, so
+    serving a file costs no database write. Each request thread increments its own dictionary without
+    a lock; the flusher only reads them and keeps what it has already written, so counting and flushing
+    never wait on each other. Counts not yet flushed are lost if the process is killed.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._local = threading.local()
+        # [thread, counts, counts as last flushed] for each thread that has recorded anything
+        self._threads = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pid = None
+        self._popular_due = 0
+
+    def init_app(self, app):
+        self._app = app
+        self.interval = app.config["STATS_FLUSH_SECONDS"]
+        self.popular_interval = app.config["POPULAR_REFRESH_SECONDS"]
+        self.popular_size = app.config["POPULAR_SIZE"]
+        atexit.register(self._flush_at_exit)
+
+    def view(self, kind, object_id):
+        self._counts()[(kind, object_id, "views")] += 1
+
+    def download(self, kind, object_id):
+        self._counts()[(kind, object_id, "downloads")] += 1
+
+    def _counts(self):
+        counts = getattr(self._local, "counts", None)
+        if counts is None or self._pid != os.getpid():
+            counts = self._local.counts = Counter()
+            with self._lock:
+                # A forked worker starts counting afresh, with a flusher of its own
+                if self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    self._threads = []
+                    threading.Thread(target=self._run, name="stats", daemon=True).start()
+                self._threads.append([threading.current_thread(), counts, {}])
+        return counts
+
+    def _run(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                log.exception("Flushing access statistics failed")
+
+    def _flush_at_exit(self):
+        # Only counts still unwritten: a process that never counted anything, such as a CLI command, or a
+        # benchmark that flushed before removing its database, never touches the database here
+        if self._app and self._pid == os.getpid() and self._threads:
+            with self._flush_lock:
+                self._write_counts()
+
+    def flush(self, refresh_popular=False):
+        """
+        Write the counts recorded since the last flush, and rebuild the popular ranking if it is due.
+        """
+        # Nothing to do in a process that never counted anything, such as the serve.py master
+        if not self._app or (self._pid != os.getpid() and not refresh_popular):
+            return
+        with self._flush_lock:
+            self._write_counts()
+
+            now = datetime.now(timezone.utc).timestamp()
+            if refresh_popular or now >= self._popular_due:
+                self._popular_due = now + self.popular_interval
+                with self._app.app_context():
+                    self._refresh_popular(force=refresh_popular)
+
+    def _write_counts(self):
+        # Called with the flush lock held
+        with self._lock:
+            entries = list(self._threads) if self._pid == os.getpid() else []
+        totals = Counter()
+        snapshots = []
+        for entry in entries:
+            thread, counts, flushed = entry
+            # Checked first, so a finished thread can't have counted anything after its snapshot
+            finished = not thread.is_alive()
+            snapshot = dict(counts)
+            for key, value in snapshot.items():
+                totals[key] += value - flushed.get(key, 0)
+            snapshots.append((entry, snapshot, finished))
+
+        rows = {}
+        for (kind, object_id, field), delta in totals.items():
+            if delta:
+                row = rows.setdefault(
+                    (kind, object_id), {"kind": kind, "object_id": object_id, "views": 0, "downloads": 0}
+                )
+                row[field] = delta
+        if rows:
+            with self._app.app_context():
+                StatsORM.add(list(rows.values()))
+                db.session.commit()
+
+        # Only once written, so a failed flush is retried with the same deltas next time
+        with self._lock:
+            for entry, snapshot, finished in snapshots:
+                entry[2] = snapshot
+                if finished:
+                    self._threads.remove(entry)
+
+    def _refresh_popular(self, force):
+        # Every worker flushes, but the ranking only needs rebuilding by one of them per interval
+        refreshed_at = db.session.query(func.max(PopularImageORM.refreshed_at)).scalar()
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        if not force and refreshed_at and (now - refreshed_at).total_seconds() < self.popular_interval:
+            return
+        try:
+            PopularImageORM.refresh(self.popular_size, now)
+            db.session.commit()
+        except Exception:
+            # Most likely another worker rebuilding it at the same moment
+            db.session.rollback()
+            log.warning("Refreshing popular images failed", exc_info=True)
+
+
+stats = StatsRecorder()
@@ -0,0 +1,240 @@
+import re
+from sqlalchemy import and_, bindparam, case, delete, false, func, select, true, update
+from extensions import db
+from orm.image import ImageORM
+from orm.tag import TagORM, ImageTagsORM
+
+TAG_NAME = re.compile(r"^[\w\-]{1,64}$")
+MAX_TAGS = 50
+
+
+class TagError(Exception):
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def parse_names(value):
+    """
+    Normalize tag names given as a list or a comma-separated string: trimmed, lower-cased, deduplicated.
+    """
+    if isinstance(value, str):
+        value = value.split(",")
+    names = list(dict.fromkeys(name.strip().lower() for name in value or () if name and name.strip()))
+    if not names:
+        raise TagError("At least one tag is required", 400)
+    if len(names) > MAX_TAGS:
+        raise TagError(f"At most {MAX_TAGS} tags are allowed", 400)
+    invalid = [name for name in names if not TAG_NAME.match(name)]
+    if invalid:
+        raise TagError(f"Invalid tags: {', '.join(invalid)}", 400)
+    return names
+
+
+def tag_ids(names, create=False):
+    """
+    Map tag names to IDs, creating the missing tags if `create` is set. Runs in the caller's transaction.
+    """
+    ids = dict(db.session.query(TagORM.name, TagORM.id).filter(TagORM.name.in_(names)))
+    missing = [name for name in names if name not in ids]
+    if create and missing:
+        # Another request may be creating the same tags, so existing names are skipped rather than clashing
+        TagORM.create(missing)
+        ids.update(db.session.query(TagORM.name, TagORM.id).filter(TagORM.name.in_(missing)))
+    return ids
+
+
+def _link_counts(condition):
+    """
+    Links matching `condition` per tag, in total and on public images.
+    """
+    return (
+        db.session.query(
+            ImageTagsORM.tag_id,
+            func.count(),
+            func.sum(case((ImageORM.visibility == 0, 1), else_=0)),
+        )
+        .join(ImageORM, ImageORM.id == ImageTagsORM.image_id)
+        .filter(condition)
+        .group_by(ImageTagsORM.tag_id)
+        .all()
+    )
+
+
+def _adjust(counts, sign):
+    counts = [(tag_id, total, public) for tag_id, total, public in counts if total or public]
+    if not counts:
+        return
+    tags = TagORM.__table__
+    db.session.execute(
+        update(tags)
+        .where(tags.c.id == bindparam("tag_id"))
+        .values(
+            image_count=tags.c.image_count + bindparam("total"),
+            public_count=tags.c.public_count + bindparam("public"),
+        ),
+        [
+            {"tag_id": tag_id, "total": sign * total, "public": sign * (public or 0)}
+            for tag_id, total, public in counts
+        ],
+    )
+
+
+def _by_visibility(image_ids):
+    """
+    Split the images into public and other ones. The rows stay locked until commit, as in an image update,
+    so the visibility the counters are adjusted by can't change underneath.
+    """
+    public, other = [], []
+    rows = (
+        db.session.query(ImageORM.id, ImageORM.visibility)
+        .filter(ImageORM.id.in_(image_ids))
+        .order_by(ImageORM.id)
+        .with_for_update()
+    )
+    for image_id, visibility in rows:
+        (public if visibility == 0 else other).append(image_id)
+    return public, other
+
+
+def tag_images(image_ids, names):
+    """
+    Add the tags to the images, creating tags as needed; existing links are left alone.
+    Only the links actually inserted are counted, so concurrent requests adding the same tags count each
+    link once. Runs in the caller's transaction.
+    """
+    public, other = _by_visibility(image_ids)
+    counts = []
+    for tag_id in tag_ids(names, create=True).values():
+        added_public = ImageTagsORM.link(tag_id, public)
+        counts.append((tag_id, added_public + ImageTagsORM.link(tag_id, other), added_public))
+    _adjust(counts, 1)
+
+
+def untag_images(image_ids, names):
+    """
+    Remove the tags from the images, counting only the links actually deleted. Runs in the caller's
+    transaction.
+    """
+    ids = list(tag_ids(names).values())
+    if not ids:
+        return
+    public, other = _by_visibility(image_ids)
+
+    def unlink(tag_id, group):
+        if not group:
+            return 0
+        return db.session.execute(
+            delete(ImageTagsORM).where(ImageTagsORM.tag_id == tag_id, ImageTagsORM.image_id.in_(group))
+        ).rowcount
+
+    counts = []
+    for tag_id in ids:
+        removed_public = unlink(tag_id, public)
+        counts.append((tag_id, removed_public + unlink(tag_id, other), removed_public))
+    _adjust(counts, -1)
+
+
+def images_untagged(image_ids):
+    """
+    Remove every tag from images about to be deleted. Runs in the caller's transaction.
+    """
+    condition = ImageTagsORM.image_id.in_(image_ids)
+    _adjust(_link_counts(condition), -1)
+    db.session.execute(delete(ImageTagsORM).where(condition))
+
+
+def visibility_changed(image_id, was_public, is_public):
+    """
+    Move an image's tags in or out of the public counts. Runs in the caller's transaction.
+    """
+    if was_public == is_public:
+        return
+    db.session.execute(
+        update(TagORM)
+        .where(TagORM.id.in_(select(ImageTagsORM.tag_id).where(ImageTagsORM.image_id == image_id)))
+        .values(public_count=TagORM.public_count + (1 if is_public else -1))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def tag_filter(names, mode):
+    """
+    A condition on ImageORM.id selecting images with all (or, with mode "any", any) of the tags.
+    Each tag is its own lookup on the (tag_id, image_id) index, so the database intersects or unions
+    index ranges instead of scanning images.
+    """
+    ids = tag_ids(names)
+    if mode == "any":
+        if not ids:
+            return false()
+        return ImageORM.id.in_(
+            select(ImageTagsORM.image_id).where(ImageTagsORM.tag_id.in_(list(ids.values())))
+        )
+    if len(ids) < len(names):
+        return false()
+    return and_(
+        *(
+            ImageORM.id.in_(select(ImageTagsORM.image_id).where(ImageTagsORM.tag_id == tag_id))
+            for tag_id in ids.values()
+        )
+    )
+
+
+def facets(user, prefix=None, limit=100):
+    """
+    Tag names with how many images the user can list carry them, most used first.
+    Anonymous users get the public counts and admins the totals, both read straight from the counters;
+    other users get the public counts plus their own non-public images, which only scans their images.
+    """
+    if user and user.permission_level >= 2:
+        count = TagORM.image_count
+    else:
+        count = TagORM.public_count
+    query = db.session.query(TagORM.id, TagORM.name, count.label("count"))
+    if prefix:
+        query = query.filter(TagORM.name.startswith(prefix.strip().lower(), autoescape=True))
+
+    if not user or user.permission_level >= 2:
+        rows = query.filter(count > 0).order_by(count.desc(), TagORM.name).limit(limit)
+        return [{"name": row.name, "count": row.count} for row in rows]
+
+    own = dict(
+        db.session.query(ImageTagsORM.tag_id, func.count())
+        .join(ImageORM, ImageORM.id == ImageTagsORM.image_id)
+        .filter(ImageORM.owner_id == user.id, ImageORM.visibility != 0)
+        .group_by(ImageTagsORM.tag_id)
+    )
+    # Only tags in the public top list or among the user's own can make the combined top list
+    rows = {row.id: row for row in query.filter(count > 0).order_by(count.desc(), TagORM.name).limit(limit)}
+    if own:
+        rows.update((row.id, row) for row in query.filter(TagORM.id.in_(list(own))))
+    result = sorted(
+        ({"name": row.name, "count": row.count + own.get(row.id, 0)} for row in rows.values()),
+        key=lambda tag: (-tag["count"], tag["name"]),
+    )
+    return result[:limit]
+
+
+def recount():
+    """
+    Recompute every tag's counts from image_tags, for drift or rows written before they were maintained.
+    Runs in the caller's transaction.
+    """
+    links = ImageTagsORM.__table__.c
+    images = ImageORM.__table__.c
+
+    def counted(condition):
+        return (
+            select(func.count())
+            .select_from(ImageTagsORM.__table__.join(ImageORM.__table__, images.id == links.image_id))
+            .where(links.tag_id == TagORM.id, condition)
+            .scalar_subquery()
+        )
+
+    db.session.execute(
+        update(TagORM)
+        .values(image_count=counted(true()), public_count=counted(images.visibility == 0))
+        .execution_options(synchronize_session=False)
+    )
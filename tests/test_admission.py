@@ -0,0 +1,52 @@
+import time
+import unittest
+import uuid
+import requests
+
+
+class TestAdmissionAPI(unittest.TestCase):
+    BASE_URL = "http://127.0.0.1:5000"
+
+    def test_01_rate_limit(self):
+        # 每个用户单独限流，使用新注册的用户避免影响其他测试
+        username = f"limited{uuid.uuid4().hex[:8]}"
+        requests.post(
+            f"{self.BASE_URL}/users",
+            json={"username": username, "nickname": username, "password": "limited", "permission_level": 1},
+        )
+        response = requests.post(f"{self.BASE_URL}/session", json={"username": username, "password": "limited"})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        for _ in range(1000):
+            response = requests.get(f"{self.BASE_URL}/version", headers=headers)
+            if response.status_code != 200:
+                break
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response.headers["Retry-After"]), 1)
+
+        # 不带令牌的请求按IP限流，不受影响
+        response = requests.get(f"{self.BASE_URL}/version")
+        self.assertEqual(response.status_code, 200)
+
+    def test_02_forged_tokens_share_address_limit(self):
+        # 未通过校验的令牌按IP限流，每次换一个随机令牌也无法绕过
+        for _ in range(1000):
+            headers = {"Authorization": f"Bearer {uuid.uuid4()}"}
+            response = requests.get(f"{self.BASE_URL}/version", headers=headers)
+            if response.status_code != 200:
+                break
+        self.assertEqual(response.status_code, 429)
+        # 与不带令牌的请求共用同一个令牌桶；桶会持续补充，单独的桶则可以连续通过10次
+        statuses = [requests.get(f"{self.BASE_URL}/version").status_code for _ in range(10)]
+        self.assertIn(429, statuses)
+        # 等待令牌桶补满
+        time.sleep(3)
+
+    def test_03_health_is_exempt(self):
+        headers = {"Authorization": f"Bearer {uuid.uuid4()}"}
+        for _ in range(200):
+            response = requests.get(f"{self.BASE_URL}/health", headers=headers)
+            self.assertEqual(response.status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,6 @@
+import io
 import unittest
+import zipfile
 import requests
 
 # 定义全局变量
@@ -57,6 +59,15 @@ class TestAlbumAPI(unittest.TestCase):
         self.assertEqual(response.status_code, 201)
         GLOBAL_ALBUM_LOCATION = response.headers["Location"]
 
+    def test_04a_upload_image1(self):
+        with open("tests/test.png", "rb") as file:
+            response = requests.post(
+                f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID1}/file",
+                headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+                files={"file": file},
+            )
+        self.assertEqual(response.status_code, 200)
+
     def test_05_get_album(self):
         response = requests.get(
             f"{self.BASE_URL}{GLOBAL_ALBUM_LOCATION}",
@@ -64,6 +75,42 @@ class TestAlbumAPI(unittest.TestCase):
         )
         self.assertEqual(response.status_code, 200)
 
+    def test_05a_download_album_archive(self):
+        response = requests.get(
+            f"{self.BASE_URL}{GLOBAL_ALBUM_LOCATION}/archive",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Content-Type"], "application/zip")
+        with open("tests/test.png", "rb") as file:
+            expected = file.read()
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            # Only image 1 has a file
+            self.assertEqual(archive.namelist(), [f"{GLOBAL_IMAGE_ID1}.png"])
+            self.assertEqual(archive.read(f"{GLOBAL_IMAGE_ID1}.png"), expected)
+
+    def test_05b_download_album_archive_from_offset(self):
+        response = requests.get(
+            f"{self.BASE_URL}{GLOBAL_ALBUM_LOCATION}/archive",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+            params={"offset": 1},
+        )
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            self.assertEqual(archive.namelist(), [])
+
+    def test_05c_get_album_fields(self):
+        response = requests.get(
+            f"{self.BASE_URL}{GLOBAL_ALBUM_LOCATION}",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+            params={"fields": "album_name,images"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {"album_name": "test", "images": [int(GLOBAL_IMAGE_ID1), int(GLOBAL_IMAGE_ID2)]},
+        )
+
     def test_06_update_album(self):
         response = requests.put(
             f"{self.BASE_URL}{GLOBAL_ALBUM_LOCATION}",
@@ -80,6 +127,24 @@ class TestAlbumAPI(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json()["description"], "test2")
 
+    def test_07a_get_album_not_modified(self):
+        response = requests.get(
+            f"{self.BASE_URL}{GLOBAL_ALBUM_LOCATION}",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+        )
+        etag = response.headers["ETag"]
+        response = requests.get(
+            f"{self.BASE_URL}{GLOBAL_ALBUM_LOCATION}",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}", "If-None-Match": etag},
+        )
+        self.assertEqual(response.status_code, 304)
+        response = requests.put(
+            f"{self.BASE_URL}{GLOBAL_ALBUM_LOCATION}",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}", "If-Match": '"0"'},
+            json={"album_name": "test", "description": "test3", "visibility": 0, "images": [GLOBAL_IMAGE_ID1]},
+        )
+        self.assertEqual(response.status_code, 412)
+
     def test_08_delete_album(self):
         response = requests.delete(
             f"{self.BASE_URL}{GLOBAL_ALBUM_LOCATION}",
@@ -94,6 +159,27 @@ class TestAlbumAPI(unittest.TestCase):
         )
         self.assertEqual(response.status_code, 404)
 
+    def test_09a_bulk_delete_albums(self):
+        response = requests.post(
+            f"{self.BASE_URL}/albums",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+            json={"album_name": "bulk", "description": "bulk", "visibility": 0, "images": [GLOBAL_IMAGE_ID1]},
+        )
+        self.assertEqual(response.status_code, 201)
+        response = requests.post(
+            f"{self.BASE_URL}/albums/bulk-delete",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+            json={"created_after": "2000-01-01T00:00:00"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["deleted"], 1)
+        response = requests.post(
+            f"{self.BASE_URL}/albums/bulk-delete",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+            json={},
+        )
+        self.assertEqual(response.status_code, 400)
+
     def test_10_logout(self):
         response = requests.delete(
             f"{self.BASE_URL}/session",
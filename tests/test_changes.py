@@ -0,0 +1,113 @@
+import time
+import unittest
+import requests
+
+# 定义全局变量
+GLOBAL_ACCESS_TOKEN = None
+GLOBAL_REFRESH_TOKEN = None
+GLOBAL_CURSOR = None
+GLOBAL_IMAGE_IDS = []
+
+# 略大于服务器的 CHANGES_SETTLE_SECONDS
+SETTLE_SECONDS = 2.1
+
+
+class TestChangesAPI(unittest.TestCase):
+    BASE_URL = "http://127.0.0.1:5000"
+
+    @classmethod
+    def setUpClass(cls):
+        # 在测试开始前重置数据库
+        requests.get(f"{cls.BASE_URL}/util/drop")
+        requests.get(f"{cls.BASE_URL}/util/init")
+
+    def test_01_login(self):
+        global GLOBAL_ACCESS_TOKEN, GLOBAL_REFRESH_TOKEN
+        response = requests.post(
+            f"{self.BASE_URL}/session",
+            json={"username": "admin", "password": "admin"},
+        )
+        self.assertEqual(response.status_code, 200)
+        GLOBAL_ACCESS_TOKEN = response.json()["access_token"]
+        GLOBAL_REFRESH_TOKEN = response.json()["refresh_token"]
+
+    def test_02_get_cursor(self):
+        global GLOBAL_CURSOR
+        response = requests.get(
+            f"{self.BASE_URL}/changes",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["changes"], [])
+        GLOBAL_CURSOR = response.json()["next"]
+
+    def test_03_make_changes(self):
+        for visibility in (0, 2, 0):
+            response = requests.post(
+                f"{self.BASE_URL}/images",
+                headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+                json={"description": "test", "visibility": visibility},
+            )
+            self.assertEqual(response.status_code, 201)
+            GLOBAL_IMAGE_IDS.append(int(response.headers["Location"].split("/")[-1]))
+        response = requests.put(
+            f"{self.BASE_URL}/images/{GLOBAL_IMAGE_IDS[0]}",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+            json={"description": "test2", "visibility": 0},
+        )
+        self.assertEqual(response.status_code, 200)
+        response = requests.delete(
+            f"{self.BASE_URL}/images/{GLOBAL_IMAGE_IDS[2]}",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+        )
+        self.assertEqual(response.status_code, 200)
+        time.sleep(SETTLE_SECONDS)
+
+    def test_04_get_changes(self):
+        global GLOBAL_CURSOR
+        response = requests.get(
+            f"{self.BASE_URL}/changes",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+            params={"since": GLOBAL_CURSOR},
+        )
+        self.assertEqual(response.status_code, 200)
+        changes = response.json()["changes"]
+        self.assertEqual(
+            [(change["id"], change["op"]) for change in changes],
+            [(GLOBAL_IMAGE_IDS[1], "upsert"), (GLOBAL_IMAGE_IDS[0], "upsert"), (GLOBAL_IMAGE_IDS[2], "delete")],
+        )
+        self.assertEqual(changes[1]["image"]["description"], "test2")
+        self.assertFalse(response.json()["has_more"])
+        GLOBAL_CURSOR = response.json()["next"]
+
+    def test_05_get_changes_anonymous(self):
+        response = requests.get(f"{self.BASE_URL}/changes", params={"since": 0, "limit": 2})
+        self.assertEqual(response.status_code, 200)
+        changes = response.json()["changes"]
+        # 私有图片对匿名用户显示为删除
+        self.assertEqual(
+            [(change["id"], change["op"]) for change in changes],
+            [(GLOBAL_IMAGE_IDS[0], "upsert"), (GLOBAL_IMAGE_IDS[1], "delete")],
+        )
+        self.assertTrue(response.json()["has_more"])
+
+    def test_06_get_changes_again(self):
+        response = requests.get(
+            f"{self.BASE_URL}/changes",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+            params={"since": GLOBAL_CURSOR},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["changes"], [])
+        self.assertEqual(response.json()["next"], GLOBAL_CURSOR)
+
+    def test_07_logout(self):
+        response = requests.delete(
+            f"{self.BASE_URL}/session",
+            headers={"Authorization": f"Bearer {GLOBAL_REFRESH_TOKEN}"},
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import json
+import unittest
+import requests
+
+# 定义全局变量
+GLOBAL_ACCESS_TOKEN = None
+GLOBAL_REFRESH_TOKEN = None
+GLOBAL_IMAGE_IDS = []
+
+
+class TestExportAPI(unittest.TestCase):
+    BASE_URL = "http://127.0.0.1:5000"
+
+    @classmethod
+    def setUpClass(cls):
+        # 在测试开始前重置数据库
+        requests.get(f"{cls.BASE_URL}/util/drop")
+        requests.get(f"{cls.BASE_URL}/util/init")
+
+    def test_01_login(self):
+        global GLOBAL_ACCESS_TOKEN, GLOBAL_REFRESH_TOKEN
+        response = requests.post(
+            f"{self.BASE_URL}/session",
+            json={"username": "admin", "password": "admin"},
+        )
+        self.assertEqual(response.status_code, 200)
+        GLOBAL_ACCESS_TOKEN = response.json()["access_token"]
+        GLOBAL_REFRESH_TOKEN = response.json()["refresh_token"]
+
+    def test_02_create_images(self):
+        for visibility in (0, 2, 0):
+            response = requests.post(
+                f"{self.BASE_URL}/images",
+                headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+                json={"description": "test", "visibility": visibility},
+            )
+            self.assertEqual(response.status_code, 201)
+            GLOBAL_IMAGE_IDS.append(int(response.headers["Location"].split("/")[-1]))
+
+    def test_03_create_album(self):
+        response = requests.post(
+            f"{self.BASE_URL}/albums",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+            json={"album_name": "test", "description": "test", "visibility": 0, "images": GLOBAL_IMAGE_IDS},
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_04_export_images(self):
+        response = requests.get(
+            f"{self.BASE_URL}/export/images",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Content-Type"], "application/x-ndjson")
+        ids = [json.loads(line)["id"] for line in response.text.splitlines()]
+        self.assertEqual(ids, GLOBAL_IMAGE_IDS)
+
+    def test_05_export_images_anonymous(self):
+        response = requests.get(f"{self.BASE_URL}/export/images")
+        self.assertEqual(response.status_code, 200)
+        ids = [json.loads(line)["id"] for line in response.text.splitlines()]
+        self.assertEqual(ids, [GLOBAL_IMAGE_IDS[0], GLOBAL_IMAGE_IDS[2]])
+
+    def test_06_export_images_resume(self):
+        response = requests.get(
+            f"{self.BASE_URL}/export/images",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+            params={"after_id": GLOBAL_IMAGE_IDS[0]},
+        )
+        self.assertEqual(response.status_code, 200)
+        ids = [json.loads(line)["id"] for line in response.text.splitlines()]
+        self.assertEqual(ids, GLOBAL_IMAGE_IDS[1:])
+
+    def test_07_export_albums(self):
+        response = requests.get(
+            f"{self.BASE_URL}/export/albums",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+        )
+        self.assertEqual(response.status_code, 200)
+        albums = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(len(albums), 1)
+        self.assertEqual(albums[0]["images"], GLOBAL_IMAGE_IDS)
+
+    def test_08_logout(self):
+        response = requests.delete(
+            f"{self.BASE_URL}/session",
+            headers={"Authorization": f"Bearer {GLOBAL_REFRESH_TOKEN}"},
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,12 @@
+import hashlib
+import io
+import random
+import time
 import unittest
+import uuid
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
 
 # 定义全局变量
 GLOBAL_ACCESS_TOKEN = None
@@ -42,6 +49,26 @@ class TestImageAPI(unittest.TestCase):
         )
         self.assertEqual(response.status_code, 200)
 
+    def test_03a_get_image_fields(self):
+        response = requests.get(
+            f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID}",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+            params={"fields": "id,hash_value"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"id": int(GLOBAL_IMAGE_ID), "hash_value": None})
+        response = requests.get(
+            f"{self.BASE_URL}/images",
+            params={"fields": "id"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["images"], [{"id": int(GLOBAL_IMAGE_ID)}])
+        response = requests.get(
+            f"{self.BASE_URL}/images",
+            params={"fields": "id,password"},
+        )
+        self.assertEqual(response.status_code, 400)
+
     def test_04_upload_image(self):
         with open("tests/test.png", "rb") as file:
             response = requests.post(
@@ -51,6 +78,46 @@ class TestImageAPI(unittest.TestCase):
             )
         self.assertEqual(response.status_code, 200)
 
+    def test_04a_get_image_metadata(self):
+        response = requests.get(
+            f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID}",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["format"], "png")
+        self.assertEqual(response.json()["mimetype"], "image/png")
+        self.assertEqual(response.json()["width"], 1250)
+        self.assertEqual(response.json()["height"], 1250)
+        self.assertEqual(response.json()["size"], 21834)
+
+    def test_04b_storage_usage(self):
+        headers = {"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"}
+
+        def usage():
+            response = requests.get(
+                f"{self.BASE_URL}/users/1?fields=image_count,logical_bytes,unique_bytes", headers=headers
+            )
+            self.assertEqual(response.status_code, 200)
+            return response.json()
+
+        self.assertEqual(usage(), {"image_count": 1, "logical_bytes": 21834, "unique_bytes": 21834})
+
+        # 同一文件上传到第二张图片：逻辑大小翻倍，去重后大小不变
+        response = requests.post(
+            f"{self.BASE_URL}/images", headers=headers, json={"description": "copy", "visibility": 0}
+        )
+        image_id = response.headers["Location"].split("/")[-1]
+        with open("tests/test.png", "rb") as file:
+            response = requests.post(
+                f"{self.BASE_URL}/images/{image_id}/file", headers=headers, files={"file": file}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(usage(), {"image_count": 2, "logical_bytes": 43668, "unique_bytes": 21834})
+
+        response = requests.delete(f"{self.BASE_URL}/images/{image_id}", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(usage(), {"image_count": 1, "logical_bytes": 21834, "unique_bytes": 21834})
+
     def test_05_update_image(self):
         response = requests.put(
             f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID}",
@@ -59,6 +126,38 @@ class TestImageAPI(unittest.TestCase):
         )
         self.assertEqual(response.status_code, 200)
 
+    def test_05a_conditional_update_image(self):
+        response = requests.get(
+            f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID}",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+        )
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers["ETag"]
+        response = requests.get(
+            f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID}",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}", "If-None-Match": etag},
+        )
+        self.assertEqual(response.status_code, 304)
+        response = requests.put(
+            f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID}",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}", "If-Match": etag},
+            json={"description": "test3", "visibility": 1},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+        response = requests.put(
+            f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID}",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}", "If-Match": etag},
+            json={"description": "test4", "visibility": 1},
+        )
+        self.assertEqual(response.status_code, 412)
+        response = requests.get(
+            f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID}",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}", "If-None-Match": etag},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["description"], "test3")
+
     def test_06_get_image_file(self):
         response = requests.get(
             f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID}/file",
@@ -66,6 +165,187 @@ class TestImageAPI(unittest.TestCase):
         )
         self.assertEqual(response.status_code, 200)
 
+    def test_06a_get_image_file_negotiated(self):
+        response = requests.get(
+            f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID}/file",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}", "Accept": "image/webp,*/*"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(response.headers["Content-Type"], ("image/png", "image/webp"))
+        self.assertIn("Accept", response.headers["Vary"])
+
+    def test_06b_signed_file_url(self):
+        response = requests.post(
+            f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID}/file-url",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+        )
+        self.assertEqual(response.status_code, 200)
+        url = response.json()["url"]
+        self.assertIn("expires_at", response.json())
+
+        # 签名URL无需令牌即可下载
+        response = requests.get(f"{self.BASE_URL}{url}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Content-Type"], "image/png")
+        self.assertIn("max-age", response.headers["Cache-Control"])
+
+        # 篡改签名或参数后被拒绝
+        response = requests.get(f"{self.BASE_URL}{url[:-2]}xx")
+        self.assertEqual(response.status_code, 403)
+        response = requests.get(f"{self.BASE_URL}{url.replace('mimetype=image%2Fpng', 'mimetype=text%2Fhtml')}")
+        self.assertEqual(response.status_code, 403)
+
+    def test_06c_signed_file_url_private(self):
+        response = requests.post(
+            f"{self.BASE_URL}/images",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+            json={"description": "private", "visibility": 2},
+        )
+        image_id = response.headers["Location"].split("/")[-1]
+        response = requests.post(f"{self.BASE_URL}/images/{image_id}/file-url")
+        self.assertEqual(response.status_code, 403)
+        # 尚未上传文件
+        response = requests.post(
+            f"{self.BASE_URL}/images/{image_id}/file-url",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_06d_access_stats(self):
+        headers = {"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"}
+        requests.get(f"{self.BASE_URL}/util/flush-stats")
+        response = requests.get(f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID}/stats", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        before = response.json()
+
+        # 访问计数先记在内存中，写入后才能查到
+        requests.get(f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID}", headers=headers)
+        requests.get(f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID}/file", headers=headers)
+        url = requests.post(f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID}/file-url", headers=headers).json()["url"]
+        requests.get(f"{self.BASE_URL}{url}")
+        requests.get(f"{self.BASE_URL}/util/flush-stats")
+
+        response = requests.get(f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID}/stats", headers=headers)
+        self.assertEqual(response.json()["views"], before["views"] + 1)
+        self.assertEqual(response.json()["downloads"], before["downloads"] + 2)
+
+        # 签名中包含图片ID，不能改记到其他图片上
+        response = requests.get(f"{self.BASE_URL}{url.replace(f'image={GLOBAL_IMAGE_ID}', 'image=999')}")
+        self.assertEqual(response.status_code, 403)
+
+        # 隐藏图片有访问量也不进入热门列表，匿名用户无法查看其统计
+        response = requests.get(f"{self.BASE_URL}/images/popular")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(int(GLOBAL_IMAGE_ID), [image["image_id"] for image in response.json()["images"]])
+        response = requests.get(f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID}/stats")
+        self.assertEqual(response.status_code, 403)
+
+    def test_06e_rekey_blobs(self):
+        headers = {"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"}
+        with open("tests/test.png", "rb") as file:
+            content = file.read()
+
+        def rekey(algorithm):
+            response = requests.post(
+                f"{self.BASE_URL}/jobs/rekey-blobs", headers=headers, params={"algorithm": algorithm}
+            )
+            self.assertEqual(response.status_code, 202)
+            job_url = f"{self.BASE_URL}{response.headers['Location']}"
+            for _ in range(50):
+                job = requests.get(job_url, headers=headers).json()
+                if job["status"] in ("done", "failed"):
+                    break
+                time.sleep(0.1)
+            self.assertEqual(job["status"], "done")
+
+        # 改用blake2b寻址后，图片记录新的哈希值和算法，文件仍可下载
+        rekey("blake2b")
+        response = requests.get(f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID}", headers=headers)
+        self.assertEqual(response.json()["hash_algorithm"], "blake2b")
+        self.assertEqual(response.json()["hash_value"], hashlib.blake2b(content, digest_size=32).hexdigest())
+        response = requests.get(f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID}/file", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, content)
+
+        rekey("sha256")
+        response = requests.get(f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID}", headers=headers)
+        self.assertEqual(response.json()["hash_algorithm"], "sha256")
+        self.assertEqual(response.json()["hash_value"], hashlib.sha256(content).hexdigest())
+
+    def test_06f_scrub_blobs(self):
+        headers = {"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"}
+        response = requests.post(
+            f"{self.BASE_URL}/jobs/scrub-blobs", headers=headers, params={"restart": "true"}
+        )
+        self.assertEqual(response.status_code, 202)
+        job_url = f"{self.BASE_URL}{response.headers['Location']}"
+        for _ in range(50):
+            job = requests.get(job_url, headers=headers).json()
+            if job["status"] in ("done", "failed"):
+                break
+            time.sleep(0.1)
+        self.assertEqual(job["status"], "done")
+
+        # 上传的文件完好，没有损坏或缺失的文件
+        response = requests.get(f"{self.BASE_URL}/jobs/scrub-blobs", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.json()["finished_at"])
+        self.assertGreaterEqual(response.json()["checked"], 1)
+        self.assertEqual(response.json()["corrupt"], 0)
+        self.assertEqual(response.json()["missing"], 0)
+
+        # 仅管理员可以查看
+        response = requests.get(f"{self.BASE_URL}/jobs/scrub-blobs")
+        self.assertEqual(response.status_code, 401)
+
+    def transcoded(self, content):
+        """
+        上传文件，请求WebP版本直到后台转码完成，返回转码后的图片。
+        """
+        headers = {"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"}
+        response = requests.post(
+            f"{self.BASE_URL}/images", headers=headers, json={"description": "transcode", "visibility": 0}
+        )
+        image_id = response.headers["Location"].split("/")[-1]
+        response = requests.post(
+            f"{self.BASE_URL}/images/{image_id}/file", headers=headers, files={"file": ("image", content)}
+        )
+        self.assertEqual(response.status_code, 200)
+        for _ in range(50):
+            response = requests.get(
+                f"{self.BASE_URL}/images/{image_id}/file", headers={**headers, "Accept": "image/webp"}
+            )
+            if response.headers["Content-Type"] == "image/webp":
+                break
+            time.sleep(0.1)
+        requests.delete(f"{self.BASE_URL}/images/{image_id}", headers=headers)
+        self.assertEqual(response.headers["Content-Type"], "image/webp")
+        return Image.open(io.BytesIO(response.content))
+
+    def test_06g_transcode_exif_orientation(self):
+        # EXIF方向为6（需顺时针旋转90度）的横向JPEG，转码后应为竖向
+        rng = random.Random(6)
+        image = Image.frombytes("RGB", (200, 100), rng.randbytes(200 * 100 * 3))
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=95, exif=exif)
+        self.assertEqual(self.transcoded(buffer.getvalue()).size, (100, 200))
+
+    def test_06h_transcode_alpha_band(self):
+        # LA模式PNG的透明度是单独的通道，转码后左半透明、右半不透明
+        rng = random.Random(7)
+        luminance = Image.frombytes("L", (200, 100), rng.randbytes(200 * 100))
+        alpha = Image.new("L", (200, 100), 255)
+        alpha.paste(0, (0, 0, 100, 100))
+        image = Image.merge("LA", (luminance, alpha))
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        variant = self.transcoded(buffer.getvalue())
+        self.assertEqual(variant.mode, "RGBA")
+        self.assertEqual(variant.getpixel((50, 50))[3], 0)
+        self.assertEqual(variant.getpixel((150, 50))[3], 255)
+
     def test_07_get_images(self):
         response = requests.get(
             f"{self.BASE_URL}/images",
@@ -73,6 +353,155 @@ class TestImageAPI(unittest.TestCase):
         )
         self.assertEqual(response.status_code, 200)
 
+    def test_07a_filter_images(self):
+        response = requests.get(
+            f"{self.BASE_URL}/images",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+            params={"format": "png", "min_width": 1000, "sort": "size", "order": "desc"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(int(GLOBAL_IMAGE_ID), [image["id"] for image in response.json()["images"]])
+        response = requests.get(
+            f"{self.BASE_URL}/images",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+            params={"format": "jpeg"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(int(GLOBAL_IMAGE_ID), [image["id"] for image in response.json()["images"]])
+
+    def test_07b_tag_images(self):
+        headers = {"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"}
+        response = requests.post(
+            f"{self.BASE_URL}/images/bulk-tag",
+            headers=headers,
+            json={"ids": [int(GLOBAL_IMAGE_ID), 999999], "tags": ["Cat", "outdoor"]},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["updated"], 1)
+        self.assertEqual([result["status"] for result in response.json()["results"]], ["updated", "not_found"])
+
+        response = requests.get(f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID}/tags", headers=headers)
+        self.assertEqual(sorted(response.json()["tags"]), ["cat", "outdoor"])
+
+        # 同时带有两个标签才匹配；任一标签匹配
+        cases = (("cat,outdoor", "all", True), ("cat,indoor", "all", False), ("cat,indoor", "any", True))
+        for tags, mode, expected in cases:
+            response = requests.get(
+                f"{self.BASE_URL}/images", headers=headers, params={"tags": tags, "tag_mode": mode, "fields": "id"}
+            )
+            self.assertEqual(response.status_code, 200)
+            ids = [image["id"] for image in response.json()["images"]]
+            self.assertEqual(int(GLOBAL_IMAGE_ID) in ids, expected)
+
+        # 管理员看到隐藏图片的计数，匿名用户只看到公开图片的计数
+        response = requests.get(f"{self.BASE_URL}/tags", headers=headers, params={"prefix": "ca"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn({"name": "cat", "count": 1}, response.json()["tags"])
+        response = requests.get(f"{self.BASE_URL}/tags", params={"prefix": "ca"})
+        self.assertNotIn("cat", [tag["name"] for tag in response.json()["tags"]])
+
+        response = requests.post(
+            f"{self.BASE_URL}/images/bulk-untag",
+            headers=headers,
+            json={"ids": [int(GLOBAL_IMAGE_ID)], "tags": ["outdoor"]},
+        )
+        self.assertEqual(response.json()["updated"], 1)
+        response = requests.get(f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID}/tags", headers=headers)
+        self.assertEqual(response.json()["tags"], ["cat"])
+
+        response = requests.post(
+            f"{self.BASE_URL}/images/bulk-tag", headers=headers, json={"ids": [int(GLOBAL_IMAGE_ID)], "tags": ["a b"]}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_07c_timeline(self):
+        headers = {"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"}
+        response = requests.get(f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID}", headers=headers)
+        created_at = response.json()["created_at"]
+        image_ids = []
+        for _ in range(2):
+            response = requests.post(
+                f"{self.BASE_URL}/images", headers=headers, json={"description": "timeline", "visibility": 0}
+            )
+            image_ids.append(int(response.headers["Location"].split("/")[-1]))
+
+        def counts(headers, granularity):
+            response = requests.get(
+                f"{self.BASE_URL}/images/timeline", headers=headers, params={"granularity": granularity}
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["granularity"], granularity)
+            return response.json()["buckets"]
+
+        def listed(headers):
+            response = requests.get(f"{self.BASE_URL}/images", headers=headers, params={"fields": "id"})
+            return len(response.json()["images"])
+
+        # 计数与各自能在列表中看到的图片数一致：管理员计入隐藏和私有图片，匿名用户只计入公开图片
+        buckets = counts(headers, "day")
+        self.assertEqual(buckets[0]["date"], created_at[:10])
+        total = sum(bucket["count"] for bucket in buckets)
+        self.assertEqual(total, listed(headers))
+        buckets = counts({}, "month")
+        self.assertEqual(buckets[0]["date"], created_at[:7])
+        self.assertEqual(sum(bucket["count"] for bucket in buckets), listed({}))
+        self.assertLess(listed({}), total)
+
+        # 按创建时间和ID翻页，同一时间创建的图片不会遗漏
+        seen = []
+        params = {"after": created_at, "limit": 1, "fields": "id,created_at"}
+        while True:
+            response = requests.get(f"{self.BASE_URL}/images", headers=headers, params=params)
+            self.assertEqual(response.status_code, 200)
+            images = response.json()["images"]
+            if not images:
+                break
+            seen.extend(image["id"] for image in images)
+            params.update(after=images[-1]["created_at"], after_id=images[-1]["id"])
+        response = requests.get(
+            f"{self.BASE_URL}/images", headers=headers, params={"after": created_at, "fields": "id"}
+        )
+        self.assertEqual(seen, [image["id"] for image in response.json()["images"]])
+        self.assertEqual(seen[0], int(GLOBAL_IMAGE_ID))
+        self.assertEqual(seen[-2:], image_ids)
+
+        response = requests.get(
+            f"{self.BASE_URL}/images", headers=headers, params={"before": "2999-01-01T00:00:00", "fields": "id"}
+        )
+        self.assertEqual([image["id"] for image in response.json()["images"]][:2], image_ids[::-1])
+
+        response = requests.get(f"{self.BASE_URL}/images/timeline", params={"granularity": "week"})
+        self.assertEqual(response.status_code, 400)
+
+        for image_id in image_ids:
+            requests.delete(f"{self.BASE_URL}/images/{image_id}", headers=headers)
+        self.assertEqual(sum(bucket["count"] for bucket in counts(headers, "day")), total - 2)
+
+    def test_07d_concurrent_tagging(self):
+        headers = {"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"}
+        name = f"new-{uuid.uuid4().hex[:8]}"
+
+        def tag(_):
+            return requests.post(
+                f"{self.BASE_URL}/images/bulk-tag",
+                headers=headers,
+                json={"ids": [int(GLOBAL_IMAGE_ID)], "tags": [name]},
+            ).status_code
+
+        # 并发创建同一个新标签并添加同一关联，不报错且只计数一次
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            self.assertEqual(set(pool.map(tag, range(8))), {200})
+        response = requests.get(f"{self.BASE_URL}/tags", headers=headers, params={"prefix": name})
+        self.assertEqual(response.json()["tags"], [{"name": name, "count": 1}])
+
+        requests.post(
+            f"{self.BASE_URL}/images/bulk-untag",
+            headers=headers,
+            json={"ids": [int(GLOBAL_IMAGE_ID)], "tags": [name]},
+        )
+        response = requests.get(f"{self.BASE_URL}/tags", headers=headers, params={"prefix": name})
+        self.assertEqual(response.json()["tags"], [])
+
     def test_08_delete_image(self):
         response = requests.delete(
             f"{self.BASE_URL}/images/{GLOBAL_IMAGE_ID}",
@@ -80,6 +509,34 @@ class TestImageAPI(unittest.TestCase):
         )
         self.assertEqual(response.status_code, 200)
 
+    def test_08a_bulk_delete_images(self):
+        response = requests.post(
+            f"{self.BASE_URL}/images",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+            json={"description": "bulk", "visibility": 0},
+        )
+        self.assertEqual(response.status_code, 201)
+        image_id = int(response.headers["Location"].split("/")[-1])
+        response = requests.post(
+            f"{self.BASE_URL}/images/bulk-delete",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+            json={"ids": [image_id, 999999]},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["deleted"], 1)
+        self.assertEqual(
+            response.json()["results"],
+            [
+                {"id": image_id, "status": "deleted"},
+                {"id": 999999, "status": "not_found"},
+            ],
+        )
+        response = requests.get(
+            f"{self.BASE_URL}/images/{image_id}",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+        )
+        self.assertEqual(response.status_code, 404)
+
     def test_09_logout(self):
         response = requests.delete(
             f"{self.BASE_URL}/session",
@@ -1,3 +1,4 @@
+import time
 import unittest
 import requests
 
@@ -96,6 +97,47 @@ class TestUserAPI(unittest.TestCase):
         GLOBAL_ACCESS_TOKEN = response.json()["access_token"]
         GLOBAL_REFRESH_TOKEN = response.json()["refresh_token"]
 
+    def test_09a_permission_change_revokes_tokens(self):
+        response = requests.post(
+            f"{self.BASE_URL}/session",
+            json={"username": "test", "password": "test2"},
+        )
+        self.assertEqual(response.status_code, 200)
+        user_token = response.json()["access_token"]
+        user_refresh_token = response.json()["refresh_token"]
+
+        response = requests.put(
+            f"{self.BASE_URL}{GLOBAL_USER_LOCATION}",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+            json={"username": "test", "nickname": "test2", "permission_level": 0},
+        )
+        self.assertEqual(response.status_code, 200)
+
+        # 权限变更后旧令牌失效
+        response = requests.get(
+            f"{self.BASE_URL}{GLOBAL_USER_LOCATION}",
+            headers={"Authorization": f"Bearer {user_token}"},
+        )
+        self.assertEqual(response.status_code, 401)
+        response = requests.get(
+            f"{self.BASE_URL}/session",
+            headers={"Authorization": f"Bearer {user_refresh_token}"},
+        )
+        self.assertEqual(response.status_code, 401)
+
+        # 重新登录后可以继续使用
+        response = requests.post(
+            f"{self.BASE_URL}/session",
+            json={"username": "test", "password": "test2"},
+        )
+        self.assertEqual(response.status_code, 200)
+        response = requests.get(
+            f"{self.BASE_URL}{GLOBAL_USER_LOCATION}",
+            headers={"Authorization": f"Bearer {response.json()['access_token']}"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["permission_level"], 0)
+
     def test_10_delete_user(self):
         response = requests.delete(
             f"{self.BASE_URL}{GLOBAL_USER_LOCATION}",
@@ -110,6 +152,50 @@ class TestUserAPI(unittest.TestCase):
         )
         self.assertEqual(response.status_code, 404)
 
+    def test_11a_delete_user_in_background(self):
+        response = requests.post(
+            f"{self.BASE_URL}/users",
+            json={"username": "heavy", "nickname": "heavy", "password": "heavy", "permission_level": 1},
+        )
+        self.assertEqual(response.status_code, 201)
+        user_location = response.headers["Location"]
+        response = requests.post(
+            f"{self.BASE_URL}/session",
+            json={"username": "heavy", "password": "heavy"},
+        )
+        user_token = response.json()["access_token"]
+        for _ in range(3):
+            response = requests.post(
+                f"{self.BASE_URL}/images",
+                headers={"Authorization": f"Bearer {user_token}"},
+                json={"description": "test", "visibility": 0},
+            )
+            self.assertEqual(response.status_code, 201)
+
+        response = requests.delete(
+            f"{self.BASE_URL}{user_location}",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+            params={"background": "true"},
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["total"], 3)
+        job_location = response.headers["Location"]
+        for _ in range(50):
+            job = requests.get(
+                f"{self.BASE_URL}{job_location}",
+                headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+            ).json()
+            if job["status"] in ("done", "failed"):
+                break
+            time.sleep(0.1)
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["progress"], 3)
+        response = requests.get(
+            f"{self.BASE_URL}{user_location}",
+            headers={"Authorization": f"Bearer {GLOBAL_ACCESS_TOKEN}"},
+        )
+        self.assertEqual(response.status_code, 404)
+
     def test_12_create_admin_user(self):
         response = requests.post(
             f"{self.BASE_URL}/users",
@@ -0,0 +1,126 @@
+from collections import Counter
+from sqlalchemy import and_, case, delete, func, insert, or_, select
+from extensions import db
+from orm.image import ImageORM
+from orm.timeline import TimelineORM
+
+GRANULARITIES = ("day", "month")
+
+
+def _day(created_at):
+    return created_at.date().isoformat()
+
+
+def _add(counts):
+    """
+    Apply {(owner_id, day): (images, public)} deltas and drop days left without images.
+    """
+    TimelineORM.add(
+        [
+            {"owner_id": owner_id, "day": day, "image_count": images, "public_count": public}
+            for (owner_id, day), (images, public) in counts.items()
+            if images or public
+        ]
+    )
+    if any(images < 0 for images, _ in counts.values()):
+        db.session.execute(
+            delete(TimelineORM).where(
+                TimelineORM.owner_id.in_({owner_id for owner_id, _ in counts}), TimelineORM.image_count <= 0
+            )
+        )
+
+
+def image_added(owner_id, created_at, public):
+    """
+    Count a new image on its creation day. Runs in the caller's transaction.
+    """
+    _add({(owner_id, _day(created_at)): (1, int(public))})
+
+
+def images_removed(rows):
+    """
+    Take deleted images off their creation days. `rows` are the (owner_id, created_at, visibility) of the
+    images. Runs in the caller's transaction.
+    """
+    images = Counter()
+    public = Counter()
+    for owner_id, created_at, visibility in rows:
+        key = (owner_id, _day(created_at))
+        images[key] -= 1
+        public[key] -= visibility == 0
+    _add({key: (count, public[key]) for key, count in images.items()})
+
+
+def visibility_changed(owner_id, created_at, was_public, is_public):
+    """
+    Move an image in or out of its day's public count. Runs in the caller's transaction.
+    """
+    if was_public != is_public:
+        _add({(owner_id, _day(created_at)): (0, 1 if is_public else -1)})
+
+
+def histogram(user, granularity="month", owner_id=None):
+    """
+    How many images the user can list were created in each day or month, newest first, optionally only
+    those of one owner. Summed from the per-day counters: admins get the totals, anonymous users the
+    public counts, and other users the totals for their own days and the public counts for everyone else's.
+    """
+    if user and user.permission_level >= 2:
+        count = TimelineORM.image_count
+    elif user:
+        count = case((TimelineORM.owner_id == user.id, TimelineORM.image_count), else_=TimelineORM.public_count)
+    else:
+        count = TimelineORM.public_count
+    bucket = TimelineORM.day if granularity == "day" else func.substr(TimelineORM.day, 1, 7)
+    total = func.sum(count)
+
+    query = db.session.query(bucket.label("date"), total.label("count"))
+    if owner_id is not None:
+        query = query.filter(TimelineORM.owner_id == owner_id)
+    rows = query.group_by(bucket).having(total > 0).order_by(bucket.desc())
+    return [{"date": row.date, "count": int(row.count)} for row in rows]
+
+
+def cursor_filter(after=None, after_id=None, before=None, before_id=None):
+    """
+    A keyset condition on (created_at, id). `after` is inclusive and `before` exclusive; with the ID of the
+    last image of a page, the cursor continues right after that image even when others share its time.
+    """
+    conditions = []
+    if after is not None:
+        conditions.append(
+            or_(
+                ImageORM.created_at > after,
+                and_(ImageORM.created_at == after, ImageORM.id > (after_id or 0)),
+            )
+        )
+    if before is not None:
+        conditions.append(
+            or_(
+                ImageORM.created_at < before,
+                and_(ImageORM.created_at == before, ImageORM.id < (before_id or 0)),
+            )
+        )
+    return and_(*conditions)
+
+
+def recount():
+    """
+    Rebuild the per-day counters from the images, for drift or images created before they were maintained.
+    Runs in the caller's transaction.
+    """
+    day = func.date(ImageORM.created_at)
+    db.session.execute(delete(TimelineORM))
+    db.session.execute(
+        insert(TimelineORM).from_select(
+            ["owner_id", "day", "image_count", "public_count"],
+            select(
+                ImageORM.owner_id,
+                day,
+                func.count(),
+                func.sum(case((ImageORM.visibility == 0, 1), else_=0)),
+            )
+            .where(ImageORM.created_at.isnot(None))
+            .group_by(ImageORM.owner_id, day),
+        )
+    )
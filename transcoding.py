@@ -0,0 +1,124 @@
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Transcoding is disabled without Pillow
+    Image = None
+
+log = logging.getLogger(__name__)
+
+# Target formats in order of preference: mimetype -> (Pillow format, file extension)
+TARGET_FORMATS = {
+    "image/avif": ("AVIF", "avif"),
+    "image/webp": ("WEBP", "webp"),
+}
+
+# Animated formats are served as-is rather than flattened to a single frame
+SOURCE_MIMETYPES = {"image/png", "image/jpeg", "image/bmp"}
+
+
+class Transcoder:
+    """
+    Builds modern-format variants of stored images in a background thread pool.
+    Variants live next to the original as <hash_value>.<extension>, so they are addressed by the
+    content they were derived from and never need invalidation.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.formats = []
+        self.quality = 80
+        self._executor = None
+        self._pending = set()
+        self._skipped = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        if not app.config["TRANSCODE_ENABLED"]:
+            return
+        if Image is None:
+            app.logger.warning("Transcoding is enabled but Pillow is not installed")
+            return
+        Image.init()
+        self.formats = [
+            mimetype
+            for mimetype in app.config["TRANSCODE_FORMATS"]
+            if mimetype in TARGET_FORMATS and TARGET_FORMATS[mimetype][0] in Image.SAVE
+        ]
+        self.quality = app.config["TRANSCODE_QUALITY"]
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config["TRANSCODE_WORKERS"], thread_name_prefix="transcode"
+        )
+        self.enabled = bool(self.formats)
+
+    def negotiate(self, accept_mimetypes, mimetype):
+        """
+        Return the preferred variant mimetype the client explicitly accepts, or None to serve the original.
+        Wildcards such as */* do not count, since they are also sent by clients that only handle the basics.
+        """
+        if not self.enabled or mimetype not in SOURCE_MIMETYPES:
+            return None
+        accepted = {value for value, quality in accept_mimetypes if quality > 0}
+        for target in self.formats:
+            if target in accepted:
+                return target
+        return None
+
+    def variant_path(self, storage_path, hash_value, target):
+        return os.path.join(storage_path, f"{hash_value}.{TARGET_FORMATS[target][1]}")
+
+    def schedule(self, storage_path, hash_value, target):
+        """
+        Queue a variant to be built unless it is already queued, failed before or would not be smaller.
+        """
+        key = (hash_value, target)
+        with self._lock:
+            if key in self._pending or key in self._skipped:
+                return
+            self._pending.add(key)
+        self._executor.submit(self._build, storage_path, hash_value, target)
+
+    def _build(self, storage_path, hash_value, target):
+        key = (hash_value, target)
+        destination = self.variant_path(storage_path, hash_value, target)
+        try:
+            if os.path.exists(destination):
+                return
+            source = os.path.join(storage_path, hash_value)
+            pillow_format = TARGET_FORMATS[target][0]
+            with Image.open(source) as image:
+                # Variants carry no EXIF, so the orientation is applied to the pixels instead
+                image = ImageOps.exif_transpose(image)
+                if image.mode not in ("RGB", "RGBA"):
+                    # Alpha is a band in LA/PA and a palette or colour key in P/L/RGB with transparency
+                    alpha = "A" in image.getbands() or "transparency" in image.info
+                    image = image.convert("RGBA" if alpha else "RGB")
+                descriptor, temporary = tempfile.mkstemp(dir=storage_path, prefix=".transcode-")
+                try:
+                    with os.fdopen(descriptor, "wb") as file:
+                        image.save(file, format=pillow_format, quality=self.quality)
+                    if os.path.getsize(temporary) >= os.path.getsize(source):
+                        os.unlink(temporary)
+                        with self._lock:
+                            self._skipped.add(key)
+                        return
+                    os.chmod(temporary, 0o644)
+                    os.replace(temporary, destination)
+                except BaseException:
+                    if os.path.exists(temporary):
+                        os.unlink(temporary)
+                    raise
+        except Exception:
+            log.exception("Failed to transcode %s to %s", hash_value, target)
+            with self._lock:
+                self._skipped.add(key)
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+
+transcoder = Transcoder()
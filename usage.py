@@ -0,0 +1,159 @@
+from flask import current_app
+from sqlalchemy import bindparam, func, or_, select, update
+from extensions import db
+from orm.image import ImageORM
+from orm.user import UserORM
+
+# Allowance for the multipart framing around the file when judging an upload by its Content-Length
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _within(column, delta, limit):
+    # Admins are never limited, and a change that frees space always goes through
+    if not limit or delta <= 0:
+        return True
+    return or_(UserORM.permission_level >= 2, column + delta <= limit)
+
+
+def _apply(user_id, **deltas):
+    """
+    Add the deltas to a user's counters in one UPDATE, which matches nothing if a quota would be exceeded.
+    """
+    statement = update(UserORM).where(
+        UserORM.id == user_id,
+        _within(UserORM.image_count, deltas.get("image_count", 0), current_app.config["QUOTA_IMAGES"]),
+        _within(UserORM.logical_bytes, deltas.get("logical_bytes", 0), current_app.config["QUOTA_BYTES"]),
+    )
+    values = {name: getattr(UserORM, name) + delta for name, delta in deltas.items() if delta}
+    if not values:
+        return True
+    result = db.session.execute(statement.values(**values).execution_options(synchronize_session=False))
+    return bool(result.rowcount)
+
+
+def _references(owner_id, hash_value, excluding):
+    return db.session.query(
+        db.session.query(ImageORM.id)
+        .filter(
+            ImageORM.owner_id == owner_id,
+            ImageORM.hash_value == hash_value,
+            ImageORM.id != excluding,
+        )
+        .exists()
+    ).scalar()
+
+
+def check_upload_size(owner_id, content_length, previous_size):
+    """
+    Reject an upload from its Content-Length alone, before the body is parsed or hashed.
+    """
+    limit = current_app.config["QUOTA_BYTES"]
+    if not limit or content_length is None:
+        return
+    user = db.session.query(UserORM.logical_bytes, UserORM.permission_level).filter_by(id=owner_id).first()
+    if user and user.permission_level < 2:
+        if user.logical_bytes - previous_size + content_length - MULTIPART_OVERHEAD > limit:
+            raise QuotaExceeded("Storage quota exceeded", 413)
+
+
+def image_created(owner_id):
+    """
+    Count a new image, raising QuotaExceeded if the owner has too many. Runs in the caller's transaction.
+    """
+    if not _apply(owner_id, image_count=1):
+        raise QuotaExceeded("Image quota exceeded", 403)
+
+
+def file_replaced(image, new_hash, new_size):
+    """
+    Account for `image` getting the file `new_hash`; call before changing the image.
+    Raises QuotaExceeded if the owner's logical bytes would exceed the quota. Runs in the caller's transaction.
+    """
+    old_hash, old_size = image.hash_value, (image.size or 0) if image.hash_value else 0
+    unique = 0
+    if new_hash != old_hash:
+        if not _references(image.owner_id, new_hash, image.id):
+            unique += new_size
+        if old_hash and not _references(image.owner_id, old_hash, image.id):
+            unique -= old_size
+    if not _apply(image.owner_id, logical_bytes=new_size - old_size, unique_bytes=unique):
+        raise QuotaExceeded("Storage quota exceeded", 413)
+
+
+def images_deleted(rows):
+    """
+    Take deleted images off their owners' counters. `rows` are the (owner_id, hash_value, size) of the
+    images, read before they were deleted; call after the delete so remaining references can be checked.
+    """
+    totals = {}
+    for owner_id, hash_value, size in rows:
+        entry = totals.setdefault(owner_id, {"count": 0, "logical": 0, "blobs": {}})
+        entry["count"] += 1
+        if hash_value:
+            entry["logical"] += size or 0
+            entry["blobs"][hash_value] = size or 0
+    if not totals:
+        return
+
+    hash_values = list({hash_value for entry in totals.values() for hash_value in entry["blobs"]})
+    remaining = set()
+    if hash_values:
+        remaining = set(
+            db.session.query(ImageORM.owner_id, ImageORM.hash_value)
+            .filter(ImageORM.owner_id.in_(list(totals)), ImageORM.hash_value.in_(hash_values))
+            .distinct()
+        )
+    parameters = [
+        {
+            "user_id": owner_id,
+            "count": entry["count"],
+            "logical": entry["logical"],
+            "unique": sum(
+                size for hash_value, size in entry["blobs"].items() if (owner_id, hash_value) not in remaining
+            ),
+        }
+        for owner_id, entry in totals.items()
+    ]
+    db.session.execute(
+        update(UserORM.__table__)
+        .where(UserORM.__table__.c.id == bindparam("user_id"))
+        .values(
+            image_count=UserORM.__table__.c.image_count - bindparam("count"),
+            logical_bytes=UserORM.__table__.c.logical_bytes - bindparam("logical"),
+            unique_bytes=UserORM.__table__.c.unique_bytes - bindparam("unique"),
+        ),
+        parameters,
+    )
+
+
+def recount(user_ids=None):
+    """
+    Recompute the counters from the images table, for rows written before they were maintained.
+    Runs in the caller's transaction.
+    """
+    images = ImageORM.__table__.c
+    distinct_blobs = (
+        select(images.owner_id, images.hash_value, func.max(images.size).label("size"))
+        .where(images.hash_value.isnot(None))
+        .group_by(images.owner_id, images.hash_value)
+        .subquery()
+    )
+
+    def scalar(expression, owner):
+        return select(func.coalesce(expression, 0)).where(owner == UserORM.id).scalar_subquery()
+
+    statement = update(UserORM).values(
+        image_count=scalar(func.count(images.id), images.owner_id),
+        logical_bytes=scalar(func.sum(images.size), images.owner_id),
+        unique_bytes=scalar(func.sum(distinct_blobs.c.size), distinct_blobs.c.owner_id),
+    )
+    if user_ids is not None:
+        statement = statement.where(UserORM.id.in_(user_ids))
+    db.session.execute(statement.execution_options(synchronize_session=False))